@@ -0,0 +1,17 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tlbin.contracts import write_indexed_contracts  # noqa: E402
+
+
+def create_indexed_contracts(contracts_filename, output_filename):
+    with open(contracts_filename) as f:
+        contracts = json.load(f)
+    write_indexed_contracts(contracts, output_filename)
+
+
+if __name__ == "__main__":
+    create_indexed_contracts(sys.argv[1], sys.argv[2])
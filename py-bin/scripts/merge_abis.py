@@ -1,5 +1,11 @@
 import json
 
+from eth_utils import (
+    encode_hex,
+    event_abi_to_log_topic,
+    function_abi_to_4byte_selector,
+)
+
 
 def create_merged_abi(
     legacy_networks_filename, recent_networks_filename, output_filename
@@ -16,12 +22,31 @@ def create_merged_abi(
     merged_abis = merge_abis(proxy_abis, recent_abis)
     merged_abis = merge_abis(merged_abis, legacy_abis)
 
-    output = {"MergedCurrencyNetworksAbi": {"abi": merged_abis}}
+    output = {"MergedCurrencyNetworksAbi": build_abi_index(merged_abis)}
 
     with open(output_filename, "w") as f:
         json.dump(output, f, indent=2)
 
 
+def abi_key(abi):
+    """
+    The key identifying an abi entry in the contract interface:
+    the 4-byte selector for functions and errors, the topic for events,
+    and the type for constructor, receive and fallback which have no signature
+    """
+    abi_type = abi["type"]
+    if abi_type in ["function", "error"]:
+        return abi_type, encode_hex(function_abi_to_4byte_selector(abi))
+    if abi_type == "event":
+        return abi_type, encode_hex(event_abi_to_log_topic(abi))
+    assert abi_type in [
+        "constructor",
+        "receive",
+        "fallback",
+    ], f"Found abi with unexpected type {abi_type}"
+    return abi_type, None
+
+
 def merge_abis(abis_1, abis_2):
     """
     Merge abis from abis_2 to abis_1, on conflicting abi keep abi from abis_1
@@ -31,39 +56,35 @@ def merge_abis(abis_1, abis_2):
     merged_abis = abis_1.copy()
 
     # We need to remove every abi that have the same selector (= signature) otherwise some tools will find it invalid
+    keys = {abi_key(abi_1) for abi_1 in abis_1 if abi_1["type"] != "fallback"}
     for abi_2 in abis_2:
 
         if abi_2["type"] == "fallback":
             continue
 
-        found_clashing_abi = False
-        for abi_1 in abis_1:
-            if abi_1["type"] == "fallback":
-                continue
-            if abi_signatures_clash(abi_1, abi_2):
-                found_clashing_abi = True
-                break
-
-        if found_clashing_abi:
+        key = abi_key(abi_2)
+        if key in keys:
             continue
+        keys.add(key)
         merged_abis.append(abi_2)
 
     return merged_abis
 
 
-def abi_signatures_clash(abi_1, abi_2):
-    if "name" not in abi_1.keys() or "name" not in abi_2.keys():
-        if abi_1["type"] == abi_2["type"]:
-            assert abi_1["type"] in [
-                "constructor",
-                "receive",
-                "fallback",
-            ], "Found clashing abi with no name and unexpected type"
-            return True
-        return False
-    return abi_1["name"] == abi_2["name"] and set(
-        [abi_input["type"] for abi_input in abi_1["inputs"]]
-    ) == set([abi_input["type"] for abi_input in abi_2["inputs"]])
+def build_abi_index(abis):
+    """
+    Return the abis together with lookup tables from 4-byte selectors of functions
+    and topics of non-anonymous events to the position of their abi in `abis`
+    """
+    selectors = {}
+    topics = {}
+    for position, abi in enumerate(abis):
+        abi_type, key = abi_key(abi)
+        if abi_type == "function":
+            selectors.setdefault(key, position)
+        elif abi_type == "event" and not abi.get("anonymous", False):
+            topics.setdefault(key, position)
+    return {"abi": abis, "selectors": selectors, "topics": topics}
 
 
 if __name__ == "__main__":
@@ -53,5 +53,5 @@ setup(
     # http://docs.python.org/3.4/distutils/setupscript.html#installing-additional-files # noqa
     # In this case, 'data_file' will be installed into '<sys.prefix>/my_data'
     data_files=[("trustlines-contracts/build", ["tlbin/contracts.json"])],
-    package_data={"tlbin": ["contracts.json", "merged_abis.json"]},
+    package_data={"tlbin": ["contracts.json", "contracts.idx", "merged_abis.json"]},
 )
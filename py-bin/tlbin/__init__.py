@@ -1 +1,7 @@
-from .contracts import load_packaged_contracts, load_packaged_merged_abis  # noqa: F401
+from .contracts import (  # noqa: F401
+    IndexedContracts,
+    load_packaged_contracts,
+    load_packaged_contracts_lazily,
+    load_packaged_merged_abis,
+    write_indexed_contracts,
+)
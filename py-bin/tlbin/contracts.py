@@ -1,13 +1,92 @@
+import collections.abc
 import json
+import mmap
+import os
+import struct
 
-import pkg_resources
+# The indexed format stores every contract as its own json blob, so that a single contract can be decoded
+# without parsing the whole contracts.json. The file consists of:
+#   - INDEX_MAGIC
+#   - the length of the offset table as 8 byte big endian unsigned integer
+#   - the offset table, a json object mapping contract names to [offset, length] of their blob
+#   - the blobs, with offsets relative to the end of the offset table
+INDEX_MAGIC = b"TLBIN-INDEX-1\n"
+_TABLE_LENGTH_FORMAT = ">Q"
+
+
+def _packaged_file_path(filename):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
 
 
 def load_packaged_contracts():
-    with open(pkg_resources.resource_filename(__name__, "contracts.json")) as file:
+    with open(_packaged_file_path("contracts.json")) as file:
         return json.load(file)
 
 
 def load_packaged_merged_abis():
-    with open(pkg_resources.resource_filename(__name__, "merged_abis.json")) as file:
+    with open(_packaged_file_path("merged_abis.json")) as file:
         return json.load(file)
+
+
+def load_packaged_contracts_lazily():
+    """Load the packaged contracts from the indexed file if it was packaged, decoding a contract only
+    when it is accessed. Falls back to loading the whole contracts.json."""
+    index_file_path = _packaged_file_path("contracts.idx")
+    if os.path.exists(index_file_path):
+        return IndexedContracts(index_file_path)
+    return load_packaged_contracts()
+
+
+def write_indexed_contracts(contracts, file_path):
+    """Write the `contracts` dict in the indexed format to `file_path`"""
+    blobs = [
+        (name, json.dumps(interface, separators=(",", ":")).encode("utf-8"))
+        for name, interface in contracts.items()
+    ]
+    offset_table = {}
+    offset = 0
+    for name, blob in blobs:
+        offset_table[name] = [offset, len(blob)]
+        offset += len(blob)
+    encoded_offset_table = json.dumps(offset_table).encode("utf-8")
+
+    with open(file_path, "wb") as file:
+        file.write(INDEX_MAGIC)
+        file.write(struct.pack(_TABLE_LENGTH_FORMAT, len(encoded_offset_table)))
+        file.write(encoded_offset_table)
+        for _, blob in blobs:
+            file.write(blob)
+
+
+class IndexedContracts(collections.abc.Mapping):
+    """The contracts of a file in the indexed format, decoded on first access of each contract"""
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic_end = len(INDEX_MAGIC)
+        table_start = magic_end + struct.calcsize(_TABLE_LENGTH_FORMAT)
+        if self._mmap[:magic_end] != INDEX_MAGIC:
+            raise ValueError(f"{file_path} is not an indexed contracts file")
+        (table_length,) = struct.unpack(
+            _TABLE_LENGTH_FORMAT, self._mmap[magic_end:table_start]
+        )
+        blobs_start = table_start + table_length
+        self._offset_table = json.loads(self._mmap[table_start:blobs_start])
+        self._blobs_start = blobs_start
+        self._decoded = {}
+
+    def __getitem__(self, name):
+        if name not in self._decoded:
+            offset, length = self._offset_table[name]
+            start = self._blobs_start + offset
+            end = start + length
+            self._decoded[name] = json.loads(self._mmap[start:end])
+        return self._decoded[name]
+
+    def __iter__(self):
+        return iter(self._offset_table)
+
+    def __len__(self):
+        return len(self._offset_table)
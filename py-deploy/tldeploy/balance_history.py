@@ -0,0 +1,243 @@
+# This file provides the reconstruction of the balance history of all trustlines of a currency network from its events
+#
+# Every time interests are applied to a trustline, the contract emits a `BalanceUpdate` with the new balance, so the
+# interests accrued since the previous update follow from the previous balance, the block timestamps of both updates
+# and the interest rates of the last `TrustlineUpdate`. The `BalanceUpdate` events of a transfer are emitted right
+# before its `Transfer` event in the same transaction, one per hop, so the path and the fees of the transfer follow
+# from the balance changes along it. All of this only needs one pass over the logs of the network ordered by block
+# and log index, which keeps the state of every trustline instead of querying the events per trustline.
+import functools
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import attr
+from hexbytes import HexBytes
+
+from tldeploy.event_store import EventStore
+from tldeploy.events import DecodedLog, LogDecoder, get_raw_logs
+from tldeploy.interests import calculate_balance_with_interests
+
+
+@attr.s(auto_attribs=True)
+class BalanceColumns:
+    """The balances of all trustlines as columns, with one row per `BalanceUpdate` event.
+
+    The `balance` and the `interests` accrued since the previous balance update of the trustline
+    are seen from `user`, which is the sender of the value for updates of transfers."""
+
+    block_number: List[Optional[int]] = attr.Factory(list)
+    log_index: List[Optional[int]] = attr.Factory(list)
+    timestamp: List[int] = attr.Factory(list)
+    transaction_hash: List[Optional[HexBytes]] = attr.Factory(list)
+    user: List[str] = attr.Factory(list)
+    counterparty: List[str] = attr.Factory(list)
+    balance: List[int] = attr.Factory(list)
+    interests: List[int] = attr.Factory(list)
+
+    def __len__(self) -> int:
+        return len(self.block_number)
+
+
+@attr.s(auto_attribs=True)
+class TransferColumns:
+    """The transfers as columns, with one row per `Transfer` event.
+
+    `value_sent` is what the sender paid and `value_received` what the receiver got without interests,
+    the difference are the `fees` earned by the mediators."""
+
+    block_number: List[Optional[int]] = attr.Factory(list)
+    log_index: List[Optional[int]] = attr.Factory(list)
+    timestamp: List[int] = attr.Factory(list)
+    transaction_hash: List[Optional[HexBytes]] = attr.Factory(list)
+    sender: List[str] = attr.Factory(list)
+    receiver: List[str] = attr.Factory(list)
+    path: List[List[str]] = attr.Factory(list)
+    value_sent: List[int] = attr.Factory(list)
+    value_received: List[int] = attr.Factory(list)
+    fees: List[int] = attr.Factory(list)
+
+    def __len__(self) -> int:
+        return len(self.block_number)
+
+
+@attr.s(auto_attribs=True)
+class TrustlineHistory:
+    balances: BalanceColumns = attr.Factory(BalanceColumns)
+    transfers: TransferColumns = attr.Factory(TransferColumns)
+    # the last balance of every trustline by user pairs, as seen from the lower address of the pair
+    final_balances: Dict[Tuple[str, str], int] = attr.Factory(dict)
+
+
+@attr.s(auto_attribs=True)
+class _BalanceChange:
+    """The change of a balance update as seen from `user`, without the interests applied with it"""
+
+    user: str
+    counterparty: str
+    change: int
+
+
+class _HistoryBuilder:
+    def __init__(self, block_timestamp: Callable[[int], int]) -> None:
+        self.block_timestamp = block_timestamp
+        self.history = TrustlineHistory()
+        # by user pairs as seen from the lower address of the pair
+        self._balances: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self._interest_rates: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        # the balance changes of the current transaction not yet attributed to a transfer
+        self._transaction_hash: Optional[HexBytes] = None
+        self._pending_changes: List[_BalanceChange] = []
+
+    def add(self, log: DecodedLog) -> None:
+        if log.transaction_hash != self._transaction_hash:
+            self._transaction_hash = log.transaction_hash
+            self._pending_changes = []
+        if log.event == "TrustlineUpdate":
+            self._update_interest_rates(log)
+        elif log.event in ("BalanceUpdate", "Transfer"):
+            if log.block_number is None:
+                raise ValueError(
+                    "Cannot get the timestamp of a log of a pending block."
+                )
+            timestamp = self.block_timestamp(log.block_number)
+            if log.event == "BalanceUpdate":
+                self._update_balance(log, timestamp)
+            else:
+                self._add_transfer(log, timestamp)
+
+    def _update_interest_rates(self, log: DecodedLog) -> None:
+        args = log.args
+        # networks without interests emit the event without interest rates
+        interest_rate_given = getattr(args, "interestRateGiven", 0)
+        interest_rate_received = getattr(args, "interestRateReceived", 0)
+        if args.creditor < args.debtor:
+            self._interest_rates[args.creditor, args.debtor] = (
+                interest_rate_given,
+                interest_rate_received,
+            )
+        else:
+            self._interest_rates[args.debtor, args.creditor] = (
+                interest_rate_received,
+                interest_rate_given,
+            )
+
+    def _update_balance(self, log: DecodedLog, timestamp: int) -> None:
+        user, counterparty, balance = log.args.from_, log.args.to, log.args.value
+        if user < counterparty:
+            user_pair, sign = (user, counterparty), 1
+        else:
+            user_pair, sign = (counterparty, user), -1
+
+        previous_balance, previous_timestamp = self._balances.get(
+            user_pair, (0, timestamp)
+        )
+        interest_rate_given, interest_rate_received = self._interest_rates.get(
+            user_pair, (0, 0)
+        )
+        interests = (
+            calculate_balance_with_interests(
+                previous_balance,
+                previous_timestamp,
+                timestamp,
+                interest_rate_given,
+                interest_rate_received,
+            )
+            - previous_balance
+        ) * sign
+        self._balances[user_pair] = (balance * sign, timestamp)
+        self._pending_changes.append(
+            _BalanceChange(
+                user, counterparty, balance - previous_balance * sign - interests
+            )
+        )
+
+        columns = self.history.balances
+        columns.block_number.append(log.block_number)
+        columns.log_index.append(log.log_index)
+        columns.timestamp.append(timestamp)
+        columns.transaction_hash.append(log.transaction_hash)
+        columns.user.append(user)
+        columns.counterparty.append(counterparty)
+        columns.balance.append(balance)
+        columns.interests.append(interests)
+
+    def _add_transfer(self, log: DecodedLog, timestamp: int) -> None:
+        sender, receiver = log.args.from_, log.args.to
+        hops = _transfer_hops(self._pending_changes, sender, receiver)
+        self._pending_changes = []
+        value_sent = -hops[0].change
+        value_received = -hops[-1].change
+
+        columns = self.history.transfers
+        columns.block_number.append(log.block_number)
+        columns.log_index.append(log.log_index)
+        columns.timestamp.append(timestamp)
+        columns.transaction_hash.append(log.transaction_hash)
+        columns.sender.append(sender)
+        columns.receiver.append(receiver)
+        columns.path.append([sender] + [hop.counterparty for hop in hops])
+        columns.value_sent.append(value_sent)
+        columns.value_received.append(value_received)
+        columns.fees.append(value_sent - value_received)
+
+    def finish(self) -> TrustlineHistory:
+        self.history.final_balances = {
+            user_pair: balance for user_pair, (balance, _) in self._balances.items()
+        }
+        return self.history
+
+
+def _transfer_hops(
+    changes: List[_BalanceChange], sender: str, receiver: str
+) -> List[_BalanceChange]:
+    """The balance changes of the hops of a transfer from `sender` to `receiver` in path order,
+    searched backwards from the last balance change before the `Transfer` event"""
+    hops = []
+    saw_sender = saw_receiver = False
+    for change in reversed(changes):
+        hops.append(change)
+        saw_sender = saw_sender or change.user == sender
+        saw_receiver = saw_receiver or change.counterparty == receiver
+        if saw_sender and saw_receiver:
+            break
+    else:
+        raise ValueError(
+            f"Could not find the balance updates of the transfer to {receiver}."
+        )
+    # the updates are emitted in path order if the receiver pays and in reverse order if the sender pays
+    if hops[0].user != sender:
+        hops.reverse()
+    return hops
+
+
+def reconstruct_history(
+    logs: Iterable[DecodedLog], block_timestamp: Callable[[int], int]
+) -> TrustlineHistory:
+    """The balance and transfer history of a currency network from all its `logs` ordered by block and log index.
+    `block_timestamp` returns the timestamp of a block by its number."""
+    builder = _HistoryBuilder(block_timestamp)
+    for log in logs:
+        builder.add(log)
+    return builder.finish()
+
+
+def get_trustline_history(
+    currency_network_contract, *, event_store: EventStore = None
+) -> TrustlineHistory:
+    """The balance and transfer history of all trustlines of `currency_network_contract`.
+
+    With an `event_store`, the logs are synced into the store and read from it,
+    otherwise they are fetched from the node in one request."""
+    web3 = currency_network_contract.web3
+    if event_store is not None:
+        event_store.sync(web3, [currency_network_contract.address])
+        logs = event_store.get_logs(address=currency_network_contract.address)
+    else:
+        logs = LogDecoder(currency_network_contract.abi).decode_logs(
+            get_raw_logs(web3, address=currency_network_contract.address)
+        )
+
+    @functools.lru_cache(maxsize=1)
+    def block_timestamp(block_number: int) -> int:
+        return web3.eth.getBlock(block_number).timestamp
+
+    return reconstruct_history(logs, block_timestamp)
@@ -0,0 +1,110 @@
+# This file provides functions to do many contract calls with few requests to the node
+import json
+from typing import Any, List, Sequence
+
+from eth_utils import to_hex
+from hexbytes import HexBytes
+from web3 import HTTPProvider
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3._utils.request import make_post_request
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class BatchCallFailed(Exception):
+    """A call of a batch failed, or the whole batch was rejected by the node if `function_call` is None"""
+
+    def __init__(self, function_call, error):
+        if function_call is None:
+            super().__init__(f"Batch of calls failed: {error}")
+        else:
+            super().__init__(f"Call to {function_call.fn_name} failed: {error}")
+        self.function_call = function_call
+        self.error = error
+
+
+def call_functions(
+    web3,
+    function_calls: Sequence,
+    *,
+    block_identifier="latest",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> List[Any]:
+    """Call all the given contract function calls and return their results in the same order.
+
+    The results are the same as the ones of `function_call.call()`.
+    If the node is connected via http, the calls are sent as JSON-RPC batches of at most `batch_size` calls.
+    For other providers, like the eth-tester provider used in tests, the calls are sent one after the other.
+    """
+    if isinstance(block_identifier, int):
+        block_identifier = to_hex(block_identifier)
+
+    transactions = [
+        {"to": function_call.address, "data": function_call._encode_transaction_data()}
+        for function_call in function_calls
+    ]
+
+    if isinstance(web3.provider, HTTPProvider):
+        return_data: List[bytes] = []
+        for start in range(0, len(transactions), batch_size):
+            end = start + batch_size
+            return_data.extend(
+                _batch_eth_call(
+                    web3.provider,
+                    function_calls[start:end],
+                    transactions[start:end],
+                    block_identifier,
+                )
+            )
+    else:
+        return_data = [
+            web3.eth.call(transaction, block_identifier=block_identifier)
+            for transaction in transactions
+        ]
+
+    return [
+        _decode_function_output(web3, function_call, data)
+        for function_call, data in zip(function_calls, return_data)
+    ]
+
+
+def _batch_eth_call(provider, function_calls, transactions, block_identifier):
+    request = [
+        {
+            "jsonrpc": "2.0",
+            "method": "eth_call",
+            "params": [transaction, block_identifier],
+            "id": request_id,
+        }
+        for request_id, transaction in enumerate(transactions)
+    ]
+    raw_response = make_post_request(
+        provider.endpoint_uri,
+        json.dumps(request).encode("utf-8"),
+        **dict(provider.get_request_kwargs()),
+    )
+    parsed_response = json.loads(raw_response)
+    # a node rejecting the whole batch, e.g. because it is too large, answers with a single error
+    if isinstance(parsed_response, dict):
+        raise BatchCallFailed(None, parsed_response.get("error", parsed_response))
+    responses = {response["id"]: response for response in parsed_response}
+
+    return_data = []
+    for request_id, function_call in enumerate(function_calls):
+        response = responses.get(request_id)
+        if response is None:
+            raise BatchCallFailed(function_call, "No response in batch")
+        if "error" in response:
+            raise BatchCallFailed(function_call, response["error"])
+        return_data.append(HexBytes(response["result"]))
+    return return_data
+
+
+def _decode_function_output(web3, function_call, data: bytes):
+    output_types = get_abi_output_types(function_call.abi)
+    decoded = web3.codec.decode_abi(output_types, data)
+    normalized = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, decoded)
+    if len(normalized) == 1:
+        return normalized[0]
+    return normalized
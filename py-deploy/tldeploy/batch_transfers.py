@@ -0,0 +1,136 @@
+# This file provides the simulation of a batch of transfers that are sent one after the other
+#
+# Every transfer of a batch changes balances the following transfers may depend on, so the transfers are
+# applied in order to a snapshot of the network. The snapshot only stores the trustlines changed by the
+# batch and reads all others from the underlying view, so taking it costs nothing even for a large
+# `CurrencyNetworkModel`, and the underlying view is never modified.
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import attr
+
+from tldeploy.simulation import (
+    MAX_UINT64,
+    CurrencyNetworkView,
+    TransferInfeasible,
+    TransferResult,
+    Trustline,
+    simulate_transfer_receiver_pays,
+    simulate_transfer_sender_pays,
+)
+
+
+class NetworkSnapshot(CurrencyNetworkView):
+    """A copy-on-write snapshot of `view`, where changed trustlines are kept in the snapshot
+    and unchanged ones are read from `view`"""
+
+    def __init__(self, view: CurrencyNetworkView) -> None:
+        super().__init__(
+            capacity_imbalance_fee_divisor=view.capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=view.prevent_mediator_interests,
+            is_network_frozen=view.is_network_frozen,
+        )
+        self.view = view
+
+    def get_trustline(self, a: str, b: str) -> Trustline:
+        """The trustline between `a` and `b` as seen from `a`"""
+        if a < b:
+            trustline = self._trustlines.get((a, b))
+            if trustline is not None:
+                return trustline
+        else:
+            trustline = self._trustlines.get((b, a))
+            if trustline is not None:
+                return trustline.reverse()
+        return self.view.get_trustline(a, b)
+
+    def changed_trustlines(self) -> Dict[Tuple[str, str], Trustline]:
+        """The trustlines changed in the snapshot by user pairs, as seen from the lower address of the pair"""
+        return dict(self._trustlines)
+
+    def copy(self) -> "NetworkSnapshot":
+        snapshot = NetworkSnapshot(self.view)
+        snapshot._trustlines = dict(self._trustlines)
+        return snapshot
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class BatchTransfer:
+    """A transfer of a batch, like `transfer` or `transferReceiverPays` if `receiver_pays` is set"""
+
+    value: int
+    path: List[str]
+    max_fee: int = MAX_UINT64
+    receiver_pays: bool = False
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class BatchTransferOutcome:
+    """The outcome of a transfer of a batch, with the `result` if it succeeded or the `error` if it would revert"""
+
+    transfer: BatchTransfer
+    result: Optional[TransferResult] = None
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.result is not None
+
+    @property
+    def fees(self) -> int:
+        return 0 if self.result is None else self.result.fees
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class BatchSimulationResult:
+    outcomes: List[BatchTransferOutcome]
+    snapshot: NetworkSnapshot
+
+    @property
+    def failed(self) -> List[BatchTransferOutcome]:
+        return [outcome for outcome in self.outcomes if not outcome.succeeded]
+
+    @property
+    def total_fees(self) -> int:
+        return sum(outcome.fees for outcome in self.outcomes)
+
+    def final_balances(self) -> Dict[Tuple[str, str], int]:
+        """The balances of the trustlines changed by the batch by user pairs,
+        as seen from the lower address of the pair"""
+        return {
+            user_pair: trustline.balance
+            for user_pair, trustline in self.snapshot.changed_trustlines().items()
+        }
+
+
+def simulate_transfer_batch(
+    view: CurrencyNetworkView,
+    transfers: Sequence[BatchTransfer],
+    *,
+    timestamp: int,
+) -> BatchSimulationResult:
+    """Simulates sending `transfers` one after the other at `timestamp` without modifying `view`.
+
+    Transfers that would revert do not change any balance, the following transfers are still simulated.
+    """
+    snapshot = NetworkSnapshot(view)
+    outcomes = []
+    for transfer in transfers:
+        simulate = (
+            simulate_transfer_receiver_pays
+            if transfer.receiver_pays
+            else simulate_transfer_sender_pays
+        )
+        try:
+            result = simulate(
+                snapshot,
+                transfer.value,
+                transfer.max_fee,
+                transfer.path,
+                timestamp=timestamp,
+            )
+        except TransferInfeasible as e:
+            outcomes.append(BatchTransferOutcome(transfer, error=str(e)))
+            continue
+        snapshot.apply(result)
+        outcomes.append(BatchTransferOutcome(transfer, result=result))
+    return BatchSimulationResult(outcomes=outcomes, snapshot=snapshot)
@@ -1,52 +1,25 @@
+# The heavy dependencies like web3 are imported by the commands that use them,
+# so that the startup of short commands like --help and --version stays fast.
 import json
+from typing import TYPE_CHECKING, Optional, Tuple
 
 import click
-import pkg_resources
-from deploy_tools.cli import (
-    connect_to_json_rpc,
-    gas_option,
-    gas_price_option,
-    get_nonce,
-    jsonrpc_option,
-    keystore_option,
-    nonce_option,
-    retrieve_private_key,
-    validate_address,
-)
-from deploy_tools.transact import (
-    build_transaction_options,
-    increase_transaction_options_nonce,
-)
-from eth_utils import is_checksum_address, to_checksum_address
-
-import pendulum
-from tldeploy.identity import (
-    deploy_identity_implementation,
-    deploy_identity_proxy_factory,
-)
-
-from .core import (
-    deploy_exchange,
-    deploy_network,
-    deploy_networks,
-    deploy_unw_eth,
-    deploy_beacon,
-    deploy_and_migrate_networks_from_file,
-    NetworkSettings,
-    deploy_currency_network_proxy,
-    unfreeze_owned_network,
-    remove_owner_of_network,
-)
-from tldeploy.migration import migrate_networks, verify_networks_migrations
+
+if TYPE_CHECKING:
+    import pendulum
 
 
 def report_version():
+    import pkg_resources
+
     for dist in ["trustlines-contracts-deploy", "trustlines-contracts-bin"]:
         msg = "{} {}".format(dist, pkg_resources.get_distribution(dist).version)
         click.echo(msg)
 
 
 def validate_date(ctx, param, value):
+    import pendulum
+
     if value is None:
         return None
     try:
@@ -69,6 +42,51 @@ def cli(ctx, version):
         ctx.exit()
 
 
+def validate_address(ctx, param, value):
+    from deploy_tools.cli import validate_address
+
+    if value is None:
+        return None
+    return validate_address(ctx, param, value)
+
+
+# The same options as in deploy_tools.cli, which imports web3
+jsonrpc_option = click.option(
+    "--jsonrpc",
+    help="JsonRPC URL of the ethereum client",
+    default="http://127.0.0.1:8545",
+    show_default=True,
+    metavar="URL",
+    envvar="JSONRPC",
+)
+keystore_option = click.option(
+    "--keystore",
+    help="Path to the encrypted keystore",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    envvar="KEYSTORE",
+)
+gas_option = click.option(
+    "--gas",
+    help="Gas of the transaction to be sent",
+    type=int,
+    default=None,
+    envvar="GAS",
+)
+gas_price_option = click.option(
+    "--gas-price",
+    help="Gas price of the transaction to be sent",
+    type=int,
+    required=True,
+    envvar="GAS_PRICE",
+)
+nonce_option = click.option(
+    "--nonce",
+    help="Nonce of the first transaction to be sent, queried from the pending block if left out",
+    type=int,
+    default=None,
+)
+
 currency_network_contract_name_option = click.option(
     "--currency-network-contract-name",
     help="name of the currency network contract to deploy, "
@@ -172,13 +190,19 @@ def currencynetwork(
     exchange_contract: str,
     currency_network_contract_name: str,
     expiration_time: int,
-    expiration_date: pendulum.DateTime,
+    expiration_date: "pendulum.DateTime",
     gas: int,
     gas_price: int,
     nonce: int,
     keystore: str,
 ):
     """Deploy a currency network contract with custom settings and optionally connect it to an exchange contract"""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+    from eth_utils import is_checksum_address, to_checksum_address
+
+    from tldeploy.core import NetworkSettings, deploy_network
+
     if exchange_contract is not None and not is_checksum_address(exchange_contract):
         raise click.BadParameter("{} is not a valid address.".format(exchange_contract))
 
@@ -271,6 +295,12 @@ def exchange(jsonrpc: str, gas: int, gas_price: int, nonce: int, keystore: str):
     """Deploy an exchange contract and a contract to wrap Ether into an ERC 20
     token.
     """
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import deploy_exchange, deploy_unw_eth
+
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
     nonce = get_nonce(web3=web3, nonce=nonce, private_key=private_key)
@@ -304,6 +334,12 @@ def identity_implementation(
     """Deploy an identity contract without initializing it. Can be used as the implementation for deployed
     identity proxies.
     """
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+    from eth_utils import to_checksum_address
+
+    from tldeploy.identity import deploy_identity_implementation
+
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
     nonce = get_nonce(web3=web3, nonce=nonce, private_key=private_key)
@@ -330,6 +366,11 @@ def identity_proxy_factory(
     jsonrpc: str, gas: int, gas_price: int, nonce: int, keystore: str
 ):
     """Deploy an identity proxy factory, which can be used to create proxies for identity contracts."""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+    from eth_utils import to_checksum_address
+
+    from tldeploy.identity import deploy_identity_proxy_factory
 
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
@@ -360,6 +401,13 @@ def identity_proxy_factory(
 @nonce_option
 @keystore_option
 @currency_network_contract_name_option
+@click.option(
+    "--pipelined",
+    help="Send all transactions back-to-back to predicted contract addresses "
+    "and wait for the receipts at the end. Requires --gas.",
+    is_flag=True,
+    default=False,
+)
 def test(
     jsonrpc: str,
     file: str,
@@ -368,10 +416,26 @@ def test(
     nonce: int,
     keystore: str,
     currency_network_contract_name: str,
+    pipelined: bool,
 ):
     """Deploy three test currency network contracts connected to an exchange contract and an unwrapping ether contract.
     Also deploys an identity proxy factory and an identity implementation contract.
     This can be used for testing"""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import (
+        NetworkSettings,
+        deploy_networks,
+        deploy_networks_pipelined,
+        get_chain_id,
+    )
+    from tldeploy.identity import (
+        deploy_identity_implementation,
+        deploy_identity_proxy_factory,
+    )
+    from tldeploy.pipeline import DeploymentPipeline
 
     expiration_time = 4_102_444_800  # 01/01/2100
 
@@ -414,21 +478,40 @@ def test(
     transaction_options = build_transaction_options(
         gas=gas, gas_price=gas_price, nonce=nonce
     )
-    networks, exchange, unw_eth = deploy_networks(
-        web3,
-        network_settings,
-        currency_network_contract_name=currency_network_contract_name,
-        transaction_options=transaction_options,
-    )
-    identity_implementation = deploy_identity_implementation(
-        web3=web3, transaction_options=transaction_options, private_key=private_key
-    )
-    second_identity_implementation = deploy_identity_implementation(
-        web3=web3, transaction_options=transaction_options, private_key=private_key
-    )
-    identity_proxy_factory = deploy_identity_proxy_factory(
-        web3=web3, transaction_options=transaction_options, private_key=private_key
-    )
+    if pipelined:
+        if gas is None:
+            raise click.BadParameter("--pipelined requires --gas to be set.")
+        pipeline = DeploymentPipeline(
+            web3, transaction_options=transaction_options, private_key=private_key
+        )
+        networks, exchange, unw_eth = deploy_networks_pipelined(
+            pipeline,
+            network_settings,
+            currency_network_contract_name=currency_network_contract_name,
+        )
+        identity_implementation = pipeline.deploy("Identity")
+        second_identity_implementation = pipeline.deploy("Identity")
+        identity_proxy_factory = pipeline.deploy(
+            "IdentityProxyFactory", constructor_args=(get_chain_id(web3),)
+        )
+        pipeline.wait_for_receipts()
+    else:
+        networks, exchange, unw_eth = deploy_networks(
+            web3,
+            network_settings,
+            currency_network_contract_name=currency_network_contract_name,
+            transaction_options=transaction_options,
+            private_key=private_key,
+        )
+        identity_implementation = deploy_identity_implementation(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
+        second_identity_implementation = deploy_identity_implementation(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
+        identity_proxy_factory = deploy_identity_proxy_factory(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
     addresses = dict()
     network_addresses = [network.address for network in networks]
     exchange_address = exchange.address
@@ -500,6 +583,10 @@ def migration(
     It will fetch information about users in the old contract and set them in the one
     The address files should contain currency network addresses with
     address matching from one file to the other from top to bottom"""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+
+    from tldeploy.migration import migrate_networks
 
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
@@ -538,6 +625,9 @@ def verify_migration(
     """Used to verify migration of old currency networks to new ones
     The address files should contain currency network addresses with
     address matching from one file to the other from top to bottom"""
+    from deploy_tools.cli import connect_to_json_rpc
+
+    from tldeploy.migration import verify_networks_migrations
 
     web3 = connect_to_json_rpc(jsonrpc)
 
@@ -574,6 +664,10 @@ def beacon(
     keystore: str,
 ):
     """Used to deploy an owned beacon pointing to an implementation address"""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+
+    from tldeploy.core import deploy_beacon
 
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
@@ -603,6 +697,15 @@ def beacon(
     default="",
     type=click.Path(dir_okay=False, writable=True),
 )
+@click.option(
+    "--registry",
+    "registry_address",
+    help="Address of a currency network registry to migrate all registered networks of, "
+    "instead of the networks in the addresses file",
+    default=None,
+    type=str,
+    callback=validate_address,
+)
 @beacon_address_option
 @proxy_owner_option
 @click.option(
@@ -612,13 +715,23 @@ def beacon(
     default="output.json",
     type=click.Path(dir_okay=False, writable=True),
 )
+@click.option(
+    "--concurrency",
+    help="Number of networks to migrate in parallel. "
+    "Networks already in the output mapping are skipped, so an interrupted run can be restarted.",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+)
 @jsonrpc_option
 @gas_price_option
 @nonce_option
 @keystore_option
 def deploy_and_migrate(
     addresses_file_path: str,
+    registry_address: Optional[str],
     output_file_path: str,
+    concurrency: int,
     beacon_address: str,
     owner_address: str,
     jsonrpc: str,
@@ -626,6 +739,16 @@ def deploy_and_migrate(
     nonce: int,
     keystore: str,
 ):
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+
+    from tldeploy.core import deploy_and_migrate_networks
+
+    if bool(addresses_file_path) == bool(registry_address):
+        raise click.BadParameter(
+            "Exactly one of --addresses-file and --registry has to be given"
+        )
+
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
     nonce = get_nonce(web3=web3, nonce=nonce, private_key=private_key)
@@ -633,14 +756,26 @@ def deploy_and_migrate(
         gas=None, gas_price=gas_price, nonce=nonce
     )
 
-    deploy_and_migrate_networks_from_file(
+    if registry_address is not None:
+        from tldeploy.registry import CurrencyNetworkRegistryClient
+
+        registry_client = CurrencyNetworkRegistryClient(web3, registry_address)
+        registry_client.sync()
+        old_network_addresses = registry_client.network_addresses
+    else:
+        from deploy_tools.files import read_addresses_in_csv
+
+        old_network_addresses = read_addresses_in_csv(addresses_file_path)
+
+    deploy_and_migrate_networks(
         web3=web3,
-        addresses_file_path=addresses_file_path,
+        old_network_addresses=old_network_addresses,
         beacon_address=beacon_address,
         owner_address=owner_address,
         private_key=private_key,
         transaction_options=transaction_options,
         output_file_path=output_file_path,
+        concurrency=concurrency,
     )
 
 
@@ -712,7 +847,7 @@ def currency_network_proxy(
     custom_interests: bool,
     prevent_mediator_interests: bool,
     expiration_time: int,
-    expiration_date: pendulum.DateTime,
+    expiration_date: "pendulum.DateTime",
     beacon_address: str,
     owner_address: str,
     gas: int,
@@ -724,6 +859,12 @@ def currency_network_proxy(
     with custom network settings and proxy owner.
     If the currency network contract is of type AdministrativeProxy,
     one may need to unfreeze it and remove the owner to use it."""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import NetworkSettings, deploy_currency_network_proxy
+
     if custom_interests and default_interest_rate != 0.0:
         raise click.BadParameter(
             "Custom interests can only be set without a"
@@ -823,6 +964,14 @@ def unfreeze_and_remove_owner(
     nonce: int,
     keystore: str,
 ):
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import (
+        build_transaction_options,
+        increase_transaction_options_nonce,
+    )
+
+    from tldeploy.core import remove_owner_of_network, unfreeze_owned_network
+
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
     nonce = get_nonce(web3=web3, nonce=nonce, private_key=private_key)
@@ -843,3 +992,146 @@ def unfreeze_and_remove_owner(
         private_key=private_key,
         currency_network_address=currency_network_address,
     )
+
+
+@cli.command(short_help="Report the value that can move between users of a network.")
+@click.option(
+    "--currency-network",
+    "currency_network_address",
+    help="Address of the currency network",
+    required=True,
+    type=str,
+    callback=validate_address,
+)
+@click.option(
+    "--source",
+    "source_address",
+    help="Address of the user sending the value",
+    required=True,
+    type=str,
+    callback=validate_address,
+)
+@click.option(
+    "--target",
+    "target_addresses",
+    help="Address of a user receiving the value, can be given multiple times. Defaults to all other users.",
+    multiple=True,
+    type=str,
+)
+@click.option(
+    "--fees/--no-fees",
+    "include_fees",
+    help="Whether to compute the value that can be transferred with the fees paid by the source, "
+    "or only the faster max flow without fees",
+    default=True,
+    show_default=True,
+)
+@jsonrpc_option
+def liquidity(
+    currency_network_address: str,
+    source_address: str,
+    target_addresses: Tuple[str, ...],
+    include_fees: bool,
+    jsonrpc: str,
+):
+    """Report the max flow of value from the source to the targets via the trustlines of the
+    currency network, and the value that can be transferred when the source pays the fees."""
+    from deploy_tools.cli import connect_to_json_rpc
+
+    from tldeploy.liquidity import analyze_liquidity
+    from tldeploy.load_contracts import get_contract_interface
+    from tldeploy.network_model import CurrencyNetworkModel
+
+    targets = [
+        validate_address(None, None, target_address)
+        for target_address in target_addresses
+    ]
+
+    web3 = connect_to_json_rpc(jsonrpc)
+    currency_network = web3.eth.contract(
+        address=currency_network_address,
+        abi=get_contract_interface("CurrencyNetwork")["abi"],
+    )
+    block = web3.eth.getBlock("latest")
+    model = CurrencyNetworkModel.from_contract(
+        currency_network, block_identifier=block.number
+    )
+
+    for liquidity in analyze_liquidity(
+        model,
+        source_address,
+        targets or None,
+        timestamp=block.timestamp,
+        include_fees=include_fees,
+    ):
+        line = f"{liquidity.target}: max flow {liquidity.max_flow}"
+        if include_fees:
+            line += (
+                f", transferable {liquidity.transferable_value} with fees {liquidity.fees}"
+                f" over {len(liquidity.transfer_paths)} paths"
+            )
+        click.echo(line)
+
+
+@cli.command(short_help="Execute a deployment plan.")
+@click.argument("plan_file_path", type=click.Path(dir_okay=False, exists=True))
+@click.option(
+    "--state-file",
+    "state_file_path",
+    help="File to persist the progress of the plan to, an existing state is resumed",
+    default="plan-state.json",
+    show_default=True,
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--output",
+    "output_file_path",
+    help="Output file for the deployed addresses per step in json",
+    default="",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@jsonrpc_option
+@gas_option
+@gas_price_option
+@nonce_option
+@keystore_option
+def plan(
+    plan_file_path: str,
+    state_file_path: str,
+    output_file_path: str,
+    jsonrpc: str,
+    gas: int,
+    gas_price: int,
+    nonce: int,
+    keystore: str,
+):
+    """Deploy the contracts and call the functions described in the json plan file PLAN_FILE_PATH.
+    Independent steps of the plan are executed concurrently."""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.transact import build_transaction_options
+
+    from tldeploy.plan import DeploymentPlan, PlanExecutor, PlanState
+
+    deployment_plan = DeploymentPlan.load(plan_file_path)
+
+    web3 = connect_to_json_rpc(jsonrpc)
+    private_key = retrieve_private_key(keystore)
+    nonce = get_nonce(web3=web3, nonce=nonce, private_key=private_key)
+    transaction_options = build_transaction_options(
+        gas=gas, gas_price=gas_price, nonce=nonce
+    )
+
+    addresses = PlanExecutor(
+        web3,
+        deployment_plan,
+        state=PlanState(state_file_path),
+        transaction_options=transaction_options,
+        private_key=private_key,
+    ).run()
+
+    if output_file_path:
+        with open(output_file_path, "w") as outfile:
+            json.dump(addresses, outfile)
+
+    for step_id, address in addresses.items():
+        click.echo(f"{step_id}: {address}")
@@ -0,0 +1,86 @@
+# This file provides prepared contract classes, so that repeated deployments of the same contract
+# do not parse the abi and encode the constructor arguments again
+import collections
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+from web3 import Web3
+
+from tldeploy.load_contracts import contracts
+
+DEFAULT_MAX_CACHED_INITCODES = 256
+
+
+def _hashable(value) -> Optional[Any]:
+    """A hashable version of constructor arguments to use as cache key, None if there is none"""
+    if isinstance(value, (list, tuple)):
+        items = tuple(_hashable(item) for item in value)
+        if any(item is None for item in items):
+            return None
+        return (type(value).__name__,) + items
+    if isinstance(value, dict) or value is None:
+        return None
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return (type(value).__name__, value)
+
+
+class ContractFactory:
+    """The web3 contract class of `contract_name`, with the encoded initcode cached per constructor arguments"""
+
+    def __init__(
+        self,
+        web3: Web3,
+        contract_name: str,
+        *,
+        max_cached_initcodes: int = DEFAULT_MAX_CACHED_INITCODES,
+    ) -> None:
+        contract_interface = contracts[contract_name]
+        self.contract_name = contract_name
+        self.contract = web3.eth.contract(
+            abi=contract_interface["abi"], bytecode=contract_interface["bytecode"]
+        )
+        self.max_cached_initcodes = max_cached_initcodes
+        self._initcodes: "collections.OrderedDict[Tuple, str]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def constructor(self, *constructor_args):
+        return self.contract.constructor(*constructor_args)
+
+    def initcode(self, constructor_args=()) -> str:
+        """The bytecode with the encoded `constructor_args`, i.e. the data of the deployment transaction"""
+        key = _hashable(tuple(constructor_args))
+        if key is None:
+            return self.constructor(*constructor_args).data_in_transaction
+
+        with self._lock:
+            if key in self._initcodes:
+                self._initcodes.move_to_end(key)
+                return self._initcodes[key]
+
+        initcode = self.constructor(*constructor_args).data_in_transaction
+        with self._lock:
+            self._initcodes[key] = initcode
+            if len(self._initcodes) > self.max_cached_initcodes:
+                self._initcodes.popitem(last=False)
+        return initcode
+
+
+_factories: "weakref.WeakKeyDictionary[Web3, Dict[str, ContractFactory]]" = (
+    weakref.WeakKeyDictionary()
+)
+_factories_lock = threading.Lock()
+
+
+def get_contract_factory(web3: Web3, contract_name: str) -> ContractFactory:
+    """The cached `ContractFactory` of `contract_name` for `web3`"""
+    with _factories_lock:
+        factories = _factories.setdefault(web3, {})
+        if contract_name not in factories:
+            factories[contract_name] = ContractFactory(web3, contract_name)
+        return factories[contract_name]
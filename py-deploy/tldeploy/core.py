@@ -2,19 +2,30 @@
 # We like to get rid of the populus dependency and we don't want to compile the
 # contracts when running tests in this project.
 import json
-from typing import Dict
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
 import attr
 import click
-from deploy_tools import deploy_compiled_contract
 from deploy_tools.transact import (
     increase_transaction_options_nonce,
+    send_function_call_transaction,
+    send_transaction,
     wait_for_successful_function_call,
+    wait_for_successful_transaction_receipt,
 )
 from deploy_tools.files import read_addresses_in_csv
+from tldeploy.batch import call_functions
+from tldeploy.contract_factory import get_contract_factory
 from tldeploy.migration import NetworkMigrater
+from tldeploy.pipeline import DeploymentPipeline
+from tldeploy.plan import NonceAllocator
 from web3 import Web3
-from tldeploy.load_contracts import contracts, get_contract_interface
+
+# `contracts` is bound to the contracts compiled for the tests via this module
+from tldeploy.load_contracts import contracts, get_contract_interface  # noqa: F401
 
 from web3.contract import Contract
 
@@ -38,19 +49,58 @@ def deploy(
     transaction_options: Dict = None,
     private_key: bytes = None,
     constructor_args=(),
+    nonce_allocator: NonceAllocator = None,
 ):
     if transaction_options is None:
         transaction_options = {}
 
-    contract_interface = contracts[contract_name]
-    return deploy_compiled_contract(
-        abi=contract_interface["abi"],
-        bytecode=contract_interface["bytecode"],
-        web3=web3,
-        transaction_options=transaction_options,
-        private_key=private_key,
-        constructor_args=constructor_args,
+    factory = get_contract_factory(web3, contract_name)
+    deploy_transaction_options = dict(
+        transaction_options, data=factory.initcode(constructor_args)
     )
+    if nonce_allocator is None:
+        tx_hash = send_transaction(
+            web3=web3,
+            transaction_options=deploy_transaction_options,
+            private_key=private_key,
+        )
+    else:
+        with nonce_allocator.reserve() as nonce:
+            deploy_transaction_options["nonce"] = nonce
+            tx_hash = send_transaction(
+                web3=web3,
+                transaction_options=deploy_transaction_options,
+                private_key=private_key,
+            )
+    receipt = wait_for_successful_transaction_receipt(web3, tx_hash)
+    return factory.contract(receipt["contractAddress"])
+
+
+def _wait_for_successful_function_call(
+    function_call,
+    *,
+    web3,
+    transaction_options: Dict,
+    private_key: bytes = None,
+    nonce_allocator: NonceAllocator = None,
+):
+    """Like `wait_for_successful_function_call`, but takes the nonce from `nonce_allocator` if given,
+    so that several threads can send transactions of the same account"""
+    if nonce_allocator is None:
+        return wait_for_successful_function_call(
+            function_call,
+            web3=web3,
+            transaction_options=transaction_options,
+            private_key=private_key,
+        )
+    with nonce_allocator.reserve() as nonce:
+        tx_hash = send_function_call_transaction(
+            function_call,
+            web3=web3,
+            transaction_options=dict(transaction_options, nonce=nonce),
+            private_key=private_key,
+        )
+    return wait_for_successful_transaction_receipt(web3, tx_hash)
 
 
 def deploy_exchange(
@@ -149,12 +199,36 @@ def deploy_networks(
     network_settings,
     currency_network_contract_name=None,
     transaction_options: Dict = None,
+    private_key: bytes = None,
+    pipelined: bool = False,
 ):
-    exchange = deploy_exchange(web3=web3, transaction_options=transaction_options)
+    """Deploy an exchange, an unwrapping ether and currency networks connected to the exchange.
+
+    With `pipelined` all transactions are sent back-to-back to the predicted contract addresses
+    and their receipts are only awaited at the end. This needs the gas limit in `transaction_options`.
+    """
+    if pipelined:
+        if transaction_options is None:
+            transaction_options = {}
+        pipeline = DeploymentPipeline(
+            web3, transaction_options=transaction_options, private_key=private_key
+        )
+        networks, exchange, unw_eth = deploy_networks_pipelined(
+            pipeline,
+            network_settings,
+            currency_network_contract_name=currency_network_contract_name,
+        )
+        pipeline.wait_for_receipts()
+        return networks, exchange, unw_eth
+
+    exchange = deploy_exchange(
+        web3=web3, transaction_options=transaction_options, private_key=private_key
+    )
     unw_eth = deploy_unw_eth(
         web3=web3,
         exchange_address=exchange.address,
         transaction_options=transaction_options,
+        private_key=private_key,
     )
 
     networks = [
@@ -163,6 +237,7 @@ def deploy_networks(
             exchange_address=exchange.address,
             currency_network_contract_name=currency_network_contract_name,
             transaction_options=transaction_options,
+            private_key=private_key,
             network_settings=network_setting,
         )
         for network_setting in network_settings
@@ -171,6 +246,32 @@ def deploy_networks(
     return networks, exchange, unw_eth
 
 
+def deploy_networks_pipelined(
+    pipeline: DeploymentPipeline,
+    network_settings,
+    currency_network_contract_name=None,
+):
+    """Send the transactions of `deploy_networks` via `pipeline` without waiting for the receipts"""
+    if currency_network_contract_name is None:
+        currency_network_contract_name = "CurrencyNetwork"
+
+    exchange = pipeline.deploy("Exchange")
+    unw_eth = pipeline.deploy("UnwEth")
+    pipeline.transact(unw_eth.functions.addAuthorizedAddress(exchange.address))
+
+    networks = []
+    for network_setting in network_settings:
+        network = pipeline.deploy(currency_network_contract_name)
+        pipeline.transact(
+            _currency_network_init_call(
+                network, network_setting, authorized_addresses=[exchange.address]
+            )
+        )
+        networks.append(network)
+
+    return networks, exchange, unw_eth
+
+
 def deploy_identity(
     web3, owner_address, chain_id=None, transaction_options: Dict = None
 ):
@@ -232,6 +333,7 @@ def deploy_currency_network_proxy(
     owner_address,
     private_key: bytes = None,
     transaction_options: Dict = None,
+    nonce_allocator: NonceAllocator = None,
 ):
     verify_owner_not_deployer(web3, owner_address, private_key)
 
@@ -244,15 +346,17 @@ def deploy_currency_network_proxy(
         transaction_options=transaction_options,
         private_key=private_key,
         constructor_args=(beacon_address, ""),
+        nonce_allocator=nonce_allocator,
     )
     increase_transaction_options_nonce(transaction_options)
 
     change_owner = proxy.functions.changeAdmin(owner_address)
-    wait_for_successful_function_call(
+    _wait_for_successful_function_call(
         change_owner,
         web3=web3,
         transaction_options=transaction_options,
         private_key=private_key,
+        nonce_allocator=nonce_allocator,
     )
     increase_transaction_options_nonce(transaction_options)
     assert proxy.functions.admin().call({"from": owner_address}) == owner_address
@@ -270,6 +374,7 @@ def deploy_currency_network_proxy(
         authorized_addresses=authorized_addresses,
         transaction_options=transaction_options,
         private_key=private_key,
+        nonce_allocator=nonce_allocator,
     )
     increase_transaction_options_nonce(transaction_options)
 
@@ -298,6 +403,7 @@ def init_currency_network(
     authorized_addresses=None,
     transaction_options,
     private_key,
+    nonce_allocator: NonceAllocator = None,
 ):
     if transaction_options is None:
         transaction_options = {}
@@ -306,7 +412,23 @@ def init_currency_network(
     if exchange_address is not None:
         authorized_addresses.append(exchange_address)
 
-    init_call = currency_network.functions.init(
+    init_call = _currency_network_init_call(
+        currency_network, network_settings, authorized_addresses
+    )
+
+    _wait_for_successful_function_call(
+        init_call,
+        web3=web3,
+        transaction_options=transaction_options,
+        private_key=private_key,
+        nonce_allocator=nonce_allocator,
+    )
+
+
+def _currency_network_init_call(
+    currency_network, network_settings: NetworkSettings, authorized_addresses
+):
+    return currency_network.functions.init(
         network_settings.name,
         network_settings.symbol,
         network_settings.decimals,
@@ -318,51 +440,158 @@ def init_currency_network(
         authorized_addresses,
     )
 
-    wait_for_successful_function_call(
-        init_call,
+
+def deploy_and_migrate_networks_from_file(
+    *,
+    web3,
+    beacon_address: str,
+    owner_address: str,
+    addresses_file_path: str,
+    private_key: bytes = None,
+    transaction_options: Dict = None,
+    output_file_path: str,
+    concurrency: int = 1,
+):
+    """Deploy new owned currency network proxies and migrate the old networks in the csv file to it"""
+    deploy_and_migrate_networks(
         web3=web3,
-        transaction_options=transaction_options,
+        beacon_address=beacon_address,
+        owner_address=owner_address,
+        old_network_addresses=read_addresses_in_csv(addresses_file_path),
         private_key=private_key,
+        transaction_options=transaction_options,
+        output_file_path=output_file_path,
+        concurrency=concurrency,
     )
 
 
-def deploy_and_migrate_networks_from_file(
+def deploy_and_migrate_networks(
     *,
     web3,
     beacon_address: str,
     owner_address: str,
-    addresses_file_path: str,
+    old_network_addresses: List[str],
     private_key: bytes = None,
     transaction_options: Dict = None,
     output_file_path: str,
+    concurrency: int = 1,
 ):
-    """Deploy new owned currency network proxies and migrate old networks to it"""
+    """Deploy new owned currency network proxies and migrate old networks to it
+
+    The mapping of old to new addresses is written to `output_file_path` after every migrated network.
+    Networks that are already in the mapping are skipped, so that an interrupted run can be restarted.
+    With a `concurrency` above one, that many networks are migrated in parallel, sharing the nonces
+    of the sender."""
     if transaction_options is None:
         transaction_options = {}
+    if concurrency < 1:
+        raise ValueError(f"Concurrency has to be at least 1, got {concurrency}")
 
     verify_owner_not_deployer(web3, owner_address, private_key)
     currency_network_interface = get_contract_interface("CurrencyNetwork")
-    network_addresses_mapping = {}
+    network_addresses_mapping = read_network_addresses_mapping(output_file_path)
+    mapping_lock = threading.Lock()
+
+    old_networks = []
+    for old_address in old_network_addresses:
+        if old_address in network_addresses_mapping:
+            click.secho(
+                f"Skipping {old_address}, already migrated to {network_addresses_mapping[old_address]}",
+                fg="blue",
+            )
+            continue
+        old_networks.append(
+            web3.eth.contract(
+                abi=currency_network_interface["abi"], address=old_address
+            )
+        )
+    old_networks_settings = NetworkSettingsReader(web3).get_network_settings(
+        old_networks
+    )
 
-    for old_address in read_addresses_in_csv(addresses_file_path):
-        old_network = web3.eth.contract(
-            abi=currency_network_interface["abi"], address=old_address
+    nonce_allocator = None
+    if concurrency > 1:
+        if private_key is not None:
+            sender = web3.eth.account.from_key(private_key).address
+        else:
+            sender = transaction_options.get(
+                "from", web3.eth.defaultAccount or web3.eth.accounts[0]
+            )
+        nonce_allocator = NonceAllocator(
+            web3, sender, transaction_options.get("nonce", None)
         )
+
+    def migrate(old_network, network_settings):
+        if nonce_allocator is None:
+            options = transaction_options
+        else:
+            options = {
+                key: value
+                for key, value in transaction_options.items()
+                if key != "nonce"
+            }
         new_network = deploy_and_migrate_network(
             web3=web3,
             beacon_address=beacon_address,
             owner_address=owner_address,
             old_network=old_network,
             private_key=private_key,
-            transaction_options=transaction_options,
+            transaction_options=options,
+            network_settings=network_settings,
+            nonce_allocator=nonce_allocator,
         )
-        network_addresses_mapping[old_network.address] = new_network.address
+        with mapping_lock:
+            network_addresses_mapping[old_network.address] = new_network.address
+            write_network_addresses_mapping(output_file_path, network_addresses_mapping)
+
+    if nonce_allocator is None:
+        for old_network, network_settings in zip(old_networks, old_networks_settings):
+            migrate(old_network, network_settings)
+    else:
+        failed = threading.Event()
+
+        def migrate_unless_failed(old_network, network_settings):
+            if failed.is_set():
+                return
+            try:
+                migrate(old_network, network_settings)
+            except Exception:
+                failed.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(migrate_unless_failed, old_network, network_settings)
+                for old_network, network_settings in zip(
+                    old_networks, old_networks_settings
+                )
+            ]
+        for future in futures:
+            # raises the first error of a migration
+            future.result()
+        if "nonce" in transaction_options:
+            transaction_options["nonce"] = nonce_allocator.nonce
+
+    write_network_addresses_mapping(output_file_path, network_addresses_mapping)
+    click.secho(
+        "Wrote mapping {old_address: new_address} to " + output_file_path, fg="blue"
+    )
+
+
+def read_network_addresses_mapping(file_path: str) -> Dict[str, str]:
+    """Read the mapping of old to new network addresses, empty if the file does not exist yet"""
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path) as file:
+        return json.load(file)
 
-    with open(output_file_path, "w") as file:
-        json.dump(network_addresses_mapping, file)
-        click.secho(
-            "Wrote mapping {old_address: new_address} to " + output_file_path, fg="blue"
-        )
+
+def write_network_addresses_mapping(file_path: str, mapping: Dict[str, str]) -> None:
+    """Write the mapping of old to new network addresses, replacing the file atomically"""
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(mapping, file)
+    os.replace(temporary_path, file_path)
 
 
 def deploy_and_migrate_network(
@@ -373,13 +602,18 @@ def deploy_and_migrate_network(
     old_network: Contract,
     private_key: bytes = None,
     transaction_options: Dict = None,
+    network_settings: NetworkSettings = None,
+    nonce_allocator: NonceAllocator = None,
 ):
-    """Deploy a new owned currency network proxy and migrate the old networks to it"""
+    """Deploy a new owned currency network proxy and migrate the old networks to it
+    The settings of the old network are read if `network_settings` is not given.
+    If `nonce_allocator` is given, the nonces are taken from it instead of `transaction_options`"""
     if transaction_options is None:
         transaction_options = {}
 
-    network_settings = get_network_settings(old_network)
-    network_settings.expiration_time = 0
+    if network_settings is None:
+        network_settings = get_network_settings(old_network)
+    network_settings = attr.evolve(network_settings, expiration_time=0)
 
     new_network = deploy_currency_network_proxy(
         web3=web3,
@@ -388,6 +622,7 @@ def deploy_and_migrate_network(
         owner_address=owner_address,
         private_key=private_key,
         transaction_options=transaction_options,
+        nonce_allocator=nonce_allocator,
     )
     new_address = new_network.address
     click.secho(
@@ -396,7 +631,12 @@ def deploy_and_migrate_network(
 
     click.secho(f"Migrating {old_network.address} to {new_address}", fg="green")
     NetworkMigrater(
-        web3, old_network.address, new_network.address, transaction_options, private_key
+        web3,
+        old_network.address,
+        new_network.address,
+        transaction_options,
+        private_key,
+        nonce_allocator=nonce_allocator,
     ).migrate_network()
     click.secho(
         f"Migration of {old_network.address} to {new_address} complete", fg="green"
@@ -405,16 +645,96 @@ def deploy_and_migrate_network(
 
 
 def get_network_settings(currency_network):
-    return NetworkSettings(
-        name=currency_network.functions.name().call(),
-        symbol=currency_network.functions.symbol().call(),
-        decimals=currency_network.functions.decimals().call(),
-        fee_divisor=currency_network.functions.capacityImbalanceFeeDivisor().call(),
-        default_interest_rate=currency_network.functions.defaultInterestRate().call(),
-        custom_interests=currency_network.functions.customInterests().call(),
-        expiration_time=currency_network.functions.expirationTime().call(),
-        prevent_mediator_interests=currency_network.functions.preventMediatorInterests().call(),
-    )
+    return NetworkSettingsReader(currency_network.web3).get_network_settings(
+        [currency_network]
+    )[0]
+
+
+class NetworkSettingsReader:
+    """Reads the settings of many currency networks with batched calls.
+
+    The settings of frozen networks cannot change anymore and are cached by address.
+    With `immutable` the settings of all networks are cached, e.g. for networks that are not upgradeable.
+    """
+
+    def __init__(self, web3, *, immutable: bool = False) -> None:
+        self.web3 = web3
+        self.immutable = immutable
+        self._cache: Dict[str, NetworkSettings] = {}
+
+    def get_network_settings(self, currency_networks) -> List[NetworkSettings]:
+        """The settings of every network, the networks not in the cache are read in one batch"""
+        currency_networks = list(currency_networks)
+        network_settings: Dict[str, NetworkSettings] = {
+            network.address: self._cache[network.address]
+            for network in currency_networks
+            if network.address in self._cache
+        }
+        uncached_networks = list(
+            {
+                network.address: network
+                for network in currency_networks
+                if network.address not in network_settings
+            }.values()
+        )
+        results = call_functions(
+            self.web3,
+            [
+                function_call
+                for network in uncached_networks
+                for function_call in _network_settings_function_calls(network)
+            ],
+        )
+        for index, network in enumerate(uncached_networks):
+            start = index * NETWORK_SETTINGS_CALLS
+            end = start + NETWORK_SETTINGS_CALLS
+            (
+                name,
+                symbol,
+                decimals,
+                fee_divisor,
+                default_interest_rate,
+                custom_interests,
+                expiration_time,
+                prevent_mediator_interests,
+                is_network_frozen,
+            ) = results[start:end]
+            network_settings[network.address] = NetworkSettings(
+                name=name,
+                symbol=symbol,
+                decimals=decimals,
+                fee_divisor=fee_divisor,
+                default_interest_rate=default_interest_rate,
+                custom_interests=custom_interests,
+                expiration_time=expiration_time,
+                prevent_mediator_interests=prevent_mediator_interests,
+            )
+            if self.immutable or is_network_frozen:
+                self._cache[network.address] = network_settings[network.address]
+
+        # copies, so that callers can modify the settings without changing the cache
+        return [
+            attr.evolve(network_settings[network.address])
+            for network in currency_networks
+        ]
+
+
+NETWORK_SETTINGS_CALLS = 9
+
+
+def _network_settings_function_calls(currency_network):
+    functions = currency_network.functions
+    return [
+        functions.name(),
+        functions.symbol(),
+        functions.decimals(),
+        functions.capacityImbalanceFeeDivisor(),
+        functions.defaultInterestRate(),
+        functions.customInterests(),
+        functions.expirationTime(),
+        functions.preventMediatorInterests(),
+        functions.isNetworkFrozen(),
+    ]
 
 
 def unfreeze_owned_network(
@@ -0,0 +1,253 @@
+# This file provides an off-chain ledger of the debts tracked by currency networks, updated incrementally from events
+#
+# A `DebtUpdate` event carries the new total debt between two users, so the ledger stores only the current debt of
+# every pair of users and the last block it applied the events of, and an update only applies the events after it.
+# Every debt is stored once in the direction it is owed, with indexes by debtor and by creditor, so the debts of a
+# user are found without going over all debts like `DebtTracking.getDebtorsOfUser` does on chain.
+# Debts going around in a cycle can be netted, which lowers every debt of the cycle by the smallest one of them
+# without changing what any user owes in total.
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import attr
+from eth_utils import to_checksum_address
+
+from tldeploy.event_store import EventStore
+from tldeploy.events import DecodedLog
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS debts (
+    currency_network TEXT NOT NULL,
+    debtor TEXT NOT NULL,
+    creditor TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (currency_network, debtor, creditor)
+);
+CREATE INDEX IF NOT EXISTS debts_by_creditor ON debts (currency_network, creditor);
+CREATE TABLE IF NOT EXISTS update_cursors (
+    currency_network TEXT PRIMARY KEY,
+    last_applied_block INTEGER NOT NULL
+);
+"""
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class DebtCycle:
+    """A cycle of debts where every user of `path` owes `value` to the next one, the last user being the first"""
+
+    path: List[str]
+    value: int
+
+
+class DebtLedger:
+    """Stores the debts of currency networks in the SQLite database at `database_path`.
+
+    Debts are positive values owed by the debtor to the creditor, in SQLite they are stored as text,
+    because debts are int256 values on chain.
+    """
+
+    def __init__(self, database_path: str = ":memory:") -> None:
+        self.connection = sqlite3.connect(database_path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def last_applied_block(self, currency_network_address: str) -> Optional[int]:
+        """The last block up to which the debt updates of the currency network are applied,
+        or None if none were applied"""
+        row = self.connection.execute(
+            "SELECT last_applied_block FROM update_cursors WHERE currency_network = ?",
+            (to_checksum_address(currency_network_address),),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def update(
+        self,
+        event_store: EventStore,
+        currency_network_address: str,
+        *,
+        confirmed_only: bool = True,
+    ) -> int:
+        """Applies the debt updates of the currency network in `event_store` after the last applied block
+        and returns their number. The event store needs to be synced beforehand.
+
+        With `confirmed_only`, only the debt updates of blocks below the confirmation depth of the event
+        store are applied, so that the ledger never has to roll back debt updates of orphaned blocks.
+        """
+        last_block = event_store.last_synced_block(currency_network_address)
+        if confirmed_only:
+            last_confirmed_block = event_store.last_confirmed_block()
+            if last_block is None or last_confirmed_block is None:
+                last_block = None
+            else:
+                last_block = min(last_block, last_confirmed_block)
+        last_applied_block = self.last_applied_block(currency_network_address)
+        if last_block is None or (
+            last_applied_block is not None and last_block <= last_applied_block
+        ):
+            return 0
+
+        debt_updates = event_store.get_logs(
+            address=currency_network_address,
+            event="DebtUpdate",
+            from_block=0 if last_applied_block is None else last_applied_block + 1,
+            to_block=last_block,
+        )
+        self.apply_debt_updates(currency_network_address, debt_updates, last_block)
+        return len(debt_updates)
+
+    def apply_debt_updates(
+        self,
+        currency_network_address: str,
+        debt_updates: Iterable[DecodedLog],
+        last_block: int,
+    ) -> None:
+        """Applies `debt_updates` of the currency network, which need to be all debt updates
+        after the last applied block up to `last_block`, ordered by block and log index"""
+        currency_network_address = to_checksum_address(currency_network_address)
+        with self.connection:
+            for debt_update in debt_updates:
+                debtor = debt_update.args.debtor
+                creditor = debt_update.args.creditor
+                new_debt = debt_update.args.newDebt
+                self.connection.execute(
+                    "DELETE FROM debts WHERE currency_network = ? AND "
+                    "((debtor = ? AND creditor = ?) OR (debtor = ? AND creditor = ?))",
+                    (currency_network_address, debtor, creditor, creditor, debtor),
+                )
+                if new_debt < 0:
+                    debtor, creditor, new_debt = creditor, debtor, -new_debt
+                if new_debt != 0:
+                    self.connection.execute(
+                        "INSERT INTO debts VALUES (?, ?, ?, ?)",
+                        (currency_network_address, debtor, creditor, str(new_debt)),
+                    )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO update_cursors VALUES (?, ?)",
+                (currency_network_address, last_block),
+            )
+
+    def get_debt(
+        self, currency_network_address: str, debtor: str, creditor: str
+    ) -> int:
+        """The debt of `debtor` to `creditor`, negative if `creditor` owes `debtor`"""
+        debtor = to_checksum_address(debtor)
+        creditor = to_checksum_address(creditor)
+        rows = self.connection.execute(
+            "SELECT debtor, value FROM debts WHERE currency_network = ? AND "
+            "((debtor = ? AND creditor = ?) OR (debtor = ? AND creditor = ?))",
+            (
+                to_checksum_address(currency_network_address),
+                debtor,
+                creditor,
+                creditor,
+                debtor,
+            ),
+        ).fetchall()
+        for row_debtor, value in rows:
+            return int(value) if row_debtor == debtor else -int(value)
+        return 0
+
+    def get_debts_of_debtor(
+        self, currency_network_address: str, debtor: str
+    ) -> Dict[str, int]:
+        """The debts `debtor` owes by creditors"""
+        return {
+            creditor: int(value)
+            for creditor, value in self.connection.execute(
+                "SELECT creditor, value FROM debts WHERE currency_network = ? AND debtor = ?",
+                (
+                    to_checksum_address(currency_network_address),
+                    to_checksum_address(debtor),
+                ),
+            )
+        }
+
+    def get_debts_of_creditor(
+        self, currency_network_address: str, creditor: str
+    ) -> Dict[str, int]:
+        """The debts owed to `creditor` by debtors"""
+        return {
+            debtor: int(value)
+            for debtor, value in self.connection.execute(
+                "SELECT debtor, value FROM debts WHERE currency_network = ? AND creditor = ?",
+                (
+                    to_checksum_address(currency_network_address),
+                    to_checksum_address(creditor),
+                ),
+            )
+        }
+
+    def get_all_debts(
+        self, currency_network_address: str
+    ) -> Dict[Tuple[str, str], int]:
+        """All debts of the currency network by (debtor, creditor)"""
+        return {
+            (debtor, creditor): int(value)
+            for debtor, creditor, value in self.connection.execute(
+                "SELECT debtor, creditor, value FROM debts WHERE currency_network = ?",
+                (to_checksum_address(currency_network_address),),
+            )
+        }
+
+    def netting_cycles(self, currency_network_address: str) -> List[DebtCycle]:
+        """The cycles netting the debts of the currency network, see `find_netting_cycles`"""
+        return find_netting_cycles(self.get_all_debts(currency_network_address))
+
+
+def find_netting_cycles(debts: Dict[Tuple[str, str], int]) -> List[DebtCycle]:
+    """Cycles of the positive `debts` by (debtor, creditor) that can be netted one after the other,
+    until no cycle of debts is left.
+
+    Netting a cycle removes at least one debt, so at most as many cycles as debts are found.
+    """
+    remaining: Dict[str, Dict[str, int]] = {}
+    for (debtor, creditor), value in debts.items():
+        if value < 0:
+            raise ValueError("Debts need to be positive.")
+        if value > 0:
+            remaining.setdefault(debtor, {})[creditor] = value
+
+    cycles: List[DebtCycle] = []
+    while True:
+        path = _find_cycle(remaining)
+        if path is None:
+            return cycles
+        value = min(
+            remaining[debtor][creditor] for debtor, creditor in zip(path, path[1:])
+        )
+        for debtor, creditor in zip(path, path[1:]):
+            remaining[debtor][creditor] -= value
+            if remaining[debtor][creditor] == 0:
+                del remaining[debtor][creditor]
+        cycles.append(DebtCycle(path=path, value=value))
+
+
+def _find_cycle(debts: Dict[str, Dict[str, int]]) -> Optional[List[str]]:
+    """A cycle of debts from debtors to creditors with a depth first search, or None if there is none"""
+    finished = set()
+    for start in sorted(debts):
+        if start in finished:
+            continue
+        # the path from `start` to the current debtor, with the creditors still to visit of every debtor on it
+        path = [start]
+        positions = {start: 0}
+        creditors_to_visit = [iter(sorted(debts.get(start, {})))]
+        while creditors_to_visit:
+            creditor = next(creditors_to_visit[-1], None)
+            if creditor is None:
+                debtor = path.pop()
+                del positions[debtor]
+                finished.add(debtor)
+                creditors_to_visit.pop()
+                continue
+            if creditor in positions:
+                cycle_start = positions[creditor]
+                return path[cycle_start:] + [creditor]
+            if creditor in finished:
+                continue
+            positions[creditor] = len(path)
+            path.append(creditor)
+            creditors_to_visit.append(iter(sorted(debts.get(creditor, {}))))
+    return None
@@ -0,0 +1,428 @@
+# This file provides a local store of contract logs in SQLite, synced incrementally from a node
+#
+# The raw logs are stored with their topics in separate indexed columns, so logs can be queried by the
+# indexed arguments of their events, and decoded with a `LogDecoder` when read. For every synced contract
+# the store keeps the last synced block, the next sync only fetches the logs of the blocks after it.
+#
+# To handle reorgs, the store keeps the hashes of the blocks within the confirmation depth below the last
+# synced block. Before every sync, they are compared to the hashes of the node from the last block down,
+# and the logs of orphaned blocks are removed by rolling back to the last block still on the chain.
+# Logs of blocks within the confirmation depth are only stored if they are of the checkpointed block, so
+# a reorg in the middle of a sync is noticed and the sync is restarted.
+import collections
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from eth_utils import to_checksum_address
+from web3.exceptions import BlockNotFound
+
+from tldeploy.events import (
+    DecodedLog,
+    LogDecoder,
+    _to_bytes,
+    _to_int,
+    get_raw_logs,
+    load_merged_event_abis,
+)
+from tldeploy.load_contracts import contracts
+
+DEFAULT_MAX_BLOCKS_PER_REQUEST = 10_000
+DEFAULT_CONFIRMATION_DEPTH = 12
+MAX_SYNC_ATTEMPTS = 3
+MAX_TOPICS = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_hash BLOB,
+    transaction_hash BLOB,
+    address TEXT NOT NULL,
+    event TEXT,
+    topic_count INTEGER NOT NULL,
+    topic0 BLOB,
+    topic1 BLOB,
+    topic2 BLOB,
+    topic3 BLOB,
+    data BLOB NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS logs_by_address ON logs (address, event, block_number);
+CREATE INDEX IF NOT EXISTS logs_by_topic1 ON logs (topic1, topic0);
+CREATE INDEX IF NOT EXISTS logs_by_topic2 ON logs (topic2, topic0);
+CREATE INDEX IF NOT EXISTS logs_by_topic3 ON logs (topic3, topic0);
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    address TEXT PRIMARY KEY,
+    last_synced_block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS block_hashes (
+    block_number INTEGER PRIMARY KEY,
+    block_hash BLOB NOT NULL
+);
+"""
+
+
+class ReorgTooDeep(Exception):
+    """Raised when blocks deeper than the confirmation depth of the event store were orphaned"""
+
+    pass
+
+
+class ChainChangedDuringSync(Exception):
+    """Raised when the chain was reorganized during every attempt to sync"""
+
+    pass
+
+
+def default_log_decoder() -> LogDecoder:
+    """A decoder for the events of all versions of currency networks, identities and the exchange"""
+    return LogDecoder(
+        load_merged_event_abis()
+        + contracts["Identity"]["abi"]
+        + contracts["Exchange"]["abi"]
+    )
+
+
+class EventStore:
+    """Stores the logs of contracts in the SQLite database at `database_path`.
+
+    The logs are decoded with `log_decoder`, by default with the events of currency networks,
+    identities and the exchange. Logs of unknown events are stored, but not returned by queries.
+    Reorgs of at most `confirmation_depth` blocks are rolled back automatically when syncing.
+    """
+
+    def __init__(
+        self,
+        database_path: str = ":memory:",
+        *,
+        log_decoder: LogDecoder = None,
+        confirmation_depth: int = DEFAULT_CONFIRMATION_DEPTH,
+    ) -> None:
+        if log_decoder is None:
+            log_decoder = default_log_decoder()
+        self.log_decoder = log_decoder
+        self.confirmation_depth = confirmation_depth
+        self.connection = sqlite3.connect(database_path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def last_synced_block(self, address: str) -> Optional[int]:
+        """The last block up to which the logs of `address` are stored, or None if it was never synced"""
+        row = self.connection.execute(
+            "SELECT last_synced_block FROM sync_cursors WHERE address = ?",
+            (to_checksum_address(address),),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def last_block(self) -> Optional[int]:
+        """The highest block any contract was synced up to, or None if nothing was synced"""
+        return self.connection.execute(
+            "SELECT MAX(block_number) FROM block_hashes"
+        ).fetchone()[0]
+
+    def last_confirmed_block(self) -> Optional[int]:
+        """The highest synced block that is at least `confirmation_depth` blocks deep"""
+        last_block = self.last_block()
+        if last_block is None:
+            return None
+        return last_block - self.confirmation_depth
+
+    def rollback(self, block_number: int) -> None:
+        """Removes everything synced after `block_number`"""
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM logs WHERE block_number > ?", (block_number,)
+            )
+            self.connection.execute(
+                "DELETE FROM block_hashes WHERE block_number > ?", (block_number,)
+            )
+            self.connection.execute(
+                "UPDATE sync_cursors SET last_synced_block = ? WHERE last_synced_block > ?",
+                (block_number, block_number),
+            )
+
+    def sync(
+        self,
+        web3,
+        addresses: Iterable[str],
+        *,
+        to_block: Union[int, str] = "latest",
+        max_blocks_per_request: int = DEFAULT_MAX_BLOCKS_PER_REQUEST,
+    ) -> int:
+        """Fetches the logs of `addresses` after their last synced block up to `to_block`
+        and returns the number of new logs.
+
+        Addresses synced up to the same block are fetched together, with requests for
+        at most `max_blocks_per_request` blocks. Orphaned blocks are rolled back first.
+        Raises `ReorgTooDeep` if the chain changed below the confirmation depth.
+        """
+        addresses = list(addresses)
+        number_of_logs = 0
+        for attempt in range(1, MAX_SYNC_ATTEMPTS + 1):
+            try:
+                for number_of_chunk_logs in self._sync_chunks(
+                    web3, addresses, to_block, max_blocks_per_request
+                ):
+                    number_of_logs += number_of_chunk_logs
+                break
+            except ChainChangedDuringSync:
+                if attempt == MAX_SYNC_ATTEMPTS:
+                    raise
+        return number_of_logs
+
+    def _sync_chunks(
+        self,
+        web3,
+        addresses: Iterable[str],
+        to_block: Union[int, str],
+        max_blocks_per_request: int,
+    ) -> Iterator[int]:
+        """Syncs the chunks of blocks one after the other, yielding the number of new logs of every chunk"""
+        self._rollback_orphaned_blocks(web3)
+        last_block = web3.eth.blockNumber if to_block == "latest" else int(to_block)
+        addresses_by_cursor: Dict[Optional[int], List[str]] = collections.defaultdict(
+            list
+        )
+        for address in set(map(to_checksum_address, addresses)):
+            addresses_by_cursor[self.last_synced_block(address)].append(address)
+
+        for cursor, cursor_addresses in addresses_by_cursor.items():
+            from_block = 0 if cursor is None else cursor + 1
+            for start in range(from_block, last_block + 1, max_blocks_per_request):
+                end = min(start + max_blocks_per_request - 1, last_block)
+                # the hashes are fetched before the logs, so that the logs of blocks orphaned in between
+                # either carry other hashes or are found missing with the orphaned blocks on the next sync
+                block_hashes = self._fetch_block_hashes(
+                    web3, max(start, last_block - self.confirmation_depth), end
+                )
+                raw_logs = get_raw_logs(
+                    web3,
+                    address=sorted(cursor_addresses),
+                    from_block=start,
+                    to_block=end,
+                )
+                # store the logs and move the cursors in one transaction
+                with self.connection:
+                    number_of_logs = self._insert_logs(raw_logs)
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO block_hashes VALUES (?, ?)",
+                        block_hashes.items(),
+                    )
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO sync_cursors (address, last_synced_block) VALUES (?, ?)",
+                        [(address, end) for address in cursor_addresses],
+                    )
+                    if self._has_logs_of_other_blocks(start, end):
+                        raise ChainChangedDuringSync(
+                            f"The chain changed while syncing blocks {start} to {end}."
+                        )
+                    self.connection.execute(
+                        "DELETE FROM block_hashes WHERE block_number < "
+                        "(SELECT MAX(block_number) FROM block_hashes) - ?",
+                        (self.confirmation_depth,),
+                    )
+                yield number_of_logs
+
+    def _fetch_block_hashes(self, web3, start: int, end: int) -> Dict[int, bytes]:
+        """The hashes of the blocks from `start` to `end` that are not yet in the store"""
+        stored_block_numbers = {
+            block_number
+            for (block_number,) in self.connection.execute(
+                "SELECT block_number FROM block_hashes WHERE block_number BETWEEN ? AND ?",
+                (start, end),
+            )
+        }
+        block_hashes = {}
+        for block_number in range(start, end + 1):
+            if block_number in stored_block_numbers:
+                continue
+            block_hash = _get_block_hash(web3, block_number)
+            if block_hash is None:
+                raise ChainChangedDuringSync(f"Block {block_number} disappeared.")
+            block_hashes[block_number] = block_hash
+        return block_hashes
+
+    def _has_logs_of_other_blocks(self, start: int, end: int) -> bool:
+        """Whether stored logs from `start` to `end` are of other blocks than the stored block hashes"""
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM logs JOIN block_hashes USING (block_number) "
+                "WHERE block_number BETWEEN ? AND ? "
+                "AND logs.block_hash != block_hashes.block_hash LIMIT 1",
+                (start, end),
+            ).fetchone()
+            is not None
+        )
+
+    def _rollback_orphaned_blocks(self, web3) -> None:
+        stored_block_hashes = self.connection.execute(
+            "SELECT block_number, block_hash FROM block_hashes ORDER BY block_number DESC"
+        ).fetchall()
+        for index, (block_number, block_hash) in enumerate(stored_block_hashes):
+            if _get_block_hash(web3, block_number) == block_hash:
+                if index > 0:
+                    self.rollback(block_number)
+                return
+        if stored_block_hashes:
+            raise ReorgTooDeep(
+                f"All blocks from {stored_block_hashes[-1][0]} on were orphaned, "
+                f"more than the confirmation depth of {self.confirmation_depth}."
+            )
+
+    def get_logs(
+        self,
+        *,
+        address: Union[str, Sequence[str]] = None,
+        event: str = None,
+        argument_filters: Dict[str, Any] = None,
+        from_block: int = 0,
+        to_block: int = None,
+        confirmed_only: bool = False,
+    ) -> List[DecodedLog]:
+        """The stored logs ordered by block and log index, filtered by the contract `address`,
+        the `event` name and the values of indexed arguments by the field names of the decoded arguments.
+        With `confirmed_only`, logs of blocks within the confirmation depth are left out."""
+        conditions = ["block_number >= ?"]
+        parameters: List[Any] = [from_block]
+        if to_block is not None:
+            conditions.append("block_number <= ?")
+            parameters.append(to_block)
+        if confirmed_only:
+            last_confirmed_block = self.last_confirmed_block()
+            conditions.append("block_number <= ?")
+            parameters.append(
+                -1 if last_confirmed_block is None else last_confirmed_block
+            )
+        if address is not None:
+            addresses = [address] if isinstance(address, str) else list(address)
+            conditions.append(f"address IN ({', '.join('?' * len(addresses))})")
+            parameters.extend(map(to_checksum_address, addresses))
+        if event is not None:
+            event_conditions = []
+            for decoder in self.log_decoder.decoders(event):
+                event_condition = ["topic0 = ?", "topic_count = ?"]
+                parameters.extend([decoder.topic, decoder.number_of_topics])
+                for position, topic in enumerate(
+                    decoder.topics_filter(argument_filters or {}), start=1
+                ):
+                    if topic is not None:
+                        event_condition.append(f"topic{position} = ?")
+                        parameters.append(topic)
+                event_conditions.append(f"({' AND '.join(event_condition)})")
+            if not event_conditions:
+                raise ValueError(f"Unknown event {event}")
+            conditions.append(f"({' OR '.join(event_conditions)})")
+        elif argument_filters:
+            raise ValueError("Filtering by arguments needs the event to be given.")
+
+        rows = self.connection.execute(
+            "SELECT block_number, log_index, transaction_hash, address, "
+            "topic0, topic1, topic2, topic3, data FROM logs "
+            f"WHERE {' AND '.join(conditions)} ORDER BY block_number, log_index",
+            parameters,
+        )
+        decoded_logs = []
+        for (
+            block_number,
+            log_index,
+            transaction_hash,
+            log_address,
+            *topics,
+            data,
+        ) in rows:
+            decoded_log = self.log_decoder.decode_log(
+                {
+                    "topics": [topic for topic in topics if topic is not None],
+                    "data": data,
+                    "address": log_address,
+                    "blockNumber": block_number,
+                    "logIndex": log_index,
+                    "transactionHash": transaction_hash,
+                }
+            )
+            if decoded_log is not None:
+                decoded_logs.append(decoded_log)
+        return decoded_logs
+
+    def _insert_logs(self, raw_logs: Iterable[Dict[str, Any]]) -> int:
+        """Inserts logs as returned by `eth_getLogs`, either raw or formatted by web3"""
+        rows = []
+        for log in raw_logs:
+            if log.get("removed", False):
+                continue
+            topics = [_to_bytes(topic) for topic in log["topics"]]
+            decoder = self.log_decoder.get_decoder(topics)
+            rows.append(
+                (
+                    _to_int(log["blockNumber"]),
+                    _to_int(log["logIndex"]),
+                    _to_bytes(log["blockHash"]),
+                    _to_bytes(log["transactionHash"]),
+                    to_checksum_address(log["address"]),
+                    None if decoder is None else decoder.name,
+                    len(topics),
+                    *topics,
+                    *[None] * (MAX_TOPICS - len(topics)),
+                    _to_bytes(log["data"]),
+                )
+            )
+        cursor = self.connection.executemany(
+            "INSERT OR IGNORE INTO logs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return cursor.rowcount
+
+
+def _get_block_hash(web3, block_number: int) -> Optional[bytes]:
+    try:
+        return bytes(web3.eth.getBlock(block_number).hash)
+    except BlockNotFound:
+        return None
+
+
+def get_contract_logs(
+    contract,
+    event_name: str,
+    *,
+    argument_filters: Dict[str, Any] = None,
+    from_block: int = 0,
+    to_block: Union[int, str] = "latest",
+    event_store: EventStore = None,
+) -> List[DecodedLog]:
+    """The decoded logs of the event `event_name` of `contract` ordered by block and log index.
+
+    With an `event_store`, the logs of the contract are synced into the store and read from it,
+    otherwise they are fetched from the node.
+    """
+    if event_store is not None:
+        event_store.sync(contract.web3, [contract.address], to_block=to_block)
+        return event_store.get_logs(
+            address=contract.address,
+            event=event_name,
+            argument_filters=argument_filters,
+            from_block=from_block,
+            to_block=to_block if isinstance(to_block, int) else None,
+        )
+
+    log_decoder = LogDecoder(contract.abi)
+    decoders = log_decoder.decoders(event_name)
+    if not decoders:
+        raise ValueError(f"Unknown event {event_name}")
+    decoded_logs = []
+    for decoder in decoders:
+        topics: List[Optional[bytes]] = [decoder.topic]
+        topics += decoder.topics_filter(argument_filters or {})
+        decoded_logs.extend(
+            log_decoder.decode_logs(
+                get_raw_logs(
+                    contract.web3,
+                    address=contract.address,
+                    topics=topics,
+                    from_block=from_block,
+                    to_block=to_block,
+                )
+            )
+        )
+    return sorted(decoded_logs, key=lambda log: (log.block_number, log.log_index))
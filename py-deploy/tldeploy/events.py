@@ -0,0 +1,279 @@
+# This file provides decoding of raw logs in bulk with decoders that are prepared once per event
+#
+# web3's `events.X().getLogs()` and `processReceipt()` look up the event abi and build the decoders
+# for every log, and wrap every decoded log in AttributeDicts. The `LogDecoder` builds a table
+# from event topics to prepared decoders once, and decodes logs into plain named tuples.
+import collections
+import functools
+import keyword
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from eth_abi import encode_single
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from eth_abi.grammar import parse
+from eth_abi.registry import registry
+from eth_utils import (
+    event_abi_to_log_topic,
+    to_bytes,
+    to_checksum_address,
+)
+from hexbytes import HexBytes
+from web3 import HTTPProvider
+from web3.types import RPCEndpoint
+from tlbin import load_packaged_merged_abis
+
+from tldeploy.load_contracts import contracts
+
+CHECKSUM_ADDRESS_CACHE_SIZE = 2 ** 16
+
+
+class DecodedLog(NamedTuple):
+    event: str
+    args: Any
+    address: str
+    block_number: Optional[int]
+    log_index: Optional[int]
+    transaction_hash: Optional[HexBytes]
+
+
+@functools.lru_cache(maxsize=CHECKSUM_ADDRESS_CACHE_SIZE)
+def _checksum_address(address: str) -> str:
+    return to_checksum_address(address)
+
+
+def _normalizer(type_str: str):
+    """A function converting decoded values of `type_str` like web3 does, or None if nothing is to be done"""
+    abi_type = parse(type_str)
+    if type_str == "address":
+        return _checksum_address
+    if abi_type.base == "address" and len(abi_type.arrlist) == 1:
+        return lambda addresses: tuple(_checksum_address(a) for a in addresses)
+    return None
+
+
+def _is_hashed_in_topic(type_str: str) -> bool:
+    """Whether only the hash of an indexed value of `type_str` is in the topic"""
+    return type_str.startswith("(") or parse(type_str).is_dynamic
+
+
+def _field_name(name: str) -> str:
+    # the arguments of our events start with an underscore, which namedtuple does not allow,
+    # and without it some are keywords like `_from`
+    name = name.lstrip("_")
+    if keyword.iskeyword(name):
+        return name + "_"
+    return name
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        # plain bytes for the HexBytes of logs formatted by web3
+        return bytes(value)
+    return to_bytes(hexstr=value)
+
+
+class EventDecoder:
+    """Decodes the topics and data of logs of the event with the abi `event_abi`"""
+
+    def __init__(self, event_abi: Dict) -> None:
+        self.name = event_abi["name"]
+        self.topic = event_abi_to_log_topic(event_abi)
+        inputs = event_abi["inputs"]
+        self.args_class = collections.namedtuple(  # type: ignore
+            f"{self.name}Args",
+            [_field_name(input["name"]) or f"arg{i}" for i, input in enumerate(inputs)],
+            rename=True,
+        )
+
+        indexed_types: List[str] = []
+        data_types: List[str] = []
+        # the field names and types of the indexed arguments, with None for the ones hashed in the topic
+        self._indexed_arguments: List[Tuple[str, Optional[str]]] = []
+        # for every argument whether it is indexed and its position within the indexed or data values
+        self._positions: List[Tuple[bool, int]] = []
+        self._normalizers: List[Tuple[int, Any]] = []
+        for position, input in enumerate(inputs):
+            type_str = input["type"]
+            if input.get("indexed", False):
+                field_name = self.args_class._fields[position]  # type: ignore
+                if _is_hashed_in_topic(type_str):
+                    type_str = "bytes32"
+                    self._indexed_arguments.append((field_name, None))
+                else:
+                    self._indexed_arguments.append((field_name, type_str))
+                self._positions.append((True, len(indexed_types)))
+                indexed_types.append(type_str)
+            else:
+                self._positions.append((False, len(data_types)))
+                data_types.append(type_str)
+            normalizer = _normalizer(type_str)
+            if normalizer is not None:
+                self._normalizers.append((position, normalizer))
+        self.number_of_topics = len(indexed_types) + 1
+
+        self._indexed_decoders = [registry.get_decoder(t) for t in indexed_types]
+        self._data_decoder = TupleDecoder(
+            decoders=[registry.get_decoder(t) for t in data_types]
+        )
+
+    def decode(self, topics: Sequence[bytes], data: bytes) -> Tuple:
+        """Decode the arguments of a log from its topics and data, which include the event topic"""
+        indexed_values = [
+            decoder(ContextFramesBytesIO(topic))
+            for decoder, topic in zip(self._indexed_decoders, topics[1:])
+        ]
+        data_values = self._data_decoder(ContextFramesBytesIO(data))
+        values = [
+            indexed_values[position] if is_indexed else data_values[position]
+            for is_indexed, position in self._positions
+        ]
+        for position, normalizer in self._normalizers:
+            values[position] = normalizer(values[position])
+        return self.args_class(*values)
+
+    def topics_filter(self, argument_filters: Dict[str, Any]) -> List[Optional[bytes]]:
+        """The topics after the event topic of logs with the indexed arguments of `argument_filters`,
+        by the field names of the decoded arguments, with None for topics that can have any value"""
+        topics: List[Optional[bytes]] = [None] * len(self._indexed_arguments)
+        for name, value in argument_filters.items():
+            for position, (field_name, type_str) in enumerate(self._indexed_arguments):
+                if field_name != name:
+                    continue
+                if type_str is None:
+                    raise ValueError(
+                        f"Cannot filter {self.name} by {name}, only its hash is in the topic."
+                    )
+                topics[position] = encode_single(type_str, value)
+                break
+            else:
+                raise ValueError(f"{name} is not an indexed argument of {self.name}.")
+        return topics
+
+
+class LogDecoder:
+    """Decodes logs of many events with a table from event topics to prepared decoders.
+
+    Events with the same topic but different indexed arguments, like the ERC20 and ERC721 `Transfer`,
+    are told apart by the number of topics of the log."""
+
+    def __init__(self, abi: Iterable[Dict]) -> None:
+        self._decoders: Dict[Tuple[bytes, int], EventDecoder] = {}
+        for entry in abi:
+            if entry["type"] != "event" or entry.get("anonymous", False):
+                continue
+            decoder = EventDecoder(entry)
+            self._decoders.setdefault(
+                (decoder.topic, decoder.number_of_topics), decoder
+            )
+
+    @classmethod
+    def from_contracts(cls, contract_names: Iterable[str]) -> "LogDecoder":
+        """A decoder for the events of the contracts with `contract_names` in contracts.json"""
+        return cls(
+            entry
+            for contract_name in contract_names
+            for entry in contracts[contract_name]["abi"]
+        )
+
+    @classmethod
+    def from_merged_abis(cls) -> "LogDecoder":
+        """A decoder for the events of all versions of currency networks in merged_abis.json"""
+        return cls(load_merged_event_abis())
+
+    def event_names(self) -> List[str]:
+        return sorted({decoder.name for decoder in self._decoders.values()})
+
+    def topic(self, event_name: str) -> HexBytes:
+        for decoder in self._decoders.values():
+            if decoder.name == event_name:
+                return HexBytes(decoder.topic)
+        raise KeyError(event_name)
+
+    def decoders(self, event_name: str) -> List[EventDecoder]:
+        """The decoders of all events named `event_name`"""
+        return [
+            decoder for decoder in self._decoders.values() if decoder.name == event_name
+        ]
+
+    def get_decoder(self, topics: Sequence[bytes]) -> Optional[EventDecoder]:
+        """The decoder of logs with `topics`, or None for logs of unknown events"""
+        if not topics:
+            return None
+        return self._decoders.get((topics[0], len(topics)))
+
+    def decode_log(self, log: Dict[str, Any]) -> Optional[DecodedLog]:
+        """Decode a log as returned by `eth_getLogs`, either raw or formatted by web3.
+        Returns None for logs of unknown events."""
+        topics = [_to_bytes(topic) for topic in log["topics"]]
+        decoder = self.get_decoder(topics)
+        if decoder is None:
+            return None
+        return DecodedLog(
+            decoder.name,
+            decoder.decode(topics, _to_bytes(log["data"])),
+            _checksum_address(log["address"]),
+            _to_int(log.get("blockNumber")),
+            _to_int(log.get("logIndex")),
+            _to_hexbytes(log.get("transactionHash")),
+        )
+
+    def decode_logs(self, logs: Iterable[Dict[str, Any]]) -> List[DecodedLog]:
+        """Decode all logs of known events, skipping the others"""
+        decoded_logs = []
+        for log in logs:
+            decoded_log = self.decode_log(log)
+            if decoded_log is not None:
+                decoded_logs.append(decoded_log)
+        return decoded_logs
+
+
+def load_merged_event_abis() -> List[Dict]:
+    """The abis of the events of all versions of currency networks,
+    found with the lookup table of their topics in merged_abis.json"""
+    merged_abi = load_packaged_merged_abis()["MergedCurrencyNetworksAbi"]
+    return [merged_abi["abi"][position] for position in merged_abi["topics"].values()]
+
+
+def _to_int(value) -> Optional[int]:
+    if value is None or isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+def _to_hexbytes(value) -> Optional[HexBytes]:
+    if value is None:
+        return None
+    return HexBytes(value)
+
+
+def get_raw_logs(
+    web3,
+    *,
+    address=None,
+    topics: Sequence = None,
+    from_block=0,
+    to_block="latest",
+) -> List[Dict[str, Any]]:
+    """Get logs via `eth_getLogs`, without the result formatting of web3 if the node is connected via http.
+
+    Other providers, like the eth-tester provider used in tests, only take requests through web3's
+    formatters, so their logs are fetched with `web3.eth.getLogs` and returned formatted.
+    `LogDecoder.decode_logs` decodes both."""
+    filter_params: Dict[str, Any] = {"fromBlock": from_block, "toBlock": to_block}
+    if address is not None:
+        filter_params["address"] = address
+    if topics is not None:
+        filter_params["topics"] = [
+            HexBytes(topic).hex() if topic is not None else None for topic in topics
+        ]
+    if not isinstance(web3.provider, HTTPProvider):
+        return web3.eth.getLogs(filter_params)
+
+    # without the request formatters of web3, block numbers need to be hex encoded
+    for key in ("fromBlock", "toBlock"):
+        if isinstance(filter_params[key], int):
+            filter_params[key] = hex(filter_params[key])
+    response = web3.provider.make_request(RPCEndpoint("eth_getLogs"), [filter_params])
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
@@ -1,66 +1,382 @@
-from tldeploy.signing import solidity_keccak, eth_sign
-
-
-class Order(object):
-    def __init__(
-        self,
-        exchange_address,
-        maker_address,
-        taker_address,
-        maker_token,
-        taker_token,
-        fee_recipient,
-        maker_token_amount,
-        taker_token_amount,
-        maker_fee,
-        taker_fee,
-        expiration_timestamp_in_sec,
-        salt,
-    ):
-        self.exchange_address = exchange_address
-        self.maker_address = maker_address
-        self.taker_address = taker_address
-        self.maker_token = maker_token
-        self.taker_token = taker_token
-        self.fee_recipient = fee_recipient
-        self.maker_token_amount = maker_token_amount
-        self.taker_token_amount = taker_token_amount
-        self.maker_fee = maker_fee
-        self.taker_fee = taker_fee
-        self.expiration_timestamp_in_sec = expiration_timestamp_in_sec
-        self.salt = salt
-
-    def hash(self):
-        return solidity_keccak(
-            [
-                "address",
-                "address",
-                "address",
-                "address",
-                "address",
-                "address",
-                "uint256",
-                "uint256",
-                "uint256",
-                "uint256",
-                "uint256",
-                "uint256",
-            ],
-            [
-                self.exchange_address,
-                self.maker_address,
-                self.taker_address,
-                self.maker_token,
-                self.taker_token,
-                self.fee_recipient,
-                self.maker_token_amount,
-                self.taker_token_amount,
-                self.maker_fee,
-                self.taker_fee,
-                self.expiration_timestamp_in_sec,
-                self.salt,
-            ],
+import functools
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Union
+
+import attr
+from eth_utils import keccak, to_canonical_address
+from hexbytes import HexBytes
+
+from tldeploy.batch import DEFAULT_BATCH_SIZE, call_functions
+from tldeploy.signing import eth_sign, Signer
+from tldeploy.simulation import (
+    CurrencyNetworkView,
+    TransferInfeasible,
+    TransferResult,
+    simulate_transfer_sender_pays,
+)
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+# max fee used by the exchange contract for transfers in currency networks
+MAX_FEE = 100
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class Order:
+    exchange_address: str
+    maker_address: str
+    taker_address: str
+    maker_token: str
+    taker_token: str
+    fee_recipient: str
+    maker_token_amount: int
+    taker_token_amount: int
+    maker_fee: int
+    taker_fee: int
+    expiration_timestamp_in_sec: int
+    salt: int
+    _hash: Optional[HexBytes] = attr.ib(default=None, init=False, repr=False, eq=False)
+
+    @classmethod
+    def from_order_arrays(
+        cls,
+        exchange_address: str,
+        order_addresses: Sequence[str],
+        order_values: Sequence[int],
+    ) -> "Order":
+        """Construct an order from the `orderAddresses` and `orderValues` arguments of the exchange contract"""
+        (
+            maker_address,
+            taker_address,
+            maker_token,
+            taker_token,
+            fee_recipient,
+        ) = order_addresses
+        (
+            maker_token_amount,
+            taker_token_amount,
+            maker_fee,
+            taker_fee,
+            expiration_timestamp_in_sec,
+            salt,
+        ) = order_values
+        return cls(
+            exchange_address,
+            maker_address,
+            taker_address,
+            maker_token,
+            taker_token,
+            fee_recipient,
+            maker_token_amount,
+            taker_token_amount,
+            maker_fee,
+            taker_fee,
+            expiration_timestamp_in_sec,
+            salt,
         )
 
-    def sign(self, key):
+    def hash(self) -> HexBytes:
+        """The order hash as computed by `Exchange.getOrderHash`, it is only computed once"""
+        order_hash = self._hash
+        if order_hash is None:
+            # equivalent to `solidity_keccak` of the 6 addresses and 6 uint256, without the generic abi encoding
+            packed = b"".join(
+                [
+                    _canonical_address(self.exchange_address),
+                    _canonical_address(self.maker_address),
+                    _canonical_address(self.taker_address),
+                    _canonical_address(self.maker_token),
+                    _canonical_address(self.taker_token),
+                    _canonical_address(self.fee_recipient),
+                    self.maker_token_amount.to_bytes(32, byteorder="big"),
+                    self.taker_token_amount.to_bytes(32, byteorder="big"),
+                    self.maker_fee.to_bytes(32, byteorder="big"),
+                    self.taker_fee.to_bytes(32, byteorder="big"),
+                    self.expiration_timestamp_in_sec.to_bytes(32, byteorder="big"),
+                    self.salt.to_bytes(32, byteorder="big"),
+                ]
+            )
+            order_hash = HexBytes(keccak(packed))
+            object.__setattr__(self, "_hash", order_hash)
+        return order_hash
+
+    @property
+    def order_addresses(self):
+        """The `orderAddresses` argument of the exchange contract functions for this order"""
+        return [
+            self.maker_address,
+            self.taker_address,
+            self.maker_token,
+            self.taker_token,
+            self.fee_recipient,
+        ]
+
+    @property
+    def order_values(self):
+        """The `orderValues` argument of the exchange contract functions for this order"""
+        return [
+            self.maker_token_amount,
+            self.taker_token_amount,
+            self.maker_fee,
+            self.taker_fee,
+            self.expiration_timestamp_in_sec,
+            self.salt,
+        ]
+
+    def sign(self, key: Union[bytes, Signer]):
         return eth_sign(self.hash(), key)
+
+
+@functools.lru_cache(maxsize=4096)
+def _canonical_address(address: str) -> bytes:
+    # exchange, token and fee recipient addresses repeat across orders of a book
+    return to_canonical_address(address)
+
+
+def orders_from_tuples(rows: Iterable[Sequence]) -> List[Order]:
+    """Construct orders from tuples of the order fields in the order of the `Order` constructor"""
+    return [Order(*row) for row in rows]
+
+
+def orders_from_order_arrays(
+    exchange_address: str,
+    orders_addresses: Iterable[Sequence[str]],
+    orders_values: Iterable[Sequence[int]],
+) -> List[Order]:
+    """Construct orders from the `orderAddresses` and `orderValues` arguments of the batch functions
+    of the exchange contract, e.g. `batchFillOrders`"""
+    return [
+        Order.from_order_arrays(exchange_address, order_addresses, order_values)
+        for order_addresses, order_values in zip(orders_addresses, orders_values)
+    ]
+
+
+def get_partial_amount(numerator: int, denominator: int, target: int) -> int:
+    """Calculates partial value given a numerator and denominator like `Exchange.getPartialAmount`"""
+    return (numerator * target) // denominator
+
+
+def is_rounding_error(numerator: int, denominator: int, target: int) -> bool:
+    """Checks if the rounding error is larger than 0.1% like `Exchange.isRoundingError`"""
+    remainder = (target * numerator) % denominator
+    if remainder == 0:
+        return False
+    return (remainder * 1000000) // (numerator * target) > 1000
+
+
+class FillInfeasible(Exception):
+    """Raised when a simulated fill would revert or not fill anything on chain"""
+
+    pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class FillSimulation:
+    filled_taker_token_amount: int
+    filled_maker_token_amount: int
+    # the transfers in currency networks, None for token transfers that are not simulated
+    maker_transfer: Optional[TransferResult]
+    taker_transfer: Optional[TransferResult]
+
+
+def simulate_fill_order_trustlines(
+    order: Order,
+    fill_taker_token_amount: int,
+    maker_path: Sequence[str],
+    taker_path: Sequence[str],
+    *,
+    taker_address: str,
+    timestamp: int,
+    maker_network_view: CurrencyNetworkView = None,
+    taker_network_view: CurrencyNetworkView = None,
+    unavailable_taker_token_amount: int = 0,
+) -> FillSimulation:
+    """Simulates `Exchange.fillOrderTrustlines` sent by `taker_address` at `timestamp`.
+
+    The transfers along non-empty paths are simulated against the views of the currency networks
+    of the maker and taker token, which need to contain the trustlines of the paths.
+    Raises `FillInfeasible` if the fill would revert or fill nothing.
+    """
+    if order.taker_address != NULL_ADDRESS and order.taker_address != taker_address:
+        raise FillInfeasible("Order taker must be message sender or the zero address.")
+    if (
+        order.maker_token_amount <= 0
+        or order.taker_token_amount <= 0
+        or fill_taker_token_amount <= 0
+    ):
+        raise FillInfeasible(
+            "Token amount of order maker, order taker, and fill taker must be positive."
+        )
+    if timestamp >= order.expiration_timestamp_in_sec:
+        raise FillInfeasible("The order is expired.")
+
+    filled_taker_token_amount = min(
+        fill_taker_token_amount,
+        order.taker_token_amount - unavailable_taker_token_amount,
+    )
+    if filled_taker_token_amount <= 0:
+        raise FillInfeasible("The order is already fully filled or cancelled.")
+    if is_rounding_error(
+        filled_taker_token_amount, order.taker_token_amount, order.maker_token_amount
+    ):
+        raise FillInfeasible("The rounding error of the fill is too large.")
+    filled_maker_token_amount = get_partial_amount(
+        filled_taker_token_amount, order.taker_token_amount, order.maker_token_amount
+    )
+
+    maker_transfer = None
+    if maker_path:
+        if maker_network_view is None:
+            raise ValueError("A view of the maker token network is needed.")
+        maker_transfer = _simulate_trustlines_transfer(
+            maker_network_view,
+            filled_maker_token_amount,
+            maker_path,
+            order.maker_address,
+            taker_address,
+            timestamp,
+        )
+
+    taker_transfer = None
+    if taker_path:
+        if taker_network_view is None:
+            raise ValueError("A view of the taker token network is needed.")
+        if maker_transfer is not None and order.maker_token == order.taker_token:
+            # the taker transfer happens after the maker transfer in the same network
+            taker_network_view = taker_network_view.copy()
+            taker_network_view.apply(maker_transfer)
+        taker_transfer = _simulate_trustlines_transfer(
+            taker_network_view,
+            filled_taker_token_amount,
+            taker_path,
+            taker_address,
+            order.maker_address,
+            timestamp,
+        )
+
+    return FillSimulation(
+        filled_taker_token_amount=filled_taker_token_amount,
+        filled_maker_token_amount=filled_maker_token_amount,
+        maker_transfer=maker_transfer,
+        taker_transfer=taker_transfer,
+    )
+
+
+def _simulate_trustlines_transfer(
+    view: CurrencyNetworkView,
+    amount: int,
+    path: Sequence[str],
+    sender: str,
+    receiver: str,
+    timestamp: int,
+) -> TransferResult:
+    if path[0] != sender or path[-1] != receiver:
+        raise FillInfeasible(f"The path needs to go from {sender} to {receiver}.")
+    try:
+        # the exchange contract casts the amount to uint32 for currency networks
+        return simulate_transfer_sender_pays(
+            view, amount % 2 ** 32, MAX_FEE, path, timestamp=timestamp
+        )
+    except TransferInfeasible as e:
+        raise FillInfeasible(f"The transfer along {list(path)} fails: {e}") from e
+
+
+class OrderAvailability:
+    """Queries the filled and cancelled amounts of many orders of an exchange contract.
+
+    The amounts are fetched with batched calls of `getUnavailableTakerTokenAmount` pinned to
+    the last synced block and cached per order hash. `sync` moves to the latest block and
+    invalidates the cached amounts of orders with new `LogFill` or `LogCancel` events.
+    """
+
+    def __init__(self, exchange_contract, *, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.exchange_contract = exchange_contract
+        self.batch_size = batch_size
+        self._unavailable_amounts: Dict[bytes, int] = {}
+        self._synced_block: Optional[int] = None
+
+    @property
+    def synced_block(self) -> int:
+        """The block at which the amounts are queried"""
+        if self._synced_block is None:
+            self._synced_block = self.exchange_contract.web3.eth.blockNumber
+        return self._synced_block
+
+    def sync(self) -> Set[bytes]:
+        """Moves to the latest block and returns the hashes of the orders with new fill or cancel events"""
+        from_block = self.synced_block + 1
+        to_block = self.exchange_contract.web3.eth.blockNumber
+        if to_block < from_block:
+            return set()
+
+        events = self.exchange_contract.events
+        changed_order_hashes = {
+            bytes(log["args"]["orderHash"])
+            for event_type in (events.LogFill, events.LogCancel)
+            for log in event_type().getLogs(fromBlock=from_block, toBlock=to_block)
+        }
+        for order_hash in changed_order_hashes:
+            self._unavailable_amounts.pop(order_hash, None)
+        self._synced_block = to_block
+        return changed_order_hashes
+
+    def get_unavailable_taker_token_amounts(self, order_hashes: Iterable) -> List[int]:
+        """Like `Exchange.getUnavailableTakerTokenAmount` for every order hash"""
+        order_hashes = [bytes(order_hash) for order_hash in order_hashes]
+        missing = list(
+            dict.fromkeys(
+                order_hash
+                for order_hash in order_hashes
+                if order_hash not in self._unavailable_amounts
+            )
+        )
+        if missing:
+            amounts = call_functions(
+                self.exchange_contract.web3,
+                [
+                    self.exchange_contract.functions.getUnavailableTakerTokenAmount(
+                        order_hash
+                    )
+                    for order_hash in missing
+                ],
+                block_identifier=self.synced_block,
+                batch_size=self.batch_size,
+            )
+            self._unavailable_amounts.update(zip(missing, amounts))
+        return [self._unavailable_amounts[order_hash] for order_hash in order_hashes]
+
+    def get_remaining_taker_token_amounts(self, orders: Sequence[Order]) -> List[int]:
+        """The amount of taker token that can still be filled for every order"""
+        unavailable_amounts = self.get_unavailable_taker_token_amounts(
+            order.hash() for order in orders
+        )
+        return [
+            max(order.taker_token_amount - unavailable_amount, 0)
+            for order, unavailable_amount in zip(orders, unavailable_amounts)
+        ]
+
+    def get_fillable_orders(
+        self, orders: Sequence[Order], timestamp: int
+    ) -> List[Order]:
+        """The orders that are neither expired at `timestamp` nor fully filled or cancelled"""
+        unexpired_orders = [
+            order for order in orders if timestamp < order.expiration_timestamp_in_sec
+        ]
+        return [
+            order
+            for order, remaining_amount in zip(
+                unexpired_orders,
+                self.get_remaining_taker_token_amounts(unexpired_orders),
+            )
+            if remaining_amount > 0
+        ]
+
+    def refresh_order_book(self, order_book) -> None:
+        """Syncs and updates the unavailable amounts of all orders of `order_book` in one batched sweep"""
+        self.sync()
+        order_hashes = order_book.order_hashes()
+        order_book.update_unavailable_taker_token_amounts(
+            dict(
+                zip(
+                    order_hashes, self.get_unavailable_taker_token_amounts(order_hashes)
+                )
+            )
+        )
@@ -0,0 +1,27 @@
+# This file provides functions to calculate the capacity imbalance fees of mediated transfers off-chain
+# They compute the same values as the corresponding functions of the currency network contracts
+
+
+def calculate_fees(
+    imbalance_generated: int, capacity_imbalance_fee_divisor: int
+) -> int:
+    """The fee a mediator takes for forwarding a value, like `_calculateFees`"""
+    if capacity_imbalance_fee_divisor == 0 or imbalance_generated == 0:
+        return 0
+    return (imbalance_generated - 1) // capacity_imbalance_fee_divisor + 1
+
+
+def calculate_fees_reverse(
+    imbalance_generated: int, capacity_imbalance_fee_divisor: int
+) -> int:
+    """The fee a mediator takes so that a value is received after the fee, like `_calculateFeesReverse`"""
+    if capacity_imbalance_fee_divisor == 0 or imbalance_generated == 0:
+        return 0
+    return (imbalance_generated - 1) // (capacity_imbalance_fee_divisor - 1) + 1
+
+
+def calculate_imbalance_generated(value: int, balance: int) -> int:
+    """The part of `value` that is not used to reduce the positive `balance`, like `_calculateImbalanceGenerated`"""
+    if balance > 0:
+        return max(value - balance, 0)
+    return value
@@ -0,0 +1,182 @@
+# This file provides gas limits for currency network transactions without calling `estimateGas`
+#
+# The gas limits are predicted from measurements like the ones of `tests/gas_values.csv`, which are the
+# lowest gas limits the transactions succeeded with. Transfers and triangular closes grow linearly in the
+# number of hops of their path, so they are modelled with a base cost and a cost per hop. Other operations
+# are predicted by their measured limit. The default measurements were taken on a network with fees and
+# custom interests for the most expensive case, where a transfer changes balances from zero.
+import math
+import re
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import attr
+
+TRANSFER = "transfer"
+CLOSE_TRUSTLINE_BY_TRIANGULAR_TRANSFER = "closeTrustlineByTriangularTransfer"
+UPDATE_TRUSTLINE_REQUEST = "updateTrustlineRequest"
+UPDATE_TRUSTLINE_OPEN = "updateTrustlineOpen"
+UPDATE_TRUSTLINE_EXISTING = "updateTrustlineExisting"
+REDUCE_CREDITLIMITS = "reduceCreditlimits"
+CLOSE_TRUSTLINE = "closeTrustline"
+CANCEL_TRUSTLINE_UPDATE = "cancelTrustlineUpdate"
+
+# the gas limits of the snapshot keys of `tests/gas_values.csv`
+DEFAULT_GAS_LIMITS = {
+    "TRANSFER_0_MEDIATOR": 62000,
+    "TRANSFER_1_MEDIATOR": 95000,
+    "TRANSFER_2_MEDIATORS": 131000,
+    "TRANSFER_3_MEDIATORS": 165000,
+    "FIRST_TL_REQUEST": 79000,
+    "SECOND_TL_REQUEST": 45000,
+    "FIRST_TL": 362000,
+    "UPDATE_TL": 71000,
+    "REDUCE_TL_LIMITS": 63000,
+    "CLOSE_TL_NO_TRANSFER": 110000,
+    "CLOSE_TL_TRIANGULAR_TRANSFER_2_MEDIATORS": 209000,
+    "CLOSE_TL_TRIANGULAR_TRANSFER_4_MEDIATORS": 277000,
+    "CANCEL_TL_UPDATE": 40000,
+}
+
+_OPERATIONS_OF_KEYS = {
+    "FIRST_TL_REQUEST": UPDATE_TRUSTLINE_REQUEST,
+    "SECOND_TL_REQUEST": UPDATE_TRUSTLINE_REQUEST,
+    "FIRST_TL": UPDATE_TRUSTLINE_OPEN,
+    "UPDATE_TL": UPDATE_TRUSTLINE_EXISTING,
+    "REDUCE_TL_LIMITS": REDUCE_CREDITLIMITS,
+    "CLOSE_TL_NO_TRANSFER": CLOSE_TRUSTLINE,
+    "CANCEL_TL_UPDATE": CANCEL_TRUSTLINE_UPDATE,
+}
+_MEDIATED_KEY_PATTERNS = [
+    (re.compile(r"TRANSFER_(\d+)_MEDIATORS?"), TRANSFER),
+    (
+        re.compile(r"CLOSE_TL_TRIANGULAR_TRANSFER_(\d+)_MEDIATORS?"),
+        CLOSE_TRUSTLINE_BY_TRIANGULAR_TRANSFER,
+    ),
+]
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class GasMeasurement:
+    """The lowest gas limit an `operation` with `hops` trustlines on its path succeeded with"""
+
+    operation: str
+    hops: int
+    gas_limit: int
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class LinearGasModel:
+    base: int
+    per_hop: int
+
+    def predict(self, hops: int) -> int:
+        return self.base + self.per_hop * hops
+
+
+def fit_linear_gas_model(measurements: Sequence[Tuple[int, int]]) -> LinearGasModel:
+    """Fits the gas limit as a linear function of hops to the (hops, gas limit) `measurements`.
+
+    The cost per hop is fitted with least squares, the base cost is then chosen so that
+    no measured gas limit is above the prediction.
+    """
+    if not measurements:
+        raise ValueError("Need at least one measurement to fit a gas model.")
+    hops = [hop for hop, _ in measurements]
+    gas_limits = [gas_limit for _, gas_limit in measurements]
+    mean_hops = sum(hops) / len(hops)
+    mean_gas_limit = sum(gas_limits) / len(gas_limits)
+    variance = sum((hop - mean_hops) ** 2 for hop in hops)
+    if variance == 0:
+        per_hop = 0
+    else:
+        covariance = sum(
+            (hop - mean_hops) * (gas_limit - mean_gas_limit)
+            for hop, gas_limit in measurements
+        )
+        per_hop = max(math.ceil(covariance / variance), 0)
+    base = max(gas_limit - per_hop * hop for hop, gas_limit in measurements)
+    return LinearGasModel(base=base, per_hop=per_hop)
+
+
+def measurements_from_gas_limits(gas_limits: Mapping[str, int]) -> List[GasMeasurement]:
+    """The measurements of the gas limits by snapshot keys like the ones of `tests/gas_values.csv`.
+    Unknown keys are ignored."""
+    measurements = []
+    for key, gas_limit in gas_limits.items():
+        if key in _OPERATIONS_OF_KEYS:
+            measurements.append(GasMeasurement(_OPERATIONS_OF_KEYS[key], 1, gas_limit))
+            continue
+        for pattern, operation in _MEDIATED_KEY_PATTERNS:
+            match = pattern.fullmatch(key)
+            if match is not None:
+                mediators = int(match.group(1))
+                measurements.append(GasMeasurement(operation, mediators + 1, gas_limit))
+                break
+    return measurements
+
+
+class GasPredictor:
+    """Predicts gas limits of currency network transactions from gas models fitted per operation.
+
+    The predictions are increased by `margin` and rounded up to the thousands, to leave room
+    for differences in the state of the network to the one measured.
+    """
+
+    def __init__(self, models: Dict[str, LinearGasModel], *, margin: float = 0.1):
+        self.models = models
+        self.margin = margin
+
+    @classmethod
+    def from_measurements(
+        cls, measurements: Iterable[GasMeasurement], *, margin: float = 0.1
+    ) -> "GasPredictor":
+        measurements_by_operation: Dict[str, List[Tuple[int, int]]] = {}
+        for measurement in measurements:
+            measurements_by_operation.setdefault(measurement.operation, []).append(
+                (measurement.hops, measurement.gas_limit)
+            )
+        return cls(
+            {
+                operation: fit_linear_gas_model(operation_measurements)
+                for operation, operation_measurements in measurements_by_operation.items()
+            },
+            margin=margin,
+        )
+
+    @classmethod
+    def from_gas_limits(
+        cls, gas_limits: Mapping[str, int] = None, *, margin: float = 0.1
+    ) -> "GasPredictor":
+        """The predictor fitted to gas limits by snapshot keys, by default to `DEFAULT_GAS_LIMITS`"""
+        if gas_limits is None:
+            gas_limits = DEFAULT_GAS_LIMITS
+        return cls.from_measurements(
+            measurements_from_gas_limits(gas_limits), margin=margin
+        )
+
+    def predict(self, operation: str, hops: int = 1) -> int:
+        if operation not in self.models:
+            raise ValueError(f"No gas model for operation {operation}.")
+        gas_limit = self.models[operation].predict(hops) * (1 + self.margin)
+        return math.ceil(gas_limit / 1000) * 1000
+
+    def transfer(self, path: Sequence[str]) -> int:
+        """The gas limit for `transfer`, `transferReceiverPays` or `transferFrom` along `path`"""
+        if len(path) < 2:
+            raise ValueError("Path too short.")
+        return self.predict(TRANSFER, len(path) - 1)
+
+    def close_trustline_by_triangular_transfer(self, path: Sequence[str]) -> int:
+        """The gas limit for `closeTrustlineByTriangularTransfer` along the cycle `path`"""
+        if len(path) < 2:
+            raise ValueError("Path too short.")
+        return self.predict(CLOSE_TRUSTLINE_BY_TRIANGULAR_TRANSFER, len(path) - 1)
+
+    def update_trustline(self, *, is_new_trustline: bool, accepts_request: bool) -> int:
+        """The gas limit for `updateTrustline`, which opens a new trustline or changes an existing one
+        if it accepts the request of the other party, and otherwise only stores a request"""
+        if accepts_request:
+            if is_new_trustline:
+                return self.predict(UPDATE_TRUSTLINE_OPEN)
+            return self.predict(UPDATE_TRUSTLINE_EXISTING)
+        return self.predict(UPDATE_TRUSTLINE_REQUEST)
@@ -1,6 +1,7 @@
+import functools
 import json
 from enum import Enum
-from typing import Dict, Optional, Any, MutableMapping
+from typing import Dict, Optional, Any, MutableMapping, Union
 
 import attr
 import pkg_resources
@@ -17,7 +18,8 @@ from web3.exceptions import BadFunctionCallOutput
 from hexbytes import HexBytes
 
 from tldeploy.core import deploy, get_contract_interface, get_chain_id
-from tldeploy.signing import sign_msg_hash, solidity_keccak
+from tldeploy.event_store import EventStore, get_contract_logs
+from tldeploy.signing import sign_msg_hash, solidity_keccak, Signer
 
 MAX_GAS = 1_000_000
 ZERO_ADDRESS = "0x" + "0" * 40
@@ -160,7 +162,7 @@ class MetaTransaction:
             ],
         )
 
-    def signed(self, key: PrivateKey) -> "MetaTransaction":
+    def signed(self, key: Union[PrivateKey, Signer]) -> "MetaTransaction":
         return attr.evolve(self, signature=sign_msg_hash(self.hash, key=key))
 
 
@@ -370,19 +372,30 @@ class Delegate:
         )
 
     def get_meta_transaction_status(
-        self, identity_address, hash, *, from_block=0, to_block="latest"
+        self,
+        identity_address,
+        hash,
+        *,
+        from_block=0,
+        to_block="latest",
+        event_store: EventStore = None,
     ):
+        """The status of the meta transaction with `hash`, with the logs of the identity
+        synced into and read from `event_store` if given"""
         identity_contract = self._get_identity_contract(identity_address)
 
         # the filter cannot handle bytes32 values as hex strings, use HexBytes()
-        meta_tx_execution_logs = identity_contract.events.TransactionExecution.getLogs(
-            fromBlock=from_block,
-            toBlock=to_block,
+        meta_tx_execution_logs = get_contract_logs(
+            identity_contract,
+            "TransactionExecution",
             argument_filters={"hash": HexBytes(hash)},
+            from_block=from_block,
+            to_block=to_block,
+            event_store=event_store,
         )
         assert len(meta_tx_execution_logs) <= 1
         if len(meta_tx_execution_logs) == 1:
-            meta_tx_status = meta_tx_execution_logs[0]["args"]["status"]
+            meta_tx_status = meta_tx_execution_logs[0].args.status
             if meta_tx_status:
                 return MetaTransactionStatus.SUCCESS
             else:
@@ -391,9 +404,11 @@ class Delegate:
 
 
 class Identity:
-    def __init__(self, *, contract, owner_private_key: PrivateKey):
+    def __init__(self, *, contract, owner_private_key: Union[PrivateKey, Signer]):
         self.contract = contract
-        self._owner_private_key = owner_private_key
+        if not isinstance(owner_private_key, Signer):
+            owner_private_key = Signer(owner_private_key)
+        self._owner_signer = owner_private_key
 
     @property
     def address(self):
@@ -420,7 +435,7 @@ class Identity:
     def signed_meta_transaction(
         self, meta_transaction: MetaTransaction
     ) -> MetaTransaction:
-        return meta_transaction.signed(self._owner_private_key)
+        return meta_transaction.signed(self._owner_signer)
 
     def filled_and_signed_meta_transaction(
         self, meta_transaction: MetaTransaction
@@ -433,7 +448,9 @@ class Identity:
         return self.contract.functions.lastNonce().call() + 1
 
 
+@functools.lru_cache(maxsize=None)
 def get_pinned_proxy_interface():
+    """The interface of the pinned identity proxy, read once. It is shared and must not be modified"""
     with open(pkg_resources.resource_filename(__name__, "identity-proxy.json")) as file:
         return json.load(file)["Proxy"]
 
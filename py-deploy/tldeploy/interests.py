@@ -60,3 +60,72 @@ def balance_with_interests(
     total = balance + interest
     assert isinstance(total, int)
     return total
+
+
+MAX_BALANCE = 2 ** 64 - 1
+MIN_BALANCE = -MAX_BALANCE
+_INT256_MAX = 2 ** 255 - 1
+_INT256_MIN = -(2 ** 255)
+
+
+def _solidity_div(numerator: int, denominator: int) -> int:
+    """Integer division rounding towards zero like in solidity"""
+    quotient = abs(numerator) // abs(denominator)
+    if (numerator < 0) != (denominator < 0):
+        return -quotient
+    return quotient
+
+
+def calculate_balance_with_interests(
+    balance: int,
+    start_time: int,
+    end_time: int,
+    interest_rate_given: int,
+    interest_rate_received: int,
+) -> int:
+    """Calculates the balance with interests exactly like `CurrencyNetwork.calculateBalanceWithInterests`
+
+    Raises an `OverflowError` where the contract function would revert because of an overflow.
+    """
+    if not MIN_BALANCE <= balance <= MAX_BALANCE:
+        raise ValueError("The balance needs to fit into a 64 bit value")
+    if start_time > end_time:
+        raise ValueError("start_time should be before end_time")
+
+    rate = 0
+    if balance > 0:
+        rate = interest_rate_given
+    elif balance < 0:
+        rate = interest_rate_received
+
+    if rate == 0:
+        return balance
+
+    delta_time = end_time - start_time
+    intermediate_order = balance
+    new_balance = balance
+
+    for order in range(1, 16):
+        new_intermediate_order = intermediate_order * rate * delta_time
+        if not _INT256_MIN <= new_intermediate_order <= _INT256_MAX:
+            raise OverflowError("Interest calculation overflows int256")
+
+        intermediate_order = _solidity_div(
+            new_intermediate_order,
+            SECONDS_PER_YEAR * 100 * 10 ** INTERESTS_DECIMALS * order,
+        )
+        if intermediate_order == 0:
+            break
+        new_balance += intermediate_order
+
+    if rate > 0:
+        new_balance = min(max(new_balance, MIN_BALANCE), MAX_BALANCE)
+    if rate < 0:
+        if balance > 0 and new_balance > balance:
+            new_balance = 0
+        if balance < 0 and new_balance < balance:
+            new_balance = 0
+    if new_balance * balance < 0:
+        new_balance = 0
+
+    return new_balance
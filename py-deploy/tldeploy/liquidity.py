@@ -0,0 +1,309 @@
+# This file provides the computation of the maximal value that can move between users of a currency network
+#
+# The trustlines form a flow network, where the capacity from a sender to a receiver is the creditline the
+# receiver gives plus the balance of the sender. A flow of value along a trustline increases the capacity in
+# the other direction by the same value, which is just the residual capacity of the flow network, so the max
+# flow computed with augmenting paths is the total value that could be transferred without fees.
+# The fees of the mediators are not linear in the value, they are accounted for by simulating transfers along
+# the paths of the flow.
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import attr
+
+from tldeploy.network_model import CurrencyNetworkModel
+from tldeploy.pathfinding import TransferPath
+from tldeploy.simulation import (
+    MAX_UINT64,
+    TransferInfeasible,
+    simulate_transfer_sender_pays,
+)
+
+
+class MaxFlow:
+    """The max flow of value from `source` to `target` in `model`, ignoring fees.
+
+    The flow is kept between updates. After trustlines of the model changed, `update` recomputes
+    the flow starting from the previous one, instead of from scratch.
+    The model is not modified, the flow is zero as long as `source` or `target` are not in the model.
+    """
+
+    def __init__(self, model: CurrencyNetworkModel, source: str, target: str) -> None:
+        if source == target:
+            raise ValueError("Source and target of a flow need to differ.")
+        self.model = model
+        self.source = source
+        self.target = target
+        # None as long as the user is not in the model
+        self._source_index: Optional[int] = None
+        self._target_index: Optional[int] = None
+        # the net flow between pairs of users, with flows[a][b] == -flows[b][a]
+        self._flows: Dict[int, Dict[int, int]] = {}
+        self.value = 0
+        self._augment()
+
+    def update(self, changed_user_pairs: Iterable[Tuple[str, str]]) -> int:
+        """Recomputes the flow after the trustlines between `changed_user_pairs` changed in the model"""
+        self._look_up_users()
+        for a, b in changed_user_pairs:
+            index_a = self.model.user_index(a)
+            index_b = self.model.user_index(b)
+            flow = self._flow(index_a, index_b)
+            if flow < 0:
+                index_a, index_b, flow = index_b, index_a, -flow
+            excess = flow - self._capacity(index_a, index_b)
+            if excess > 0:
+                self._reduce_flow(index_a, index_b, excess)
+        self._augment()
+        return self.value
+
+    def paths(self) -> List[Tuple[List[str], int]]:
+        """The flow decomposed into paths from the source to the target with the value flowing along them"""
+        source, target = self._source_index, self._target_index
+        if source is None or target is None:
+            return []
+        remaining = {user: dict(flows) for user, flows in self._flows.items()}
+        paths = []
+        while True:
+            path = _find_path(remaining, source, target)
+            if path is None:
+                break
+            amount = min(
+                remaining[sender][receiver] for sender, receiver in zip(path, path[1:])
+            )
+            _add_flow_along(remaining, path, -amount)
+            paths.append(([self.model.user(index) for index in path], amount))
+        return paths
+
+    def transfer_paths(
+        self, *, timestamp: int, max_fee: int = MAX_UINT64
+    ) -> List[TransferPath]:
+        """Transfers along the paths of the flow, with the values that can be transferred including the fees
+        paid by the sender, when the transfers are made one after the other at `timestamp`.
+        Their total value is the value that can be transferred from the source to the target."""
+        model = self.model.copy()
+        transfer_paths = []
+        for path, amount in self.paths():
+            transfer_path = _max_transfer(model, path, amount, timestamp, max_fee)
+            if transfer_path is not None:
+                model.transfer(
+                    transfer_path.value,
+                    max_fee,
+                    transfer_path.path,
+                    timestamp=timestamp,
+                )
+                transfer_paths.append(transfer_path)
+        return transfer_paths
+
+    def _flow(self, a: int, b: int) -> int:
+        return self._flows.get(a, {}).get(b, 0)
+
+    def _capacity(self, sender: int, receiver: int) -> int:
+        trustline = self.model.get_trustline_by_index(sender, receiver)
+        if trustline.is_frozen or self.model.is_network_frozen:
+            return 0
+        return max(trustline.creditline_received + trustline.balance, 0)
+
+    def _look_up_users(self) -> None:
+        try:
+            self._source_index = self.model.user_index(self.source)
+            self._target_index = self.model.user_index(self.target)
+        except KeyError:
+            pass
+
+    def _augment(self) -> None:
+        """Adds flow along shortest augmenting paths until there are none left"""
+        self._look_up_users()
+        while True:
+            path = self._find_augmenting_path()
+            if path is None:
+                return
+            amount = min(
+                self._capacity(sender, receiver) - self._flow(sender, receiver)
+                for sender, receiver in zip(path, path[1:])
+            )
+            _add_flow_along(self._flows, path, amount)
+            self.value += amount
+
+    def _find_augmenting_path(self) -> Optional[List[int]]:
+        model = self.model
+        source = self._source_index
+        target = self._target_index
+        if source is None or target is None or model.is_network_frozen:
+            return None
+        previous_users = {source: source}
+        queue = deque([source])
+        while queue:
+            user = queue.popleft()
+            flows = self._flows.get(user, {})
+            for receiver, record in zip(
+                model.neighbours(user), model.neighbour_records(user)
+            ):
+                if receiver in previous_users or record.is_frozen:
+                    continue
+                capacity = max(record.capacity(user, receiver), 0)
+                if capacity - flows.get(receiver, 0) <= 0:
+                    continue
+                previous_users[receiver] = user
+                if receiver == target:
+                    return _path_to(target, previous_users)
+                queue.append(receiver)
+        return None
+
+    def _reduce_flow(self, a: int, b: int, excess: int) -> None:
+        """Reduces the flow from `a` to `b` by `excess`, together with the flow leading to `a` and leaving `b`"""
+        source = self._source_index
+        target = self._target_index
+        assert (
+            source is not None and target is not None
+        ), "Flow without source or target"
+        while excess > 0:
+            to_a = [source] if a == source else _find_path(self._flows, source, a)
+            from_b = [target] if b == target else _find_path(self._flows, b, target)
+            if to_a is None or from_b is None:
+                # the flow from `a` to `b` is only part of cycles that do not carry value to the target
+                cycle_rest = _find_path(self._flows, b, a)
+                assert cycle_rest is not None, "Flow conservation violated"
+                walk = [a] + cycle_rest
+                is_cycle = True
+            else:
+                walk, is_cycle = _simple_walk(to_a, from_b)
+
+            amount = min(
+                [excess]
+                + [
+                    self._flow(sender, receiver)
+                    for sender, receiver in zip(walk, walk[1:])
+                ]
+            )
+            _add_flow_along(self._flows, walk, -amount)
+            excess -= amount
+            if not is_cycle:
+                self.value -= amount
+
+
+def _simple_walk(to_a: List[int], from_b: List[int]) -> Tuple[List[int], bool]:
+    """The path joining the paths `to_a` and `from_b` over the pair (a, b), or if they meet,
+    the cycle over the pair where they first meet after `b` and whether it is a cycle"""
+    positions_in_to_a = {user: position for position, user in enumerate(to_a)}
+    for end, user in enumerate(from_b, start=1):
+        if user in positions_in_to_a:
+            start = positions_in_to_a[user]
+            return to_a[start:] + from_b[:end], True
+    return to_a + from_b, False
+
+
+def max_flows_from(
+    model: CurrencyNetworkModel, source: str, targets: Iterable[str] = None
+) -> Dict[str, int]:
+    """The max flows ignoring fees from `source` to every user of `targets`, by default to all users"""
+    if targets is None:
+        targets = model.users
+    return {
+        target: MaxFlow(model, source, target).value
+        for target in targets
+        if target != source
+    }
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Liquidity:
+    """The value that can move from `source` to `target`, without fees and with the fees paid by the sender"""
+
+    source: str
+    target: str
+    max_flow: int
+    transferable_value: Optional[int] = None
+    fees: Optional[int] = None
+    transfer_paths: List[TransferPath] = attr.Factory(list)
+
+
+def analyze_liquidity(
+    model: CurrencyNetworkModel,
+    source: str,
+    targets: Iterable[str] = None,
+    *,
+    timestamp: int,
+    include_fees: bool = True,
+) -> List[Liquidity]:
+    """The liquidity from `source` to every user of `targets`, by default to all other users.
+    Without `include_fees` only the max flows are computed, which is a lot faster."""
+    if targets is None:
+        targets = model.users
+    liquidities = []
+    for target in targets:
+        if target == source:
+            continue
+        max_flow = MaxFlow(model, source, target)
+        if not include_fees:
+            liquidities.append(Liquidity(source, target, max_flow.value))
+            continue
+        transfer_paths = max_flow.transfer_paths(timestamp=timestamp)
+        liquidities.append(
+            Liquidity(
+                source,
+                target,
+                max_flow.value,
+                transferable_value=sum(path.value for path in transfer_paths),
+                fees=sum(path.fees for path in transfer_paths),
+                transfer_paths=transfer_paths,
+            )
+        )
+    return liquidities
+
+
+def _max_transfer(
+    model: CurrencyNetworkModel,
+    path: List[str],
+    max_value: int,
+    timestamp: int,
+    max_fee: int,
+) -> Optional[TransferPath]:
+    """The transfer of the highest value of at most `max_value` along `path`, or None if nothing can be transferred"""
+    best = None
+    low, high = 1, min(max_value, MAX_UINT64)
+    while low <= high:
+        value = (low + high) // 2
+        try:
+            result = simulate_transfer_sender_pays(
+                model, value, max_fee, path, timestamp=timestamp
+            )
+        except TransferInfeasible:
+            high = value - 1
+        else:
+            best = TransferPath(path=path, value=value, fees=result.fees)
+            low = value + 1
+    return best
+
+
+def _find_path(
+    flows: Dict[int, Dict[int, int]], start: int, end: int
+) -> Optional[List[int]]:
+    """A path from `start` to `end` along pairs with positive flow"""
+    previous_users = {start: start}
+    queue = deque([start])
+    while queue:
+        user = queue.popleft()
+        for receiver, flow in flows.get(user, {}).items():
+            if flow <= 0 or receiver in previous_users:
+                continue
+            previous_users[receiver] = user
+            if receiver == end:
+                return _path_to(end, previous_users)
+            queue.append(receiver)
+    return None
+
+
+def _path_to(end: int, previous_users: Dict[int, int]) -> List[int]:
+    path = [end]
+    while previous_users[path[-1]] != path[-1]:
+        path.append(previous_users[path[-1]])
+    return path[::-1]
+
+
+def _add_flow_along(flows: Dict[int, Dict[int, int]], path: List[int], amount: int):
+    for sender, receiver in zip(path, path[1:]):
+        sender_flows = flows.setdefault(sender, {})
+        receiver_flows = flows.setdefault(receiver, {})
+        sender_flows[receiver] = sender_flows.get(receiver, 0) + amount
+        receiver_flows[sender] = -sender_flows[receiver]
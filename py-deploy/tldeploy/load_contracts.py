@@ -1,14 +1,15 @@
 import collections
 
-from tlbin import load_packaged_contracts
+from tlbin import load_packaged_contracts_lazily
 
 
 # lazily load the contracts, so the compile_contracts fixture has a chance to
 # set TRUSTLINES_CONTRACTS_JSON
+# With the indexed contracts file, only the accessed contracts are decoded
 class LazyContractsLoader(collections.UserDict):
     def __getitem__(self, *args):
         if not self.data:
-            self.data = load_packaged_contracts()
+            self.data = load_packaged_contracts_lazily()
         return super().__getitem__(*args)
 
 
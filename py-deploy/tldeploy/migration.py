@@ -1,7 +1,7 @@
 import collections
 import math
 import os
-from typing import Dict, Set
+from typing import Dict, Iterable, Set, Tuple
 
 import click
 from deploy_tools.files import read_addresses_in_csv
@@ -10,8 +10,12 @@ from deploy_tools.transact import (
     increase_transaction_options_nonce,
     wait_for_successful_transaction_receipts,
 )
+from web3.datastructures import AttributeDict
+from tldeploy.event_store import EventStore, get_contract_logs
+from tldeploy.events import DecodedLog
 from tldeploy.interests import balance_with_interests
 from tldeploy.load_contracts import get_contract_interface
+from tldeploy.plan import NonceAllocator
 
 
 ADDRESS_0 = "0x0000000000000000000000000000000000000000"
@@ -24,9 +28,22 @@ def migrate_networks(
     transaction_options: Dict = None,
     private_key: bytes = None,
 ):
-    for [old_address, new_address] in read_addresses_to_migrate(
-        old_addresses_file_path, new_addresses_file_path
-    ):
+    migrate_network_pairs(
+        web3,
+        read_addresses_to_migrate(old_addresses_file_path, new_addresses_file_path),
+        transaction_options,
+        private_key,
+    )
+
+
+def migrate_network_pairs(
+    web3,
+    address_pairs: Iterable[Tuple[str, str]],
+    transaction_options: Dict = None,
+    private_key: bytes = None,
+):
+    """Migrate the networks of the pairs of old and new addresses"""
+    for [old_address, new_address] in address_pairs:
         click.secho(f"Migrating {old_address} to {new_address}", fg="green")
         NetworkMigrater(
             web3, old_address, new_address, transaction_options, private_key
@@ -37,10 +54,15 @@ def migrate_networks(
 def verify_networks_migrations(
     web3, old_addresses_file_path: str, new_addresses_file_path: str
 ):
+    verify_network_pairs_migrations(
+        web3,
+        read_addresses_to_migrate(old_addresses_file_path, new_addresses_file_path),
+    )
 
-    for [old_address, new_address] in read_addresses_to_migrate(
-        old_addresses_file_path, new_addresses_file_path
-    ):
+
+def verify_network_pairs_migrations(web3, address_pairs: Iterable[Tuple[str, str]]):
+    """Verify the migrations of the networks of the pairs of old and new addresses"""
+    for [old_address, new_address] in address_pairs:
         click.secho(
             f"Verifying migration from {old_address} to {new_address}", fg="green"
         )
@@ -71,7 +93,12 @@ def read_addresses_to_migrate(old_addresses_file_path, new_addresses_file_path):
 
 class NetworkMigrationVerifier:
     def __init__(
-        self, web3, old_currency_network_address: str, new_currency_network_address: str
+        self,
+        web3,
+        old_currency_network_address: str,
+        new_currency_network_address: str,
+        *,
+        event_store: EventStore = None,
     ):
         old_network_interface = get_contract_interface("CurrencyNetwork")
         self.old_network = web3.eth.contract(
@@ -81,6 +108,8 @@ class NetworkMigrationVerifier:
         self.new_network = web3.eth.contract(
             address=new_currency_network_address, abi=new_network_interface["abi"]
         )
+        # if given, the events of the old network are synced into and read from the store
+        self.event_store = event_store
         self.users = set(self.old_network.functions.getUsers().call())
         click.secho(
             f"Found {len(self.users)} users in the old currency network", fg="blue"
@@ -170,7 +199,9 @@ class NetworkMigrationVerifier:
         return old_on_boarder == new_on_boarder
 
     def verify_debts_migrated(self):
-        debts = get_all_debts_of_currency_network(self.old_network)
+        debts = get_all_debts_of_currency_network(
+            self.old_network, event_store=self.event_store
+        )
         for debtor in debts.keys():
             for creditor in debts[debtor].keys():
                 if not self.is_debt_migrated(debts, debtor, creditor):
@@ -208,9 +239,14 @@ class NetworkMigrater(NetworkMigrationVerifier):
         transaction_options: Dict = None,
         private_key: bytes = None,
         max_tx_queue_size=10,
+        nonce_allocator: NonceAllocator = None,
+        event_store: EventStore = None,
     ):
         super().__init__(
-            web3, old_currency_network_address, new_currency_network_address
+            web3,
+            old_currency_network_address,
+            new_currency_network_address,
+            event_store=event_store,
         )
 
         self.web3 = web3
@@ -225,6 +261,8 @@ class NetworkMigrater(NetworkMigrationVerifier):
 
         self.private_key = private_key
         self.max_tx_queue_size = max_tx_queue_size
+        # if given, the nonces are taken from the allocator shared with other migraters
+        self.nonce_allocator = nonce_allocator
         self.tx_queue: Set[str] = set()
 
     def migrate_network(self):
@@ -273,7 +311,7 @@ class NetworkMigrater(NetworkMigrationVerifier):
 
                 # the value of is_frozen we get from `getAccount` on a frozen network is always true, so not correct.
                 is_frozen = get_last_frozen_status_of_account(
-                    self.old_network, user, friend
+                    self.old_network, user, friend, event_store=self.event_store
                 )
 
                 set_account_call = self.new_network.functions.setAccount(
@@ -305,7 +343,9 @@ class NetworkMigrater(NetworkMigrationVerifier):
 
     def migrate_debts(self):
         click.secho("Debts migration")
-        debts = get_all_debts_of_currency_network(self.old_network)
+        debts = get_all_debts_of_currency_network(
+            self.old_network, event_store=self.event_store
+        )
         for debtor in debts.keys():
             for creditor in debts[debtor].keys():
                 set_debt_call = self.new_network.functions.setDebt(
@@ -317,7 +357,9 @@ class NetworkMigrater(NetworkMigrationVerifier):
 
     def migrate_trustline_update_requests(self):
         click.secho("Trustline requests migration")
-        request_events = get_pending_trustline_update_requests(self.old_network)
+        request_events = get_pending_trustline_update_requests(
+            self.old_network, event_store=self.event_store
+        )
         for request_event in request_events:
             event_args = request_event["args"]
             set_trustline_request_call = self.new_network.functions.setTrustlineRequest(
@@ -345,13 +387,22 @@ class NetworkMigrater(NetworkMigrationVerifier):
         self.wait_for_successfull_txs_in_queue()
 
     def call_contract_function_with_tx(self, function_call):
-        tx_hash = send_function_call_transaction(
-            function_call,
-            web3=self.web3,
-            transaction_options=self.transaction_options,
-            private_key=self.private_key,
-        )
-        increase_transaction_options_nonce(self.transaction_options)
+        if self.nonce_allocator is None:
+            tx_hash = send_function_call_transaction(
+                function_call,
+                web3=self.web3,
+                transaction_options=self.transaction_options,
+                private_key=self.private_key,
+            )
+            increase_transaction_options_nonce(self.transaction_options)
+        else:
+            with self.nonce_allocator.reserve() as nonce:
+                tx_hash = send_function_call_transaction(
+                    function_call,
+                    web3=self.web3,
+                    transaction_options=dict(self.transaction_options, nonce=nonce),
+                    private_key=self.private_key,
+                )
         self.tx_queue.add(tx_hash)
 
         if len(self.tx_queue) >= self.max_tx_queue_size:
@@ -362,24 +413,39 @@ class NetworkMigrater(NetworkMigrationVerifier):
         self.tx_queue = set()
 
 
-def get_last_frozen_status_of_account(currency_network, user, friend):
+def get_last_frozen_status_of_account(
+    currency_network, user, friend, *, event_store: EventStore = None
+):
     """Return the last frozen status of a trustline
     The difference with the value returned by `contract.function.getAccount(user, friend).call()` is that the value
     will always be true for a frozen network via `getAccout` while `get_last_status_of_old_account` will give the
     value of the trustline before the network froze."""
 
-    last_event = get_last_trustline_update_event(currency_network, user, friend)
+    last_event = get_last_trustline_update_event(
+        currency_network, user, friend, event_store=event_store
+    )
     return last_event["args"]["_isFrozen"]
 
 
-def get_last_trustline_update_event(currency_network, user, friend):
-    trustline_updates_from_user = currency_network.events.TrustlineUpdate().getLogs(
-        fromBlock=0, argument_filters={"_creditor": user, "_debtor": friend}
+def get_last_trustline_update_event(
+    currency_network, user, friend, *, event_store: EventStore = None
+):
+    trustline_updates_from_user = get_contract_logs(
+        currency_network,
+        "TrustlineUpdate",
+        argument_filters={"creditor": user, "debtor": friend},
+        event_store=event_store,
     )
-    trustline_updates_from_friend = currency_network.events.TrustlineUpdate().getLogs(
-        fromBlock=0, argument_filters={"_creditor": friend, "_debtor": user}
+    trustline_updates_from_friend = get_contract_logs(
+        currency_network,
+        "TrustlineUpdate",
+        argument_filters={"creditor": friend, "debtor": user},
+        event_store=event_store,
     )
-    all_trustline_updates = trustline_updates_from_user + trustline_updates_from_friend
+    all_trustline_updates = [
+        _to_web3_event(currency_network, log)
+        for log in trustline_updates_from_user + trustline_updates_from_friend
+    ]
     sorted_trustline_updates = sorted_events(all_trustline_updates)
 
     assert (
@@ -407,16 +473,19 @@ def sorted_events(events, reverse=False):
     )
 
 
-def get_all_debts_of_currency_network(currency_network):
+def get_all_debts_of_currency_network(
+    currency_network, *, event_store: EventStore = None
+):
     # We have to use events to retrieve the debts
     # We cannot use `users` of the currency network as some non users could have set a debt
-    all_debt_updates = currency_network.events.DebtUpdate().getLogs(fromBlock=0)
-    debts = collections.defaultdict(lambda: {})
+    debts: Dict[str, Dict[str, int]] = collections.defaultdict(dict)
 
-    for debt_update in all_debt_updates:
-        creditor = debt_update["args"]["_creditor"]
-        debtor = debt_update["args"]["_debtor"]
-        value = debt_update["args"]["_newDebt"]
+    for debt_update in get_contract_logs(
+        currency_network, "DebtUpdate", event_store=event_store
+    ):
+        creditor = debt_update.args.creditor
+        debtor = debt_update.args.debtor
+        value = debt_update.args.newDebt
 
         if creditor < debtor:
             debts[debtor][creditor] = value
@@ -426,14 +495,25 @@ def get_all_debts_of_currency_network(currency_network):
     return debts
 
 
-def get_pending_trustline_update_requests(currency_network):
-    all_requests = currency_network.events.TrustlineUpdateRequest().getLogs(fromBlock=0)
+def get_pending_trustline_update_requests(
+    currency_network, *, event_store: EventStore = None
+):
+    all_requests = get_contract_logs(
+        currency_network, "TrustlineUpdateRequest", event_store=event_store
+    )
     # we need to delete trustline requests that have been canceled
-    all_cancel = currency_network.events.TrustlineUpdateCancel().getLogs(fromBlock=0)
+    all_cancel = get_contract_logs(
+        currency_network, "TrustlineUpdateCancel", event_store=event_store
+    )
     # we need to delete trustline requests that have been accepted and resulted in a trustline update
-    all_updates = currency_network.events.TrustlineUpdate().getLogs(fromBlock=0)
+    all_updates = get_contract_logs(
+        currency_network, "TrustlineUpdate", event_store=event_store
+    )
 
-    all_events = all_requests + all_cancel + all_updates
+    all_events = [
+        _to_web3_event(currency_network, log)
+        for log in all_requests + all_cancel + all_updates
+    ]
     all_events = sorted_events(all_events)
 
     latest_trustline_updates = dict()
@@ -458,6 +538,31 @@ def get_pending_trustline_update_requests(currency_network):
     return list(latest_trustline_updates.values())
 
 
+def _to_web3_event(currency_network, log: DecodedLog) -> AttributeDict:
+    """The decoded `log` as an event of web3's `getLogs`, with the arguments named like in the abi,
+    which is what the helpers above return"""
+    event_abi = next(
+        entry
+        for entry in currency_network.abi
+        if entry["type"] == "event" and entry["name"] == log.event
+    )
+    return AttributeDict(
+        {
+            "args": AttributeDict(
+                {
+                    input["name"]: value
+                    for input, value in zip(event_abi["inputs"], log.args)
+                }
+            ),
+            "event": log.event,
+            "address": log.address,
+            "blockNumber": log.block_number,
+            "logIndex": log.log_index,
+            "transactionHash": log.transaction_hash,
+        }
+    )
+
+
 def unique_id(user_1: str, user_2: str):
     if user_1 < user_2:
         return user_1 + user_2
@@ -0,0 +1,445 @@
+# This file provides an in-memory model of the state of a currency network
+#
+# The model keeps users, friendships and trustlines like `CurrencyNetworkBasic` does, with users numbered
+# in order of appearance, the friends of every user in an array of user indexes and the trustlines in
+# mutable records with slots. Transfers are simulated with `tldeploy.simulation`, so that the model follows
+# the checks, fees and interests of the contracts exactly.
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tldeploy.batch import call_functions
+from tldeploy.events import DecodedLog
+from tldeploy.interests import calculate_balance_with_interests
+from tldeploy.simulation import (
+    CurrencyNetworkView,
+    TransferInfeasible,
+    TransferResult,
+    Trustline,
+    simulate_transfer_receiver_pays,
+    simulate_transfer_sender_pays,
+)
+
+_CLOSED_TRUSTLINE = Trustline()
+
+
+class TrustlineRecord:
+    """A trustline as seen from the party with the lower user index"""
+
+    __slots__ = (
+        "creditline_given",
+        "creditline_received",
+        "interest_rate_given",
+        "interest_rate_received",
+        "is_frozen",
+        "mtime",
+        "balance",
+    )
+
+    def __init__(self, trustline: Trustline) -> None:
+        self.update(trustline)
+
+    def update(self, trustline: Trustline) -> None:
+        self.creditline_given = trustline.creditline_given
+        self.creditline_received = trustline.creditline_received
+        self.interest_rate_given = trustline.interest_rate_given
+        self.interest_rate_received = trustline.interest_rate_received
+        self.is_frozen = trustline.is_frozen
+        self.mtime = trustline.mtime
+        self.balance = trustline.balance
+
+    def capacity(self, sender: int, receiver: int) -> int:
+        """The value the user with index `sender` can transfer to `receiver` over the trustline"""
+        if sender < receiver:
+            return self.creditline_received + self.balance
+        return self.creditline_given - self.balance
+
+    def to_trustline(self) -> Trustline:
+        return Trustline(
+            creditline_given=self.creditline_given,
+            creditline_received=self.creditline_received,
+            interest_rate_given=self.interest_rate_given,
+            interest_rate_received=self.interest_rate_received,
+            is_frozen=self.is_frozen,
+            mtime=self.mtime,
+            balance=self.balance,
+        )
+
+    def __repr__(self) -> str:
+        return f"TrustlineRecord({self.to_trustline()!r})"
+
+
+class CurrencyNetworkModel(CurrencyNetworkView):
+    """An in-memory model of the users and trustlines of a currency network.
+
+    It can be used everywhere a `CurrencyNetworkView` can be used, but also knows the users
+    and friends of every user, and applies transfers and trustline updates like the contract.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity_imbalance_fee_divisor: int = 0,
+        prevent_mediator_interests: bool = False,
+        is_network_frozen: bool = False,
+    ) -> None:
+        super().__init__(
+            capacity_imbalance_fee_divisor=capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=prevent_mediator_interests,
+            is_network_frozen=is_network_frozen,
+        )
+        self._users: List[str] = []
+        self._user_indexes: Dict[str, int] = {}
+        # for every user index the indexes of its friends, and the trustline records in the same order
+        self._neighbours: List[array] = []
+        self._neighbour_records: List[List[TrustlineRecord]] = []
+        # the records by the pair of user indexes, lower index first
+        self._records: Dict[Tuple[int, int], TrustlineRecord] = {}
+
+    @classmethod
+    def from_contract(
+        cls,
+        currency_network_contract,
+        user_pairs: Iterable[Tuple[str, str]] = None,
+        *,
+        block_identifier="latest",
+    ) -> "CurrencyNetworkModel":
+        """Creates a model from a snapshot of the state of the contract at `block_identifier`
+
+        Reads the users, their friends and all trustlines with batched calls.
+        If `user_pairs` is given, only the trustlines between these pairs are loaded.
+        """
+        web3 = currency_network_contract.web3
+        functions = currency_network_contract.functions
+        (
+            capacity_imbalance_fee_divisor,
+            prevent_mediator_interests,
+            is_network_frozen,
+        ) = call_functions(
+            web3,
+            [
+                functions.capacityImbalanceFeeDivisor(),
+                functions.preventMediatorInterests(),
+                functions.isNetworkFrozen(),
+            ],
+            block_identifier=block_identifier,
+        )
+        model = cls(
+            capacity_imbalance_fee_divisor=capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=prevent_mediator_interests,
+            is_network_frozen=is_network_frozen,
+        )
+
+        if user_pairs is None:
+            users = functions.getUsers().call(block_identifier=block_identifier)
+            friends_of_users = call_functions(
+                web3,
+                [functions.getFriends(user) for user in users],
+                block_identifier=block_identifier,
+            )
+            for user in users:
+                model.add_user(user)
+            # every trustline is loaded once, from the side of the user seen first
+            user_pairs = [
+                (user, friend)
+                for user, friends in zip(users, friends_of_users)
+                for friend in friends
+                if model.user_index(user) < model.user_index(friend)
+            ]
+        model.load_trustlines(
+            currency_network_contract, user_pairs, block_identifier=block_identifier
+        )
+        return model
+
+    @classmethod
+    def from_events(
+        cls,
+        logs: Iterable[DecodedLog],
+        *,
+        get_block_timestamp: Callable[[int], int] = None,
+        capacity_imbalance_fee_divisor: int = 0,
+        prevent_mediator_interests: bool = False,
+    ) -> "CurrencyNetworkModel":
+        """Creates a model by replaying the decoded `TrustlineUpdate`, `BalanceUpdate` and `NetworkFreeze` logs
+        of a currency network in the order they were emitted.
+
+        The events do not contain the mtime of the trustlines, which is the timestamp of the block of the last
+        balance update. It is only set if `get_block_timestamp` is given to look it up by block number.
+        """
+        model = cls(
+            capacity_imbalance_fee_divisor=capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=prevent_mediator_interests,
+        )
+        for log in logs:
+            model.apply_event(log, get_block_timestamp=get_block_timestamp)
+        return model
+
+    def load_trustlines(
+        self,
+        currency_network_contract,
+        user_pairs: Iterable[Tuple[str, str]],
+        *,
+        block_identifier="latest",
+    ) -> None:
+        """Loads the trustlines between the given pairs of users with batched `getAccount` calls"""
+        user_pairs = list(user_pairs)
+        accounts = call_functions(
+            currency_network_contract.web3,
+            [
+                currency_network_contract.functions.getAccount(a, b)
+                for a, b in user_pairs
+            ],
+            block_identifier=block_identifier,
+        )
+        for (a, b), account in zip(user_pairs, accounts):
+            self.set_trustline(a, b, Trustline(*account))
+
+    @property
+    def users(self) -> List[str]:
+        """The users in order of their user index"""
+        return list(self._users)
+
+    def add_user(self, user: str) -> int:
+        """Adds the user if it is not yet known and returns its user index"""
+        index = self._user_indexes.get(user)
+        if index is None:
+            index = len(self._users)
+            self._users.append(user)
+            self._user_indexes[user] = index
+            self._neighbours.append(array("l"))
+            self._neighbour_records.append([])
+        return index
+
+    def user_index(self, user: str) -> int:
+        return self._user_indexes[user]
+
+    def get_friends(self, user: str) -> List[str]:
+        """The users with a trustline to `user`, like `getFriends`"""
+        index = self._user_indexes.get(user)
+        if index is None:
+            return []
+        return [self._users[friend] for friend in self._neighbours[index]]
+
+    def has_trustline(self, a: str, b: str) -> bool:
+        index_a = self._user_indexes.get(a)
+        index_b = self._user_indexes.get(b)
+        if index_a is None or index_b is None:
+            return False
+        return (min(index_a, index_b), max(index_a, index_b)) in self._records
+
+    def neighbours(self, index: int) -> Sequence[int]:
+        """The user indexes of the friends of the user with `index`"""
+        return self._neighbours[index]
+
+    def neighbour_records(self, index: int) -> Sequence[TrustlineRecord]:
+        """The trustline records of the user with `index`, in the order of `neighbours`"""
+        return self._neighbour_records[index]
+
+    def user(self, index: int) -> str:
+        return self._users[index]
+
+    def get_trustline(self, a: str, b: str) -> Trustline:
+        """The trustline between `a` and `b` as seen from `a`"""
+        index_a = self._user_indexes.get(a)
+        index_b = self._user_indexes.get(b)
+        if index_a is None or index_b is None:
+            return _CLOSED_TRUSTLINE
+        return self.get_trustline_by_index(index_a, index_b)
+
+    def get_trustline_by_index(self, a: int, b: int) -> Trustline:
+        """The trustline between the users with index `a` and `b` as seen from `a`"""
+        if a < b:
+            record = self._records.get((a, b))
+            return _CLOSED_TRUSTLINE if record is None else record.to_trustline()
+        record = self._records.get((b, a))
+        return _CLOSED_TRUSTLINE if record is None else record.to_trustline().reverse()
+
+    def set_trustline(self, a: str, b: str, trustline: Trustline) -> None:
+        """Sets the trustline between `a` and `b` as seen from `a`, making them friends"""
+        index_a = self.add_user(a)
+        index_b = self.add_user(b)
+        if index_a > index_b:
+            index_a, index_b = index_b, index_a
+            trustline = trustline.reverse()
+        record = self._records.get((index_a, index_b))
+        if record is None:
+            record = TrustlineRecord(trustline)
+            self._records[(index_a, index_b)] = record
+            self._neighbours[index_a].append(index_b)
+            self._neighbour_records[index_a].append(record)
+            self._neighbours[index_b].append(index_a)
+            self._neighbour_records[index_b].append(record)
+        else:
+            record.update(trustline)
+
+    def remove_trustline(self, a: str, b: str) -> None:
+        """Removes the trustline between `a` and `b` and their friendship"""
+        index_a = self._user_indexes[a]
+        index_b = self._user_indexes[b]
+        del self._records[(min(index_a, index_b), max(index_a, index_b))]
+        for index, other in ((index_a, index_b), (index_b, index_a)):
+            position = self._neighbours[index].index(other)
+            del self._neighbours[index][position]
+            del self._neighbour_records[index][position]
+
+    def update_trustline(
+        self,
+        creditor: str,
+        debtor: str,
+        *,
+        creditline_given: int,
+        creditline_received: int,
+        interest_rate_given: int = 0,
+        interest_rate_received: int = 0,
+        is_frozen: bool = False,
+        timestamp: int,
+    ) -> None:
+        """Sets the agreement of the trustline like `_setTrustline` after both parties agreed to the update.
+        The interests are applied if the interest rates change."""
+        trustline = self.get_trustline(creditor, debtor)
+        balance = trustline.balance
+        mtime = trustline.mtime
+        if (
+            interest_rate_given != trustline.interest_rate_given
+            or interest_rate_received != trustline.interest_rate_received
+        ) and balance != 0:
+            balance = calculate_balance_with_interests(
+                balance,
+                mtime,
+                timestamp,
+                trustline.interest_rate_given,
+                trustline.interest_rate_received,
+            )
+            mtime = timestamp
+        self.set_trustline(
+            creditor,
+            debtor,
+            Trustline(
+                creditline_given=creditline_given,
+                creditline_received=creditline_received,
+                interest_rate_given=interest_rate_given,
+                interest_rate_received=interest_rate_received,
+                is_frozen=is_frozen,
+                mtime=mtime,
+                balance=balance,
+            ),
+        )
+
+    def close_trustline(self, a: str, b: str) -> None:
+        """Closes the trustline between `a` and `b` like `_closeTrustline`"""
+        trustline = self.get_trustline(a, b)
+        if trustline.balance != 0:
+            raise TransferInfeasible(
+                "A trustline can only be closed if its balance is zero."
+            )
+        if trustline.is_frozen or self.is_network_frozen:
+            raise TransferInfeasible("The trustline is frozen and cannot be closed.")
+        if self.has_trustline(a, b):
+            self.remove_trustline(a, b)
+
+    def freeze_network(self) -> None:
+        self.is_network_frozen = True
+
+    def transfer(
+        self,
+        value: int,
+        max_fee: int,
+        path: Sequence[str],
+        *,
+        timestamp: int,
+        receiver_pays: bool = False,
+    ) -> TransferResult:
+        """Applies the transfer to the model like `transfer` or `transferReceiverPays` at `timestamp`
+
+        Raises `TransferInfeasible` without modifying the model if the transfer would revert.
+        """
+        if receiver_pays:
+            result = simulate_transfer_receiver_pays(
+                self, value, max_fee, path, timestamp=timestamp
+            )
+        else:
+            result = simulate_transfer_sender_pays(
+                self, value, max_fee, path, timestamp=timestamp
+            )
+        self.apply(result)
+        return result
+
+    def apply(self, transfer: TransferResult) -> None:
+        """Applies the balance updates of a simulated transfer to the model"""
+        for update in transfer.balance_updates:
+            self._set_balance(
+                update.sender, update.receiver, update.balance, update.mtime
+            )
+
+    def apply_event(
+        self, log: DecodedLog, *, get_block_timestamp: Callable[[int], int] = None
+    ) -> None:
+        """Applies a decoded `TrustlineUpdate`, `BalanceUpdate` or `NetworkFreeze` log, ignoring other events.
+
+        A `TrustlineUpdate` to an empty agreement on a trustline without balance is taken to be
+        the closing of the trustline.
+        """
+        args: Any = log.args
+        if log.event == "TrustlineUpdate":
+            trustline = self.get_trustline(args.creditor, args.debtor)
+            is_closed = (
+                args.creditlineGiven == 0
+                and args.creditlineReceived == 0
+                and args.interestRateGiven == 0
+                and args.interestRateReceived == 0
+                and not args.isFrozen
+                and trustline.balance == 0
+            )
+            if is_closed:
+                if self.has_trustline(args.creditor, args.debtor):
+                    self.remove_trustline(args.creditor, args.debtor)
+                return
+            self.set_trustline(
+                args.creditor,
+                args.debtor,
+                Trustline(
+                    creditline_given=args.creditlineGiven,
+                    creditline_received=args.creditlineReceived,
+                    interest_rate_given=args.interestRateGiven,
+                    interest_rate_received=args.interestRateReceived,
+                    is_frozen=args.isFrozen,
+                    mtime=trustline.mtime,
+                    balance=trustline.balance,
+                ),
+            )
+        elif log.event == "BalanceUpdate":
+            mtime: Optional[int] = None
+            if get_block_timestamp is not None and log.block_number is not None:
+                mtime = get_block_timestamp(log.block_number)
+            self._set_balance(args.from_, args.to, args.value, mtime)
+        elif log.event == "NetworkFreeze":
+            self.freeze_network()
+
+    def copy(self) -> "CurrencyNetworkModel":
+        model = CurrencyNetworkModel(
+            capacity_imbalance_fee_divisor=self.capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=self.prevent_mediator_interests,
+            is_network_frozen=self.is_network_frozen,
+        )
+        for user in self._users:
+            model.add_user(user)
+        for (a, b), record in self._records.items():
+            model.set_trustline(self._users[a], self._users[b], record.to_trustline())
+        return model
+
+    def _set_balance(
+        self, a: str, b: str, balance: int, mtime: Optional[int] = None
+    ) -> None:
+        index_a = self.add_user(a)
+        index_b = self.add_user(b)
+        if index_a > index_b:
+            index_a, index_b = index_b, index_a
+            balance = -balance
+        record = self._records.get((index_a, index_b))
+        if record is None:
+            self.set_trustline(
+                self._users[index_a], self._users[index_b], _CLOSED_TRUSTLINE
+            )
+            record = self._records[(index_a, index_b)]
+        record.balance = balance
+        if mtime is not None:
+            record.mtime = mtime
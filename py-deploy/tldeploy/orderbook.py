@@ -0,0 +1,283 @@
+# This file provides an in-memory order book for orders of the exchange contract
+import bisect
+import heapq
+from fractions import Fraction
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import attr
+
+from tldeploy.exchange import (
+    NULL_ADDRESS,
+    Order,
+    get_partial_amount,
+    is_rounding_error,
+)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class OrderBookEntry:
+    order: Order
+    v: int
+    r: bytes
+    s: bytes
+    order_hash: bytes = attr.ib(eq=False, repr=False)
+
+    @order_hash.default
+    def _default_order_hash(self):
+        return bytes(self.order.hash())
+
+    @property
+    def price(self) -> Fraction:
+        """The amount of maker token the taker gets per taker token"""
+        return Fraction(self.order.maker_token_amount, self.order.taker_token_amount)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Fill:
+    entry: OrderBookEntry
+    fill_taker_token_amount: int
+    filled_maker_token_amount: int
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Match:
+    """The orders matched for a wanted amount of taker token, best price first"""
+
+    fills: List[Fill]
+
+    @property
+    def filled_taker_token_amount(self) -> int:
+        return sum(fill.fill_taker_token_amount for fill in self.fills)
+
+    @property
+    def filled_maker_token_amount(self) -> int:
+        return sum(fill.filled_maker_token_amount for fill in self.fills)
+
+    def batch_fill_orders(
+        self, exchange_contract, should_throw_on_insufficient_balance=False
+    ):
+        """Returns the `batchFillOrders` function call filling every matched order with its matched amount"""
+        return exchange_contract.functions.batchFillOrders(
+            *self._order_arguments(),
+            [fill.fill_taker_token_amount for fill in self.fills],
+            should_throw_on_insufficient_balance,
+            *self._signature_arguments(),
+        )
+
+    def fill_orders_up_to(
+        self, exchange_contract, should_throw_on_insufficient_balance=False
+    ):
+        """Returns the `fillOrdersUpTo` function call filling the matched orders up to the total matched amount"""
+        return exchange_contract.functions.fillOrdersUpTo(
+            *self._order_arguments(),
+            self.filled_taker_token_amount,
+            should_throw_on_insufficient_balance,
+            *self._signature_arguments(),
+        )
+
+    def _order_arguments(self):
+        return (
+            [fill.entry.order.order_addresses for fill in self.fills],
+            [fill.entry.order.order_values for fill in self.fills],
+        )
+
+    def _signature_arguments(self):
+        return (
+            [fill.entry.v for fill in self.fills],
+            [fill.entry.r for fill in self.fills],
+            [fill.entry.s for fill in self.fills],
+        )
+
+
+class OrderBook:
+    """Keeps signed orders indexed by token pair, price and expiration.
+
+    Filled and cancelled amounts are tracked by applying the `LogFill` and `LogCancel`
+    events of the exchange contract, so that matching only considers the amount that
+    is still available on chain.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[bytes, OrderBookEntry] = {}
+        self._unavailable_amounts: Dict[bytes, int] = {}
+        # per token pair a list of sort keys (-price, expiration, order hash) in ascending order
+        self._books: Dict[Tuple[str, str], List[Tuple[Fraction, int, bytes]]] = {}
+        self._expirations: List[Tuple[int, bytes]] = []
+        self._applied_events: Set[Tuple[bytes, int]] = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, order_hash):
+        return bytes(order_hash) in self._entries
+
+    def get(self, order_hash) -> Optional[OrderBookEntry]:
+        return self._entries.get(bytes(order_hash))
+
+    def order_hashes(self) -> List[bytes]:
+        return list(self._entries)
+
+    def add_order(self, order: Order, v: int, r: bytes, s: bytes) -> OrderBookEntry:
+        if order.maker_token_amount <= 0 or order.taker_token_amount <= 0:
+            raise ValueError("Token amount of order maker and taker must be positive.")
+        entry = OrderBookEntry(order, v, r, s)
+        if entry.order_hash in self._entries:
+            return self._entries[entry.order_hash]
+
+        self._entries[entry.order_hash] = entry
+        bisect.insort(self._books.setdefault(_pair(order), []), _sort_key(entry))
+        heapq.heappush(
+            self._expirations, (order.expiration_timestamp_in_sec, entry.order_hash)
+        )
+        return entry
+
+    def remove_order(self, order_hash) -> Optional[OrderBookEntry]:
+        entry = self._entries.pop(bytes(order_hash), None)
+        if entry is None:
+            return None
+
+        pair = _pair(entry.order)
+        book = self._books[pair]
+        key = _sort_key(entry)
+        del book[bisect.bisect_left(book, key)]
+        if not book:
+            del self._books[pair]
+        return entry
+
+    def unavailable_taker_token_amount(self, order_hash) -> int:
+        """The amount of taker token already filled or cancelled like `Exchange.getUnavailableTakerTokenAmount`"""
+        return self._unavailable_amounts.get(bytes(order_hash), 0)
+
+    def remaining_taker_token_amount(self, order_hash) -> int:
+        entry = self._entries.get(bytes(order_hash))
+        if entry is None:
+            return 0
+        return max(
+            entry.order.taker_token_amount
+            - self.unavailable_taker_token_amount(order_hash),
+            0,
+        )
+
+    def apply_event(self, event) -> None:
+        """Applies a `LogFill` or `LogCancel` event of the exchange contract"""
+        event_name = event.get("event")
+        if event_name == "LogFill":
+            amount = event["args"]["filledTakerTokenAmount"]
+        elif event_name == "LogCancel":
+            amount = event["args"]["cancelledTakerTokenAmount"]
+        else:
+            raise RuntimeError(
+                f"Expected event of type LogFill or LogCancel, got: {event}"
+            )
+
+        if event.get("transactionHash") is not None:
+            event_id = (bytes(event["transactionHash"]), event["logIndex"])
+            if event_id in self._applied_events:
+                return
+            self._applied_events.add(event_id)
+
+        order_hash = bytes(event["args"]["orderHash"])
+        self._unavailable_amounts[order_hash] = (
+            self.unavailable_taker_token_amount(order_hash) + amount
+        )
+        entry = self._entries.get(order_hash)
+        if entry is not None and self.remaining_taker_token_amount(order_hash) == 0:
+            self.remove_order(order_hash)
+
+    def apply_events(self, events: Iterable) -> None:
+        for event in events:
+            self.apply_event(event)
+
+    def update_unavailable_taker_token_amounts(self, amounts: Dict[bytes, int]) -> None:
+        """Sets the unavailable amounts of orders as queried from the exchange contract,
+        e.g. via `tldeploy.exchange.OrderAvailability.refresh_order_book`"""
+        for order_hash, amount in amounts.items():
+            order_hash = bytes(order_hash)
+            self._unavailable_amounts[order_hash] = amount
+            if (
+                order_hash in self._entries
+                and self.remaining_taker_token_amount(order_hash) == 0
+            ):
+                self.remove_order(order_hash)
+
+    def evict_expired(self, timestamp: int) -> List[OrderBookEntry]:
+        """Removes all orders that can no longer be filled at `timestamp` and returns them"""
+        evicted = []
+        while self._expirations and self._expirations[0][0] <= timestamp:
+            _, order_hash = heapq.heappop(self._expirations)
+            entry = self.remove_order(order_hash)
+            self._unavailable_amounts.pop(order_hash, None)
+            if entry is not None:
+                evicted.append(entry)
+        return evicted
+
+    def best_orders(
+        self, maker_token: str, taker_token: str
+    ) -> Iterator[OrderBookEntry]:
+        """Iterates over the orders selling `maker_token` for `taker_token`, best price for the taker first"""
+        for _, _, order_hash in list(self._books.get((maker_token, taker_token), [])):
+            entry = self._entries.get(order_hash)
+            if entry is not None:
+                yield entry
+
+    def match(
+        self,
+        maker_token: str,
+        taker_token: str,
+        fill_taker_token_amount: int,
+        *,
+        timestamp: int,
+        taker_address: str = None,
+        min_price: Fraction = None,
+    ) -> Match:
+        """Matches up to `fill_taker_token_amount` of taker token against the best priced orders.
+
+        Orders that are expired at `timestamp`, reserved for another taker, or whose fill would fail
+        because of the rounding error check of the exchange contract are skipped.
+        """
+        fills = []
+        amount_left = fill_taker_token_amount
+        for entry in self.best_orders(maker_token, taker_token):
+            if amount_left == 0:
+                break
+            if min_price is not None and entry.price < min_price:
+                break
+            order = entry.order
+            if timestamp >= order.expiration_timestamp_in_sec:
+                continue
+            if (
+                order.taker_address != NULL_ADDRESS
+                and order.taker_address != taker_address
+            ):
+                continue
+
+            fill_amount = min(
+                amount_left, self.remaining_taker_token_amount(entry.order_hash)
+            )
+            if fill_amount == 0:
+                continue
+            if is_rounding_error(
+                fill_amount, order.taker_token_amount, order.maker_token_amount
+            ):
+                continue
+
+            fills.append(
+                Fill(
+                    entry=entry,
+                    fill_taker_token_amount=fill_amount,
+                    filled_maker_token_amount=get_partial_amount(
+                        fill_amount, order.taker_token_amount, order.maker_token_amount
+                    ),
+                )
+            )
+            amount_left -= fill_amount
+
+        return Match(fills)
+
+
+def _pair(order: Order) -> Tuple[str, str]:
+    return order.maker_token, order.taker_token
+
+
+def _sort_key(entry: OrderBookEntry) -> Tuple[Fraction, int, bytes]:
+    return -entry.price, entry.order.expiration_timestamp_in_sec, entry.order_hash
@@ -0,0 +1,432 @@
+# This file provides a search for transfer paths in a `CurrencyNetworkModel`
+#
+# The searches are variants of Dijkstra's algorithm over user indexes, where the cost of a hop is the fee
+# of the mediator as calculated by the contracts. For `transfer` the fees are accumulated backwards from the
+# receiver like `_mediatedTransferSenderPays` does, for `transferReceiverPays` forwards from the sender.
+# A lower accumulated fee at a user always means a lower value to forward, so the first path found is the
+# cheapest one, preferring fewer hops between equally cheap paths. For `transferReceiverPays` this does not
+# hold if a cheaper path forwards a value too high for the capacity of a later trustline, so if the search
+# finds no feasible path, all paths with a bounded number of mediators are simulated instead. The found path is
+# simulated, which also checks interests and the prevention of mediator interests that the search does not consider.
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import attr
+
+from tldeploy.fees import (
+    calculate_fees,
+    calculate_fees_reverse,
+    calculate_imbalance_generated,
+)
+from tldeploy.interests import calculate_balance_with_interests
+from tldeploy.network_model import CurrencyNetworkModel
+from tldeploy.simulation import (
+    MAX_UINT64,
+    TransferInfeasible,
+    simulate_transfer_receiver_pays,
+    simulate_transfer_sender_pays,
+)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class TransferPath:
+    """A path for a transfer of `value` with the `fees` to give as `maxFee`"""
+
+    path: List[str]
+    value: int
+    fees: int
+
+
+class PathFinder:
+    """Finds cheapest and widest transfer paths in `model`, skipping frozen trustlines"""
+
+    def __init__(self, model: CurrencyNetworkModel) -> None:
+        self.model = model
+
+    def find_cheapest_path(
+        self,
+        source: str,
+        target: str,
+        value: int,
+        *,
+        timestamp: int,
+        max_fee: int = MAX_UINT64,
+        receiver_pays: bool = False,
+        max_fallback_mediators: int = 4,
+    ) -> Optional[TransferPath]:
+        """The path from `source` to `target` with the lowest fees for a transfer of `value` at `timestamp`.
+
+        Without `receiver_pays` the fees are paid by the sender like with `transfer`,
+        otherwise they are paid by the receiver like with `transferReceiverPays`. If the search for
+        `transferReceiverPays` finds no feasible path, all paths with at most `max_fallback_mediators`
+        users in between are simulated, and the cheapest feasible one is returned.
+        Returns None if there is no path with fees of at most `max_fee`.
+        """
+        if not self._can_transfer(source, target):
+            return None
+        source_index = self.model.user_index(source)
+        target_index = self.model.user_index(target)
+        if receiver_pays:
+            path = self._search_receiver_pays(
+                source_index, target_index, value, max_fee
+            )
+        else:
+            path = self._search_sender_pays(source_index, target_index, value, max_fee)
+        transfer_path = None
+        if path is not None:
+            transfer_path = self._simulate(
+                path, value, max_fee, timestamp, receiver_pays
+            )
+        if transfer_path is None and receiver_pays:
+            transfer_path = self._find_cheapest_simple_path(
+                source_index,
+                target_index,
+                value,
+                max_fee,
+                timestamp,
+                max_fallback_mediators,
+            )
+        return transfer_path
+
+    def find_max_capacity_path(
+        self,
+        source: str,
+        target: str,
+        *,
+        timestamp: int,
+        max_fee: int = MAX_UINT64,
+        receiver_pays: bool = False,
+    ) -> Optional[TransferPath]:
+        """The path from `source` to `target` with the highest capacity and the maximal value
+        that can be transferred along it at `timestamp`.
+
+        The path is the one with the widest bottleneck of creditlines and balances, the value transferable
+        along it is limited further by the fees. With high fees, another path may allow a higher value.
+        Returns None if no value can be transferred.
+        """
+        if not self._can_transfer(source, target):
+            return None
+        found = self._search_widest_path(
+            self.model.user_index(source), self.model.user_index(target)
+        )
+        if found is None:
+            return None
+        path, capacity = found
+
+        best = None
+        low, high = 1, min(capacity, MAX_UINT64)
+        while low <= high:
+            value = (low + high) // 2
+            transfer_path = self._simulate(
+                path, value, max_fee, timestamp, receiver_pays
+            )
+            if transfer_path is None:
+                high = value - 1
+            else:
+                best = transfer_path
+                low = value + 1
+        return best
+
+    def find_close_trustline_paths(
+        self,
+        user: str,
+        other_party: str,
+        *,
+        timestamp: int,
+        max_fee: int = MAX_UINT64,
+        max_mediators: int = 2,
+        max_candidates: int = 10,
+    ) -> List[TransferPath]:
+        """Paths for `closeTrustlineByTriangularTransfer` of `user` to bring the balance with `other_party`
+        to zero at `timestamp`, ranked by fees and length, cheapest first.
+
+        The paths are cycles from `user` over `other_party` and at most `max_mediators` other users
+        back to `user`, which do not use the trustline to close twice. The cycles are simulated like the
+        contract would transfer along them, including the prevention of mediator interests.
+        Returns an empty list if the balance already is zero, or the trustline cannot be closed.
+        """
+        model = self.model
+        trustline = model.get_trustline(user, other_party)
+        if (
+            not model.has_trustline(user, other_party)
+            or trustline.is_frozen
+            or model.is_network_frozen
+        ):
+            return []
+        try:
+            balance = calculate_balance_with_interests(
+                trustline.balance,
+                trustline.mtime,
+                timestamp,
+                trustline.interest_rate_given,
+                trustline.interest_rate_received,
+            )
+        except (ValueError, OverflowError):
+            return []
+        if balance == 0 or abs(balance) > MAX_UINT64:
+            return []
+
+        user_index = model.user_index(user)
+        other_index = model.user_index(other_party)
+        value = abs(balance)
+        if balance > 0:
+            # the other party owes the user, the user sends the balance around the cycle and the fees are
+            # taken from it like in `transferReceiverPays`
+            mediator_paths = self._simple_paths(
+                other_index, user_index, max_mediators, value - max_fee
+            )
+            paths = [[user_index] + path for path in mediator_paths]
+        else:
+            # the user owes the other party, who receives the balance back over the cycle
+            # and the user pays the fees on top like in `transfer`
+            mediator_paths = self._simple_paths(
+                user_index, other_index, max_mediators, value
+            )
+            paths = [path + [user_index] for path in mediator_paths]
+
+        candidates = []
+        for path in paths:
+            transfer_path = self._simulate(
+                path, value, max_fee, timestamp, receiver_pays=balance > 0
+            )
+            if transfer_path is not None:
+                candidates.append(transfer_path)
+        candidates.sort(key=lambda candidate: (candidate.fees, len(candidate.path)))
+        return candidates[:max_candidates]
+
+    def _find_cheapest_simple_path(
+        self,
+        source: int,
+        target: int,
+        value: int,
+        max_fee: int,
+        timestamp: int,
+        max_mediators: int,
+    ) -> Optional[TransferPath]:
+        """The cheapest of all paths for `transferReceiverPays` with at most `max_mediators` users in between,
+        preferring fewer hops between equally cheap paths, or None if none of them is feasible"""
+        best = None
+        for path in self._simple_paths(
+            source, target, max_mediators, 0, with_direct_trustline=True
+        ):
+            transfer_path = self._simulate(
+                path, value, max_fee, timestamp, receiver_pays=True
+            )
+            if transfer_path is not None and (
+                best is None
+                or (transfer_path.fees, len(transfer_path.path))
+                < (best.fees, len(best.path))
+            ):
+                best = transfer_path
+        return best
+
+    def _simple_paths(
+        self,
+        source: int,
+        target: int,
+        max_mediators: int,
+        min_capacity: int,
+        *,
+        with_direct_trustline: bool = False,
+    ) -> List[List[int]]:
+        """All paths from `source` to `target` with at most `max_mediators` users in between,
+        over trustlines that are not frozen and have at least `min_capacity`.
+        The trustline between `source` and `target` is only used `with_direct_trustline`."""
+        model = self.model
+        paths = []
+        path = [source]
+
+        def extend(user: int) -> None:
+            for receiver, record in zip(
+                model.neighbours(user), model.neighbour_records(user)
+            ):
+                if receiver in path or record.is_frozen:
+                    continue
+                if user == source and receiver == target and not with_direct_trustline:
+                    continue
+                if record.capacity(user, receiver) < min_capacity:
+                    continue
+                if receiver == target:
+                    paths.append(path + [receiver])
+                elif len(path) <= max_mediators:
+                    path.append(receiver)
+                    extend(receiver)
+                    path.pop()
+
+        extend(source)
+        return paths
+
+    def _can_transfer(self, source: str, target: str) -> bool:
+        return (
+            not self.model.is_network_frozen
+            and source != target
+            and bool(self.model.get_friends(source))
+            and bool(self.model.get_friends(target))
+        )
+
+    def _search_sender_pays(
+        self, source: int, target: int, value: int, max_fee: int
+    ) -> Optional[List[int]]:
+        model = self.model
+        divisor = model.capacity_imbalance_fee_divisor
+        # the lowest fees to forward the value from a user to the target, and the next user on the way
+        fees: Dict[int, int] = {target: 0}
+        next_users: Dict[int, int] = {}
+        visited = set()
+        heap: List[Tuple[int, int, int]] = [(0, 0, target)]
+        heappop, heappush = heapq.heappop, heapq.heappush
+        neighbours, neighbour_records = model.neighbours, model.neighbour_records
+
+        while heap:
+            fee, hops, user = heappop(heap)
+            if user in visited:
+                continue
+            if user == source:
+                return _path_from(source, target, next_users)
+            visited.add(user)
+            forwarded_value = value + fee
+
+            for sender, record in zip(neighbours(user), neighbour_records(user)):
+                if record.is_frozen or sender in visited:
+                    continue
+                if sender < user:
+                    balance = record.balance
+                    capacity = record.creditline_received + balance
+                else:
+                    balance = -record.balance
+                    capacity = record.creditline_given + balance
+
+                if user == target:
+                    hop_fee = 0
+                else:
+                    imbalance_generated = calculate_imbalance_generated(
+                        forwarded_value, balance
+                    )
+                    if divisor == 1 and imbalance_generated > 0:
+                        continue
+                    hop_fee = calculate_fees_reverse(imbalance_generated, divisor)
+
+                sender_fee = fee + hop_fee
+                if sender_fee > max_fee or value + sender_fee > capacity:
+                    continue
+                if sender_fee < fees.get(sender, MAX_UINT64 + 1):
+                    fees[sender] = sender_fee
+                    next_users[sender] = user
+                    heappush(heap, (sender_fee, hops + 1, sender))
+        return None
+
+    def _search_receiver_pays(
+        self, source: int, target: int, value: int, max_fee: int
+    ) -> Optional[List[int]]:
+        model = self.model
+        divisor = model.capacity_imbalance_fee_divisor
+        # the lowest fees taken from the value on the way from the source to a user, and the previous user
+        fees: Dict[int, int] = {source: 0}
+        previous_users: Dict[int, int] = {}
+        visited = set()
+        heap: List[Tuple[int, int, int]] = [(0, 0, source)]
+        heappop, heappush = heapq.heappop, heapq.heappush
+        neighbours, neighbour_records = model.neighbours, model.neighbour_records
+
+        while heap:
+            fee, hops, user = heappop(heap)
+            if user in visited:
+                continue
+            if user == target:
+                return _path_from(target, source, previous_users)[::-1]
+            visited.add(user)
+            forwarded_value = value - fee
+
+            for receiver, record in zip(neighbours(user), neighbour_records(user)):
+                if record.is_frozen or receiver in visited:
+                    continue
+                if user < receiver:
+                    balance = record.balance
+                    capacity = record.creditline_received + balance
+                else:
+                    balance = -record.balance
+                    capacity = record.creditline_given + balance
+                if forwarded_value > capacity:
+                    continue
+
+                if receiver == target:
+                    hop_fee = 0
+                else:
+                    hop_fee = calculate_fees(
+                        calculate_imbalance_generated(forwarded_value, balance),
+                        divisor,
+                    )
+                receiver_fee = fee + hop_fee
+                if receiver_fee > max_fee or hop_fee > forwarded_value:
+                    continue
+                if receiver_fee < fees.get(receiver, MAX_UINT64 + 1):
+                    fees[receiver] = receiver_fee
+                    previous_users[receiver] = user
+                    heappush(heap, (receiver_fee, hops + 1, receiver))
+        return None
+
+    def _search_widest_path(
+        self, source: int, target: int
+    ) -> Optional[Tuple[List[int], int]]:
+        model = self.model
+        # the highest bottleneck capacity from the source to a user, and the previous user
+        capacities: Dict[int, int] = {source: MAX_UINT64}
+        previous_users: Dict[int, int] = {}
+        visited = set()
+        heap: List[Tuple[int, int, int]] = [(-MAX_UINT64, 0, source)]
+        heappop, heappush = heapq.heappop, heapq.heappush
+        neighbours, neighbour_records = model.neighbours, model.neighbour_records
+
+        while heap:
+            negative_capacity, hops, user = heappop(heap)
+            if user in visited:
+                continue
+            if user == target:
+                return (
+                    _path_from(target, source, previous_users)[::-1],
+                    -negative_capacity,
+                )
+            visited.add(user)
+
+            for receiver, record in zip(neighbours(user), neighbour_records(user)):
+                if record.is_frozen or receiver in visited:
+                    continue
+                if user < receiver:
+                    capacity = record.creditline_received + record.balance
+                else:
+                    capacity = record.creditline_given - record.balance
+                capacity = min(capacity, -negative_capacity)
+                if capacity > capacities.get(receiver, 0):
+                    capacities[receiver] = capacity
+                    previous_users[receiver] = user
+                    heappush(heap, (-capacity, hops + 1, receiver))
+        return None
+
+    def _simulate(
+        self,
+        path: List[int],
+        value: int,
+        max_fee: int,
+        timestamp: int,
+        receiver_pays: bool,
+    ) -> Optional[TransferPath]:
+        addresses = [self.model.user(index) for index in path]
+        simulate = (
+            simulate_transfer_receiver_pays
+            if receiver_pays
+            else simulate_transfer_sender_pays
+        )
+        try:
+            result = simulate(
+                self.model, value, max_fee, addresses, timestamp=timestamp
+            )
+        except TransferInfeasible:
+            return None
+        return TransferPath(path=addresses, value=value, fees=result.fees)
+
+
+def _path_from(start: int, end: int, next_users: Dict[int, int]) -> List[int]:
+    path = [start]
+    while path[-1] != end:
+        path.append(next_users[path[-1]])
+    return path
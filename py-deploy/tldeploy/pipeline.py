@@ -0,0 +1,118 @@
+# This file provides a way to send many deployment transactions without waiting for each receipt
+from typing import Dict, List, Tuple
+
+from deploy_tools.transact import (
+    send_function_call_transaction,
+    wait_for_successful_transaction_receipts,
+)
+from eth_typing import ChecksumAddress
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+
+from tldeploy.contract_factory import get_contract_factory
+
+
+class AddressPredictionFailed(Exception):
+    def __init__(self, predicted_address, contract_address):
+        super().__init__(
+            f"Contract was deployed at {contract_address} instead of the predicted {predicted_address}, "
+            "did another transaction of the deployer get in between?"
+        )
+        self.predicted_address = predicted_address
+        self.contract_address = contract_address
+
+
+def _rlp_encode_nonce(nonce: int) -> bytes:
+    if nonce == 0:
+        return b"\x80"
+    if nonce < 0x80:
+        return bytes([nonce])
+    encoded = nonce.to_bytes((nonce.bit_length() + 7) // 8, byteorder="big")
+    return bytes([0x80 + len(encoded)]) + encoded
+
+
+def contract_address(deployer: str, nonce: int) -> ChecksumAddress:
+    """The address of the contract created by a transaction of `deployer` with nonce `nonce`
+
+    It is the keccak hash of the rlp encoded list [deployer, nonce]."""
+    encoded_deployer = b"\x94" + to_canonical_address(deployer)
+    encoded_nonce = _rlp_encode_nonce(nonce)
+    payload = encoded_deployer + encoded_nonce
+    return to_checksum_address(keccak(bytes([0xC0 + len(payload)]) + payload)[12:])
+
+
+class DeploymentPipeline:
+    """Sends transactions back-to-back with consecutive nonces and confirms their receipts in bulk.
+
+    The addresses of deployed contracts are predicted from the deployer address and the nonce,
+    so that following transactions can already use them. The gas limit has to be given in the
+    transaction options, as it cannot be estimated for calls to contracts that are not deployed yet.
+    """
+
+    def __init__(
+        self, web3: Web3, *, transaction_options: Dict, private_key: bytes = None
+    ) -> None:
+        if "gas" not in transaction_options:
+            raise ValueError(
+                "Pipelined deployment needs the gas limit in the transaction options."
+            )
+        self.web3 = web3
+        self.private_key = private_key
+        self.transaction_options = transaction_options
+        if private_key is not None:
+            self.deployer = web3.eth.account.from_key(private_key).address
+        else:
+            self.deployer = transaction_options.get(
+                "from", web3.eth.defaultAccount or web3.eth.accounts[0]
+            )
+        if "nonce" in transaction_options:
+            self.nonce = transaction_options["nonce"]
+        else:
+            self.nonce = web3.eth.getTransactionCount(
+                self.deployer, block_identifier="pending"
+            )
+        self.tx_hashes: List[HexBytes] = []
+        self._deployments: List[Tuple[HexBytes, str]] = []
+
+    def deploy(self, contract_name: str, constructor_args=()):
+        """Sends the deployment of `contract_name` and returns the contract at its predicted address"""
+        factory = get_contract_factory(self.web3, contract_name)
+        address = contract_address(self.deployer, self.nonce)
+        tx_hash = self.transact(factory.constructor(*constructor_args))
+        self._deployments.append((tx_hash, address))
+        return factory.contract(address)
+
+    def transact(self, function_call) -> HexBytes:
+        """Sends the transaction of `function_call` with the next nonce"""
+        transaction_options = dict(self.transaction_options, nonce=self.nonce)
+        if self.private_key is None:
+            transaction_options["from"] = self.deployer
+        tx_hash = send_function_call_transaction(
+            function_call,
+            web3=self.web3,
+            transaction_options=transaction_options,
+            private_key=self.private_key,
+        )
+        self.nonce += 1
+        if "nonce" in self.transaction_options:
+            self.transaction_options["nonce"] = self.nonce
+        self.tx_hashes.append(tx_hash)
+        return tx_hash
+
+    def wait_for_receipts(self, timeout=300) -> None:
+        """Waits until all sent transactions are mined successfully.
+
+        Raises `TransactionsFailed` if any failed, or `AddressPredictionFailed`
+        if a contract was not deployed at its predicted address."""
+        wait_for_successful_transaction_receipts(
+            self.web3, self.tx_hashes, timeout=timeout
+        )
+        for tx_hash, predicted_address in self._deployments:
+            receipt = self.web3.eth.getTransactionReceipt(tx_hash)
+            if receipt["contractAddress"] != predicted_address:
+                raise AddressPredictionFailed(
+                    predicted_address, receipt["contractAddress"]
+                )
+        self.tx_hashes = []
+        self._deployments = []
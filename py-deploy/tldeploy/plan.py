@@ -0,0 +1,398 @@
+# This file provides declarative deployment plans and an executor running them
+#
+# A plan is a json file describing contracts to deploy and functions to call:
+#
+#     {
+#       "steps": {
+#         "exchange": {"deploy": "Exchange"},
+#         "unw_eth": {"deploy": "UnwEth"},
+#         "authorize_exchange": {
+#           "call": "unw_eth",
+#           "function": "addAuthorizedAddress",
+#           "args": ["${exchange}"]
+#         }
+#       }
+#     }
+#
+# A step either deploys the contract `deploy` with the constructor arguments `args`, or calls
+# `function` of the contract deployed by the step `call`. `call` can also be an address,
+# then `contract` gives the name of the contract whose abi is used. `contract` can also be used
+# to call a contract deployed by another step with a different abi, e.g. a proxy.
+# Arguments of the form "${step}" are replaced by the address deployed by that step.
+# A step runs after all steps it references, and after the steps listed in `depends_on`.
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import attr
+from deploy_tools.transact import send_function_call_transaction
+from eth_utils import is_address, to_checksum_address
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+
+from tldeploy.contract_factory import get_contract_factory
+from tldeploy.load_contracts import contracts
+
+REFERENCE_PATTERN = re.compile(r"^\$\{([^}]+)\}$")
+
+STATUS_SENT = "sent"
+STATUS_DONE = "done"
+
+
+class PlanError(Exception):
+    pass
+
+
+class StepFailed(Exception):
+    def __init__(self, step_id, transaction_hash):
+        super().__init__(
+            f"Transaction {HexBytes(transaction_hash).hex()} of step {step_id} failed"
+        )
+        self.step_id = step_id
+        self.transaction_hash = transaction_hash
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Step:
+    id: str
+    deploy: Optional[str] = None
+    call: Optional[str] = None
+    contract: Optional[str] = None
+    function: Optional[str] = None
+    args: List[Any] = attr.ib(factory=list)
+    depends_on: List[str] = attr.ib(factory=list)
+
+    @classmethod
+    def from_dict(cls, step_id: str, step: Dict) -> "Step":
+        unknown_keys = set(step) - {
+            "deploy",
+            "call",
+            "contract",
+            "function",
+            "args",
+            "depends_on",
+        }
+        if unknown_keys:
+            raise PlanError(f"Unknown keys {sorted(unknown_keys)} in step {step_id}")
+        if ("deploy" in step) == ("call" in step):
+            raise PlanError(f"Step {step_id} needs exactly one of deploy or call")
+        if "call" in step and "function" not in step:
+            raise PlanError(f"Step {step_id} calls no function")
+        return cls(id=step_id, **step)
+
+    def references(self) -> Set[str]:
+        """The ids of the steps whose deployed address this step uses"""
+        references = set(_references(self.args))
+        if self.call is not None and not is_address(self.call):
+            references.add(self.call)
+        return references
+
+    def dependencies(self) -> Set[str]:
+        return self.references() | set(self.depends_on)
+
+
+def _references(value) -> Iterator[str]:
+    if isinstance(value, str):
+        match = REFERENCE_PATTERN.match(value)
+        if match:
+            yield match.group(1)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _references(item)
+
+
+class DeploymentPlan:
+    def __init__(self, steps: List[Step]) -> None:
+        self.steps: Dict[str, Step] = {}
+        for step in steps:
+            if step.id in self.steps:
+                raise PlanError(f"Duplicate step {step.id}")
+            self.steps[step.id] = step
+        self._validate()
+
+    @classmethod
+    def from_dict(cls, plan: Dict) -> "DeploymentPlan":
+        return cls(
+            [
+                Step.from_dict(step_id, step)
+                for step_id, step in plan.get("steps", {}).items()
+            ]
+        )
+
+    @classmethod
+    def load(cls, plan_file_path: str) -> "DeploymentPlan":
+        with open(plan_file_path) as file:
+            return cls.from_dict(json.load(file))
+
+    def _validate(self) -> None:
+        for step in self.steps.values():
+            for dependency in step.dependencies():
+                if dependency not in self.steps:
+                    raise PlanError(
+                        f"Step {step.id} depends on unknown step {dependency}"
+                    )
+            for reference in step.references():
+                if self.steps[reference].deploy is None:
+                    raise PlanError(
+                        f"Step {step.id} uses the address of {reference}, which deploys nothing"
+                    )
+            if step.call is not None and step.contract is None:
+                if is_address(step.call):
+                    raise PlanError(f"Step {step.id} needs the contract name to call")
+        self.execution_order()
+
+    def execution_order(self) -> List[str]:
+        """The step ids in an order that respects all dependencies"""
+        order: List[str] = []
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(step_id):
+            if step_id in done:
+                return
+            if step_id in visiting:
+                raise PlanError(f"Cyclic dependency with step {step_id}")
+            visiting.add(step_id)
+            for dependency in sorted(self.steps[step_id].dependencies()):
+                visit(dependency)
+            visiting.remove(step_id)
+            done.add(step_id)
+            order.append(step_id)
+
+        for step_id in self.steps:
+            visit(step_id)
+        return order
+
+
+class PlanState:
+    """The progress of a plan execution, persisted to `state_file_path` after every change if given"""
+
+    def __init__(self, state_file_path: str = None) -> None:
+        self.state_file_path = state_file_path
+        self.steps: Dict[str, Dict] = {}
+        if state_file_path is not None and os.path.exists(state_file_path):
+            with open(state_file_path) as file:
+                self.steps = json.load(file)["steps"]
+
+    def is_done(self, step_id: str) -> bool:
+        return self.steps.get(step_id, {}).get("status") == STATUS_DONE
+
+    def address(self, step_id: str) -> Optional[str]:
+        return self.steps.get(step_id, {}).get("address")
+
+    def sent_transaction_hash(self, step_id: str) -> Optional[HexBytes]:
+        step = self.steps.get(step_id, {})
+        if step.get("status") != STATUS_SENT:
+            return None
+        return HexBytes(step["transaction_hash"])
+
+    def mark_sent(self, step_id: str, transaction_hash) -> None:
+        self.steps[step_id] = {
+            "status": STATUS_SENT,
+            "transaction_hash": HexBytes(transaction_hash).hex(),
+        }
+        self._save()
+
+    def mark_done(self, step_id: str, address: Optional[str]) -> None:
+        self.steps[step_id]["status"] = STATUS_DONE
+        if address is not None:
+            self.steps[step_id]["address"] = address
+        self._save()
+
+    def forget(self, step_id: str) -> None:
+        self.steps.pop(step_id, None)
+        self._save()
+
+    def _save(self) -> None:
+        if self.state_file_path is None:
+            return
+        temporary_path = self.state_file_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"steps": self.steps}, file, indent=2)
+        os.replace(temporary_path, self.state_file_path)
+
+
+class NonceAllocator:
+    """Hands out consecutive nonces of an account, a nonce is only used up if sending succeeded"""
+
+    def __init__(self, web3, address: str, nonce: int = None) -> None:
+        if nonce is None:
+            nonce = web3.eth.getTransactionCount(address, block_identifier="pending")
+        self.nonce = nonce
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reserve(self) -> Iterator[int]:
+        with self._lock:
+            yield self.nonce
+            self.nonce += 1
+
+
+class PlanExecutor:
+    """Executes a deployment plan, sending the transactions of all steps whose dependencies are
+    mined back-to-back, so that independent branches of the plan are mined concurrently.
+
+    Steps that are done according to the state are skipped, and transactions that were sent
+    before are awaited instead of being sent again, so that a partial run can be resumed.
+    A `TimeoutError` is raised if no step gets mined for `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        web3,
+        plan: DeploymentPlan,
+        *,
+        state: PlanState = None,
+        transaction_options: Dict = None,
+        private_key: bytes = None,
+        nonce_allocator: NonceAllocator = None,
+        poll_interval: float = 1.0,
+        timeout: float = 600,
+    ) -> None:
+        if transaction_options is None:
+            transaction_options = {}
+        if state is None:
+            state = PlanState()
+        self.web3 = web3
+        self.plan = plan
+        self.state = state
+        self.transaction_options = dict(transaction_options)
+        self.private_key = private_key
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._execution_order = plan.execution_order()
+
+        if private_key is not None:
+            self.sender = web3.eth.account.from_key(private_key).address
+        else:
+            self.sender = self.transaction_options.get(
+                "from", web3.eth.defaultAccount or web3.eth.accounts[0]
+            )
+        if nonce_allocator is None:
+            nonce_allocator = NonceAllocator(
+                web3, self.sender, self.transaction_options.pop("nonce", None)
+            )
+        self.nonce_allocator = nonce_allocator
+
+    def run(self) -> Dict[str, Optional[str]]:
+        """Runs all steps that are not done yet and returns the deployed addresses per step"""
+        in_flight: Dict[str, HexBytes] = {}
+        for step_id in self._execution_order:
+            transaction_hash = self.state.sent_transaction_hash(step_id)
+            if transaction_hash is None:
+                continue
+            if self._is_transaction_known(transaction_hash):
+                in_flight[step_id] = transaction_hash
+            else:
+                # the transaction got dropped, it will be sent again
+                self.state.forget(step_id)
+
+        deadline = time.monotonic() + self.timeout
+        while not all(self.state.is_done(step_id) for step_id in self.plan.steps):
+            for step_id in self._ready_steps(in_flight):
+                in_flight[step_id] = self._send(self.plan.steps[step_id])
+
+            if self._collect_receipts(in_flight):
+                # the timeout limits the time waiting without any step getting mined
+                deadline = time.monotonic() + self.timeout
+            else:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(
+                        f"Steps {sorted(in_flight)} were not mined in time"
+                    )
+                time.sleep(self.poll_interval)
+
+        return {
+            step_id: self.state.address(step_id)
+            for step_id, step in self.plan.steps.items()
+            if step.deploy is not None
+        }
+
+    def _ready_steps(self, in_flight) -> List[str]:
+        return [
+            step_id
+            for step_id in self._execution_order
+            if not self.state.is_done(step_id)
+            and step_id not in in_flight
+            and all(
+                self.state.is_done(dependency)
+                for dependency in self.plan.steps[step_id].dependencies()
+            )
+        ]
+
+    def _collect_receipts(self, in_flight) -> bool:
+        """Marks the steps with mined transactions as done and returns whether there were any"""
+        progressed = False
+        for step_id, transaction_hash in list(in_flight.items()):
+            try:
+                receipt = self.web3.eth.getTransactionReceipt(transaction_hash)
+            except TransactionNotFound:
+                receipt = None
+            if receipt is None:
+                continue
+            del in_flight[step_id]
+            if receipt["status"] != 1:
+                # a rerun sends the step again
+                self.state.forget(step_id)
+                raise StepFailed(step_id, transaction_hash)
+            self.state.mark_done(step_id, receipt["contractAddress"])
+            progressed = True
+        return progressed
+
+    def _is_transaction_known(self, transaction_hash) -> bool:
+        try:
+            self.web3.eth.getTransaction(transaction_hash)
+        except TransactionNotFound:
+            return False
+        return True
+
+    def _send(self, step: Step) -> HexBytes:
+        function_call = self._function_call(step)
+        transaction_options = dict(self.transaction_options)
+        if self.private_key is None:
+            transaction_options["from"] = self.sender
+        if "gas" not in transaction_options:
+            # estimate before reserving a nonce, so that a failing estimation does not leave a gap
+            transaction_options["gas"] = function_call.estimateGas(
+                {"from": self.sender}
+            )
+
+        with self.nonce_allocator.reserve() as nonce:
+            transaction_options["nonce"] = nonce
+            transaction_hash = send_function_call_transaction(
+                function_call,
+                web3=self.web3,
+                transaction_options=transaction_options,
+                private_key=self.private_key,
+            )
+        self.state.mark_sent(step.id, transaction_hash)
+        return transaction_hash
+
+    def _function_call(self, step):
+        args = self._resolve(step.args)
+        if step.deploy is not None:
+            return get_contract_factory(self.web3, step.deploy).constructor(*args)
+
+        if is_address(step.call):
+            address = to_checksum_address(step.call)
+        else:
+            address = self.state.address(step.call)
+        contract_name = step.contract or self.plan.steps[step.call].deploy
+        contract = self.web3.eth.contract(
+            address=address, abi=contracts[contract_name]["abi"]
+        )
+        return contract.functions[step.function](*args)
+
+    def _resolve(self, value):
+        if isinstance(value, str):
+            match = REFERENCE_PATTERN.match(value)
+            if match:
+                return self.state.address(match.group(1))
+            return value
+        elif isinstance(value, list):
+            return [self._resolve(item) for item in value]
+        return value
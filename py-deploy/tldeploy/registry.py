@@ -0,0 +1,104 @@
+# This file provides a client reading the currency networks of a CurrencyNetworkRegistry contract
+from typing import Dict, List
+
+import attr
+from web3.contract import Contract
+
+from tldeploy.batch import DEFAULT_BATCH_SIZE, call_functions
+from tldeploy.core import NetworkSettings, NetworkSettingsReader
+from tldeploy.load_contracts import get_contract_interface
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class CurrencyNetworkMetadata:
+    address: str
+    first_registration_by: str
+    name: str
+    symbol: str
+    decimals: int
+
+
+class CurrencyNetworkRegistryClient:
+    """Reads the networks registered in the registry at `registry_address` with batched calls.
+
+    The registry only appends networks and keeps the metadata of their first registration,
+    so the addresses and metadata are cached and `sync` only reads the networks registered since the last sync.
+    """
+
+    def __init__(
+        self, web3, registry_address: str, *, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> None:
+        self.web3 = web3
+        self.batch_size = batch_size
+        self.contract = web3.eth.contract(
+            address=registry_address,
+            abi=get_contract_interface("CurrencyNetworkRegistry")["abi"],
+        )
+        self._addresses: List[str] = []
+        self._metadata: Dict[str, CurrencyNetworkMetadata] = {}
+
+    def sync(self, block_identifier="latest") -> List[str]:
+        """Read the networks registered since the last sync and return their addresses"""
+        functions = self.contract.functions
+        count = functions.getCurrencyNetworkCount().call(
+            block_identifier=block_identifier
+        )
+        new_addresses = call_functions(
+            self.web3,
+            [
+                functions.getCurrencyNetworkAddress(index)
+                for index in range(len(self._addresses), count)
+            ],
+            block_identifier=block_identifier,
+            batch_size=self.batch_size,
+        )
+        new_metadata = call_functions(
+            self.web3,
+            [
+                functions.getCurrencyNetworkMetadata(address)
+                for address in new_addresses
+            ],
+            block_identifier=block_identifier,
+            batch_size=self.batch_size,
+        )
+        for address, (first_registration_by, name, symbol, decimals) in zip(
+            new_addresses, new_metadata
+        ):
+            self._metadata[address] = CurrencyNetworkMetadata(
+                address=address,
+                first_registration_by=first_registration_by,
+                name=name,
+                symbol=symbol,
+                decimals=decimals,
+            )
+        self._addresses.extend(new_addresses)
+        return new_addresses
+
+    @property
+    def network_addresses(self) -> List[str]:
+        """The addresses of the synced networks in order of registration"""
+        return list(self._addresses)
+
+    def get_metadata(self, address: str) -> CurrencyNetworkMetadata:
+        return self._metadata[address]
+
+    def metadata(self) -> List[CurrencyNetworkMetadata]:
+        return [self._metadata[address] for address in self._addresses]
+
+    def currency_networks(
+        self, currency_network_contract_name: str = "CurrencyNetwork"
+    ) -> List[Contract]:
+        """The synced networks as contracts with the abi of `currency_network_contract_name`"""
+        abi = get_contract_interface(currency_network_contract_name)["abi"]
+        return [
+            self.web3.eth.contract(address=address, abi=abi)
+            for address in self._addresses
+        ]
+
+    def get_network_settings(
+        self, network_settings_reader: NetworkSettingsReader = None
+    ) -> List[NetworkSettings]:
+        """The settings of the synced networks, read in one batch"""
+        if network_settings_reader is None:
+            network_settings_reader = NetworkSettingsReader(self.web3)
+        return network_settings_reader.get_network_settings(self.currency_networks())
@@ -1,21 +1,55 @@
 from typing import List, Tuple, Union
 
+from eth_hash.auto import keccak
 from eth_keys import keys
 from eth_keys.exceptions import BadSignature
 from web3 import Web3
 
+ETH_SIGNED_MESSAGE_PREFIX = b"\x19Ethereum Signed Message:\n32"
 
-def eth_sign(hash: bytes, key: bytes):
-    v, r, s = (
-        keys.PrivateKey(key)
-        .sign_msg_hash(Web3.sha3(b"\x19Ethereum Signed Message:\n32" + hash))
-        .vrs
-    )
-    if v < 27:
-        v += 27
-    r = r.to_bytes(32, byteorder="big")
-    s = s.to_bytes(32, byteorder="big")
-    return v, r, s
+# keccak state after absorbing the prefix, copied for every message to sign or validate
+_eth_signed_message_prehash = keccak.new(ETH_SIGNED_MESSAGE_PREFIX)
+
+
+def eth_signed_message_hash(hash: bytes) -> bytes:
+    """Returns the hash of `hash` prefixed with the `eth_sign` message prefix"""
+    prehash = _eth_signed_message_prehash.copy()
+    prehash.update(hash)
+    return prehash.digest()
+
+
+class Signer:
+    """Signs message hashes with a private key that is only parsed once.
+
+    The public key and address of the key are derived on creation, so that signing
+    many hashes with the same key does not repeat the key setup.
+    """
+
+    def __init__(self, key: Union[bytes, keys.PrivateKey]):
+        if isinstance(key, keys.PrivateKey):
+            self.private_key = key
+        else:
+            self.private_key = keys.PrivateKey(key)
+        self.public_key = self.private_key.public_key
+        self.address = self.public_key.to_checksum_address()
+
+    def eth_sign(self, hash: bytes) -> Tuple[int, bytes, bytes]:
+        v, r, s = self.private_key.sign_msg_hash(eth_signed_message_hash(hash)).vrs
+        if v < 27:
+            v += 27
+        return v, r.to_bytes(32, byteorder="big"), s.to_bytes(32, byteorder="big")
+
+    def sign_msg_hash(self, hash: bytes) -> bytes:
+        return self.private_key.sign_msg_hash(hash).to_bytes()
+
+    def __repr__(self):
+        return f"<Signer {self.address}>"
+
+
+def eth_sign(hash: bytes, key: Union[bytes, Signer]):
+    if not isinstance(key, Signer):
+        key = Signer(key)
+    return key.eth_sign(hash)
 
 
 def eth_validate(
@@ -34,15 +68,15 @@ def eth_validate(
         v -= 27
     sig = keys.Signature(vrs=(v, r, s))
     try:
-        pubkey = sig.recover_public_key_from_msg_hash(
-            Web3.sha3(b"\x19Ethereum Signed Message:\n32" + msg_hash)
-        )
+        pubkey = sig.recover_public_key_from_msg_hash(eth_signed_message_hash(msg_hash))
         return pubkey.to_checksum_address() == address
     except BadSignature:
         return False
 
 
-def priv_to_pubkey(key: bytes):
+def priv_to_pubkey(key: Union[bytes, Signer]):
+    if isinstance(key, Signer):
+        return key.address
     return keys.PrivateKey(key).public_key.to_checksum_address()
 
 
@@ -50,5 +84,7 @@ def solidity_keccak(abi_types: List, values: List) -> bytes:
     return Web3.solidityKeccak(abi_types, values)
 
 
-def sign_msg_hash(hash: bytes, key: keys.PrivateKey) -> bytes:
+def sign_msg_hash(hash: bytes, key: Union[keys.PrivateKey, Signer]) -> bytes:
+    if isinstance(key, Signer):
+        return key.sign_msg_hash(hash)
     return key.sign_msg_hash(hash).to_bytes()
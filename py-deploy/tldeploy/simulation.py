@@ -0,0 +1,392 @@
+# This file provides a local view of currency network trustlines to simulate transfers off-chain
+# The simulation follows the checks and fee calculation of the currency network contracts,
+# so that transfers that would revert can be rejected before sending a transaction
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import attr
+
+from tldeploy.batch import call_functions
+from tldeploy.fees import (
+    calculate_fees,
+    calculate_fees_reverse,
+    calculate_imbalance_generated,
+)
+from tldeploy.interests import calculate_balance_with_interests
+
+MAX_UINT64 = 2 ** 64 - 1
+
+
+class TransferInfeasible(Exception):
+    """Raised when a simulated transfer would revert on chain"""
+
+    pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Trustline:
+    """A trustline as seen from one of its parties, like the return value of `getAccount`"""
+
+    creditline_given: int = 0
+    creditline_received: int = 0
+    interest_rate_given: int = 0
+    interest_rate_received: int = 0
+    is_frozen: bool = False
+    mtime: int = 0
+    balance: int = 0
+
+    def reverse(self) -> "Trustline":
+        """The same trustline as seen from the other party"""
+        return Trustline(
+            creditline_given=self.creditline_received,
+            creditline_received=self.creditline_given,
+            interest_rate_given=self.interest_rate_received,
+            interest_rate_received=self.interest_rate_given,
+            is_frozen=self.is_frozen,
+            mtime=self.mtime,
+            balance=-self.balance,
+        )
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class BalanceUpdate:
+    """The balance of `sender` towards `receiver` after a hop of a transfer, like the `BalanceUpdate` event"""
+
+    sender: str
+    receiver: str
+    balance: int
+    mtime: int
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class TransferResult:
+    value: int
+    fees: int
+    path: List[str]
+    balance_updates: List[BalanceUpdate]
+
+
+class CurrencyNetworkView:
+    """A cached view of the trustlines of a currency network.
+
+    Trustlines that were not loaded are considered closed, i.e. without creditlines and balance.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity_imbalance_fee_divisor: int = 0,
+        prevent_mediator_interests: bool = False,
+        is_network_frozen: bool = False,
+    ) -> None:
+        self.capacity_imbalance_fee_divisor = capacity_imbalance_fee_divisor
+        self.prevent_mediator_interests = prevent_mediator_interests
+        self.is_network_frozen = is_network_frozen
+        self._trustlines: Dict[Tuple[str, str], Trustline] = {}
+
+    @classmethod
+    def from_contract(
+        cls, currency_network_contract, user_pairs: Iterable[Tuple[str, str]] = ()
+    ) -> "CurrencyNetworkView":
+        """Creates a view with the settings of the contract and loads the trustlines of `user_pairs`"""
+        functions = currency_network_contract.functions
+        (
+            capacity_imbalance_fee_divisor,
+            prevent_mediator_interests,
+            is_network_frozen,
+        ) = call_functions(
+            currency_network_contract.web3,
+            [
+                functions.capacityImbalanceFeeDivisor(),
+                functions.preventMediatorInterests(),
+                functions.isNetworkFrozen(),
+            ],
+        )
+        view = cls(
+            capacity_imbalance_fee_divisor=capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=prevent_mediator_interests,
+            is_network_frozen=is_network_frozen,
+        )
+        view.load_trustlines(currency_network_contract, user_pairs)
+        return view
+
+    def load_trustlines(
+        self, currency_network_contract, user_pairs: Iterable[Tuple[str, str]]
+    ) -> None:
+        """Loads the trustlines between the given pairs of users with batched `getAccount` calls"""
+        user_pairs = list(user_pairs)
+        accounts = call_functions(
+            currency_network_contract.web3,
+            [
+                currency_network_contract.functions.getAccount(a, b)
+                for a, b in user_pairs
+            ],
+        )
+        for (a, b), account in zip(user_pairs, accounts):
+            self.set_trustline(a, b, Trustline(*account))
+
+    def load_trustlines_of_paths(
+        self, currency_network_contract, paths: Iterable[Sequence[str]]
+    ) -> None:
+        """Loads all trustlines used by the given transfer paths"""
+        self.load_trustlines(
+            currency_network_contract,
+            {
+                (sender, receiver)
+                for path in paths
+                for sender, receiver in zip(path, path[1:])
+            },
+        )
+
+    def get_trustline(self, a: str, b: str) -> Trustline:
+        """The trustline between `a` and `b` as seen from `a`"""
+        if a < b:
+            return self._trustlines.get((a, b), Trustline())
+        else:
+            return self._trustlines.get((b, a), Trustline()).reverse()
+
+    def set_trustline(self, a: str, b: str, trustline: Trustline) -> None:
+        """Sets the trustline between `a` and `b` as seen from `a`"""
+        if a < b:
+            self._trustlines[(a, b)] = trustline
+        else:
+            self._trustlines[(b, a)] = trustline.reverse()
+
+    def apply(self, transfer: TransferResult) -> None:
+        """Applies the balance updates of a simulated transfer to the view"""
+        for update in transfer.balance_updates:
+            trustline = self.get_trustline(update.sender, update.receiver)
+            self.set_trustline(
+                update.sender,
+                update.receiver,
+                attr.evolve(trustline, balance=update.balance, mtime=update.mtime),
+            )
+
+    def copy(self) -> "CurrencyNetworkView":
+        view = CurrencyNetworkView(
+            capacity_imbalance_fee_divisor=self.capacity_imbalance_fee_divisor,
+            prevent_mediator_interests=self.prevent_mediator_interests,
+            is_network_frozen=self.is_network_frozen,
+        )
+        view._trustlines = dict(self._trustlines)
+        return view
+
+
+def _load_trustline_for_transfer(
+    view: CurrencyNetworkView,
+    updated_trustlines: Dict[Tuple[str, str], Trustline],
+    sender: str,
+    receiver: str,
+    timestamp: int,
+) -> Trustline:
+    trustline = _get_updated_trustline(view, updated_trustlines, sender, receiver)
+    if trustline.is_frozen or view.is_network_frozen:
+        raise TransferInfeasible(
+            "The path given is incorrect: one trustline in the path is frozen."
+        )
+    try:
+        balance = calculate_balance_with_interests(
+            trustline.balance,
+            trustline.mtime,
+            timestamp,
+            trustline.interest_rate_given,
+            trustline.interest_rate_received,
+        )
+    except (ValueError, OverflowError) as e:
+        raise TransferInfeasible(f"Applying interests fails: {e}") from e
+    return attr.evolve(trustline, balance=balance, mtime=timestamp)
+
+
+def _apply_direct_transfer(trustline: Trustline, value: int) -> Trustline:
+    new_balance = trustline.balance - value
+    if -new_balance > trustline.creditline_received:
+        raise TransferInfeasible(
+            "The transferred value exceeds the capacity of the credit line."
+        )
+    return attr.evolve(trustline, balance=new_balance)
+
+
+def _interest_happiness(trustline: Trustline, balance_before: int) -> int:
+    balance = trustline.balance
+    transferred_value = balance_before - balance
+    if balance_before <= 0:
+        return -transferred_value * trustline.interest_rate_received
+    elif balance >= 0:
+        return -transferred_value * trustline.interest_rate_given
+    else:
+        return (
+            -balance_before * trustline.interest_rate_given
+            + balance * trustline.interest_rate_received
+        )
+
+
+def _check_transfer_arguments(value: int, max_fee: int, path: Sequence[str]) -> None:
+    if len(path) < 2:
+        raise TransferInfeasible("Path too short.")
+    if not 0 <= value <= MAX_UINT64:
+        raise TransferInfeasible("The value does not fit into uint64.")
+    if not 0 <= max_fee <= MAX_UINT64:
+        raise TransferInfeasible("The max fee does not fit into uint64.")
+
+
+def simulate_transfer_sender_pays(
+    view: CurrencyNetworkView,
+    value: int,
+    max_fee: int,
+    path: Sequence[str],
+    *,
+    timestamp: int,
+) -> TransferResult:
+    """Simulates `transfer` or `transferFrom`, where the receiver gets `value` and the sender pays the fees.
+
+    The view is not modified, use `CurrencyNetworkView.apply` to apply the result.
+    Raises `TransferInfeasible` if the transfer would revert.
+    """
+    _check_transfer_arguments(value, max_fee, path)
+
+    forwarded_value = value
+    fees = 0
+    receiver_unhappiness = 0
+    reducing_debt_of_next_hop_only = True
+    # a path may use a trustline more than once, later hops need to see the updated balance
+    updated_trustlines: Dict[Tuple[str, str], Trustline] = {}
+    balance_updates = []
+
+    for receiver_index in range(len(path) - 1, 0, -1):
+        receiver = path[receiver_index]
+        sender = path[receiver_index - 1]
+
+        trustline = _load_trustline_for_transfer(
+            view, updated_trustlines, sender, receiver, timestamp
+        )
+
+        if receiver_index == len(path) - 1:
+            fee = 0
+        else:
+            try:
+                fee = calculate_fees_reverse(
+                    calculate_imbalance_generated(forwarded_value, trustline.balance),
+                    view.capacity_imbalance_fee_divisor,
+                )
+            except ZeroDivisionError as e:
+                raise TransferInfeasible(
+                    "Fees cannot be paid by the sender with a fee divisor of 1."
+                ) from e
+
+        forwarded_value += fee
+        fees += fee
+        if forwarded_value > MAX_UINT64:
+            raise TransferInfeasible("The forwarded value overflows uint64.")
+        if fees > max_fee:
+            raise TransferInfeasible("The fees exceed the max fee parameter.")
+
+        balance_before = trustline.balance
+        trustline = _apply_direct_transfer(trustline, forwarded_value)
+
+        if view.prevent_mediator_interests:
+            receiver_happiness = receiver_unhappiness
+            receiver_unhappiness = _interest_happiness(trustline, balance_before)
+            if not (
+                receiver_unhappiness <= receiver_happiness
+                or reducing_debt_of_next_hop_only
+            ):
+                raise TransferInfeasible(
+                    "The transfer was prevented by the prevent mediator interests strategy"
+                )
+            reducing_debt_of_next_hop_only = trustline.balance >= 0
+
+        _store(updated_trustlines, sender, receiver, trustline)
+        balance_updates.append(
+            BalanceUpdate(sender, receiver, trustline.balance, trustline.mtime)
+        )
+
+    return TransferResult(
+        value=value, fees=fees, path=list(path), balance_updates=balance_updates
+    )
+
+
+def simulate_transfer_receiver_pays(
+    view: CurrencyNetworkView,
+    value: int,
+    max_fee: int,
+    path: Sequence[str],
+    *,
+    timestamp: int,
+) -> TransferResult:
+    """Simulates `transferReceiverPays`, where the sender sends `value` and the receiver pays the fees.
+
+    The view is not modified, use `CurrencyNetworkView.apply` to apply the result.
+    Raises `TransferInfeasible` if the transfer would revert.
+    """
+    _check_transfer_arguments(value, max_fee, path)
+
+    forwarded_value = value
+    fees = 0
+    sender_happiness = -(2 ** 255)
+    updated_trustlines: Dict[Tuple[str, str], Trustline] = {}
+    balance_updates = []
+
+    for sender_index in range(len(path) - 1):
+        receiver = path[sender_index + 1]
+        sender = path[sender_index]
+
+        trustline = _load_trustline_for_transfer(
+            view, updated_trustlines, sender, receiver, timestamp
+        )
+
+        balance_before = trustline.balance
+        trustline = _apply_direct_transfer(trustline, forwarded_value)
+
+        if view.prevent_mediator_interests:
+            sender_unhappiness = sender_happiness
+            sender_happiness = _interest_happiness(trustline, balance_before)
+            reducing_debt_only = trustline.balance >= 0
+            if not (sender_happiness >= sender_unhappiness or reducing_debt_only):
+                raise TransferInfeasible(
+                    "The transfer was prevented by the prevent mediator interests strategy"
+                )
+
+        _store(updated_trustlines, sender, receiver, trustline)
+        balance_updates.append(
+            BalanceUpdate(sender, receiver, trustline.balance, trustline.mtime)
+        )
+
+        if sender_index == len(path) - 2:
+            break
+
+        fee = calculate_fees(
+            calculate_imbalance_generated(forwarded_value, balance_before),
+            view.capacity_imbalance_fee_divisor,
+        )
+        if fee > forwarded_value:
+            raise TransferInfeasible("The fees exceed the forwarded value.")
+        forwarded_value -= fee
+        fees += fee
+        if fees > max_fee:
+            raise TransferInfeasible("The fees exceed the max fee parameter.")
+
+    return TransferResult(
+        value=value, fees=fees, path=list(path), balance_updates=balance_updates
+    )
+
+
+def _get_updated_trustline(
+    view: CurrencyNetworkView,
+    updated_trustlines: Dict[Tuple[str, str], Trustline],
+    a: str,
+    b: str,
+) -> Trustline:
+    if (a, b) in updated_trustlines:
+        return updated_trustlines[(a, b)]
+    if (b, a) in updated_trustlines:
+        return updated_trustlines[(b, a)].reverse()
+    return view.get_trustline(a, b)
+
+
+def _store(
+    updated_trustlines: Dict[Tuple[str, str], Trustline],
+    sender: str,
+    receiver: str,
+    trustline: Trustline,
+) -> None:
+    updated_trustlines.pop((receiver, sender), None)
+    updated_trustlines[(sender, receiver)] = trustline
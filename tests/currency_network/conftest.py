@@ -3,6 +3,9 @@ from deploy_tools import deploy_compiled_contract
 import pytest
 
 from tldeploy.core import deploy_network, NetworkSettings
+from tldeploy.event_store import EventStore
+from tldeploy.network_model import CurrencyNetworkModel
+from tldeploy.simulation import CurrencyNetworkView, Trustline
 
 from tests.conftest import EXPIRATION_TIME
 
@@ -39,6 +42,51 @@ def deploy_ownable_network(web3, network_setting, **kwargs):
     )
 
 
+def random_model(rng, number_of_users, trustlines_per_user):
+    """A synthetic network where every user has trustlines to up to
+    `trustlines_per_user` of the users added earlier"""
+    users = [f"0x{index:040x}" for index in range(number_of_users)]
+    model = CurrencyNetworkModel(capacity_imbalance_fee_divisor=1000)
+    for user in users:
+        model.add_user(user)
+    for index in range(1, number_of_users):
+        for other_index in rng.sample(range(index), min(index, trustlines_per_user)):
+            model.set_trustline(
+                users[index],
+                users[other_index],
+                Trustline(
+                    creditline_given=rng.randint(0, 10_000),
+                    creditline_received=rng.randint(0, 10_000),
+                    balance=rng.randint(-1000, 1000),
+                ),
+            )
+    return model
+
+
+def set_trustlines(view, accounts):
+    for (A, B, clAB, clBA) in trustlines:
+        view.set_trustline(
+            accounts[A],
+            accounts[B],
+            Trustline(creditline_given=clAB, creditline_received=clBA),
+        )
+    return view
+
+
+@pytest.fixture()
+def view(accounts):
+    return set_trustlines(
+        CurrencyNetworkView(capacity_imbalance_fee_divisor=100), accounts
+    )
+
+
+@pytest.fixture()
+def model(accounts):
+    return set_trustlines(
+        CurrencyNetworkModel(capacity_imbalance_fee_divisor=100), accounts
+    )
+
+
 @pytest.fixture(scope="session")
 def currency_network_contract(web3):
     return deploy_test_network(web3, NETWORK_SETTING)
@@ -49,6 +97,32 @@ def currency_network_adapter(currency_network_contract, make_currency_network_ad
     return make_currency_network_adapter(currency_network_contract)
 
 
+@pytest.fixture()
+def fresh_currency_network_adapter(web3, make_currency_network_adapter):
+    """The adapter of a network deployed for a single test, with no earlier events"""
+    return make_currency_network_adapter(deploy_test_network(web3, NETWORK_SETTING))
+
+
+@pytest.fixture()
+def make_event_store():
+    """A function creating event stores, which are closed after the test"""
+    event_stores = []
+
+    def make(*args, **kwargs):
+        event_store = EventStore(*args, **kwargs)
+        event_stores.append(event_store)
+        return event_store
+
+    yield make
+    for event_store in event_stores:
+        event_store.close()
+
+
+@pytest.fixture()
+def event_store(make_event_store):
+    return make_event_store()
+
+
 @pytest.fixture(scope="session")
 def currency_network_v2_contract(web3):
     return deploy_network(
@@ -0,0 +1,145 @@
+#! pytest
+
+import pytest
+from tldeploy.balance_history import get_trustline_history
+from tldeploy.core import NetworkSettings
+
+from tests.currency_network.conftest import deploy_test_network
+
+trustlines = [
+    (0, 1, 100, 150),
+    (1, 2, 200, 250),
+    (2, 3, 300, 350),
+    (3, 4, 400, 450),
+]  # (A, B, clAB, clBA)
+
+NETWORK_SETTING = NetworkSettings(
+    fee_divisor=100, default_interest_rate=1000, custom_interests=False
+)
+
+SECONDS_PER_YEAR = 3600 * 24 * 365
+
+
+@pytest.fixture(scope="session")
+def currency_network_contract_with_trustlines(web3, accounts):
+    contract = deploy_test_network(web3, NETWORK_SETTING)
+    for (A, B, clAB, clBA) in trustlines:
+        contract.functions.setAccountDefaultInterests(
+            accounts[A], accounts[B], clAB, clBA, False, 0, 0
+        ).transact()
+    return contract
+
+
+@pytest.fixture()
+def currency_network_with_pending_interests(
+    web3, currency_network_contract_with_trustlines, accounts, chain
+):
+    for (A, B, clAB, clBA) in trustlines:
+        currency_network_contract_with_trustlines.functions.transfer(
+            10, 0, [accounts[A], accounts[B]], b""
+        ).transact({"from": accounts[A]})
+
+    chain.time_travel(web3.eth.getBlock("latest").timestamp + SECONDS_PER_YEAR)
+    chain.mine_block()
+    return currency_network_contract_with_trustlines
+
+
+@pytest.mark.parametrize(
+    "path, value, fee_payer, value_sent, value_received",
+    [
+        ([0, 1, 2, 3], 1, "sender", 3, 1),
+        ([1, 2, 3, 4], 99, "sender", 102, 99),
+        ([4, 3, 2, 1], 180, "sender", 184, 180),
+        ([1, 2, 3, 4], 102, "receiver", 102, 99),
+        ([4, 3, 2, 1], 184, "receiver", 184, 180),
+    ],
+)
+def test_transfer_history(
+    currency_network_with_pending_interests,
+    accounts,
+    path,
+    value,
+    fee_payer,
+    value_sent,
+    value_received,
+):
+    network = currency_network_with_pending_interests
+    account_path = [accounts[i] for i in path]
+    if fee_payer == "sender":
+        network.functions.transfer(value, 1000, account_path, b"").transact(
+            {"from": account_path[0]}
+        )
+    else:
+        network.functions.transferReceiverPays(value, 1000, account_path, b"").transact(
+            {"from": account_path[0]}
+        )
+
+    transfers = get_trustline_history(network).transfers
+
+    assert len(transfers) == len(trustlines) + 1
+    assert transfers.path[-1] == account_path
+    assert transfers.value_sent[-1] == value_sent
+    assert transfers.value_received[-1] == value_received
+    assert transfers.fees[-1] == value_sent - value_received
+    assert transfers.fees[: len(trustlines)] == [0] * len(trustlines)
+
+
+@pytest.mark.parametrize(
+    "years, interests", [([0, 1], [0, 2]), ([1, 4, 2, 3], [1, 9, 8, 19])]
+)
+def test_interests_history(
+    currency_network_contract_with_trustlines, web3, chain, accounts, years, interests
+):
+    """Sending 10 with a time difference of x years where the interest rate is 10%"""
+    network = currency_network_contract_with_trustlines
+    network.functions.transfer(10, 1000, [accounts[1], accounts[2]], b"").transact(
+        {"from": accounts[1]}
+    )
+    path = [accounts[0], accounts[1], accounts[2], accounts[3]]
+    for year in years:
+        timestamp = web3.eth.getBlock("latest").timestamp
+        chain.time_travel(timestamp + SECONDS_PER_YEAR * year + 1)
+        chain.mine_block()
+        network.functions.transfer(9, 1000, path, b"").transact({"from": accounts[0]})
+
+    balances = get_trustline_history(network).balances
+
+    updates_of_trustline = [
+        index
+        for index in range(len(balances))
+        if {balances.user[index], balances.counterparty[index]}
+        == {accounts[1], accounts[2]}
+    ]
+    # the balance updates are seen from the sender, who owes the interests
+    assert [balances.interests[index] for index in updates_of_trustline] == [0] + [
+        -interest for interest in interests
+    ]
+    assert [balances.balance[index] for index in updates_of_trustline] == [
+        -((i + 1) * 10 + sum(interests[:i])) for i in range(len(years) + 1)
+    ]
+
+
+def test_history_with_event_store(
+    web3, currency_network_with_pending_interests, event_store, accounts
+):
+    network = currency_network_with_pending_interests
+    network.functions.transfer(
+        99, 1000, [accounts[i] for i in [1, 2, 3, 4]], b""
+    ).transact({"from": accounts[1]})
+
+    assert get_trustline_history(
+        network, event_store=event_store
+    ) == get_trustline_history(network)
+
+
+def test_final_balances(currency_network_with_pending_interests, accounts):
+    network = currency_network_with_pending_interests
+
+    final_balances = get_trustline_history(network).final_balances
+
+    for (A, B, _, _) in trustlines:
+        a, b = accounts[A], accounts[B]
+        if a < b:
+            assert final_balances[a, b] == network.functions.balance(a, b).call()
+        else:
+            assert final_balances[b, a] == network.functions.balance(b, a).call()
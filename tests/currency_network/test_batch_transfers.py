@@ -0,0 +1,150 @@
+#! pytest
+import random
+import time
+
+import attr
+import pytest
+
+from tldeploy.batch_transfers import (
+    BatchTransfer,
+    NetworkSnapshot,
+    simulate_transfer_batch,
+)
+from tldeploy.network_model import CurrencyNetworkModel
+from tldeploy.simulation import Trustline
+from tests.conftest import EXTRA_DATA, NETWORK_SETTINGS
+from tests.currency_network.conftest import (
+    deploy_test_network,
+    random_model,
+    trustlines,
+)
+
+BENCHMARK_USERS = 10_000
+BENCHMARK_TRUSTLINES_PER_USER = 3
+BENCHMARK_TRANSFERS = 5_000
+
+
+def test_snapshot_reads_through_to_view(view, accounts):
+    snapshot = NetworkSnapshot(view)
+    snapshot.set_trustline(accounts[1], accounts[0], Trustline(balance=10))
+
+    assert snapshot.get_trustline(accounts[0], accounts[1]) == Trustline(balance=-10)
+    assert snapshot.get_trustline(accounts[1], accounts[2]) == view.get_trustline(
+        accounts[1], accounts[2]
+    )
+    assert view.get_trustline(accounts[0], accounts[1]).balance == 0
+
+
+def test_batch_transfers_depend_on_previous_ones(view, accounts):
+    transfers = [
+        BatchTransfer(100, [accounts[1], accounts[0]]),
+        # only feasible because the first transfer gave the capacity
+        BatchTransfer(200, [accounts[0], accounts[1]]),
+        BatchTransfer(100, [accounts[0], accounts[1]]),
+    ]
+
+    result = simulate_transfer_batch(view, transfers, timestamp=0)
+
+    assert [outcome.succeeded for outcome in result.outcomes] == [True, True, False]
+    assert result.failed == [result.outcomes[2]]
+    assert result.outcomes[2].error
+    assert result.snapshot.get_trustline(accounts[0], accounts[1]).balance == 100 - 200
+    assert view.get_trustline(accounts[0], accounts[1]).balance == 0
+
+
+def test_batch_transfer_fees_and_failures(view, accounts):
+    path = [accounts[0], accounts[1], accounts[2], accounts[3]]
+    transfers = [
+        BatchTransfer(100, path),
+        # the first transfer used the capacity between accounts[0] and accounts[1]
+        BatchTransfer(100, path, receiver_pays=True),
+        BatchTransfer(10, path, max_fee=0),
+        BatchTransfer(10, path, receiver_pays=True),
+    ]
+
+    result = simulate_transfer_batch(view, transfers, timestamp=0)
+
+    assert [outcome.fees for outcome in result.outcomes] == [4, 0, 0, 2]
+    assert result.total_fees == 6
+    assert [outcome.error is None for outcome in result.outcomes] == [
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_batch_final_balances(view, accounts):
+    transfers = [
+        BatchTransfer(10, [accounts[0], accounts[1], accounts[2]]),
+        BatchTransfer(5, [accounts[2], accounts[1]]),
+    ]
+
+    result = simulate_transfer_batch(view, transfers, timestamp=0)
+
+    final_balances = {
+        frozenset(user_pair): abs(balance)
+        for user_pair, balance in result.final_balances().items()
+    }
+    assert final_balances == {
+        frozenset([accounts[0], accounts[1]]): 11,
+        frozenset([accounts[1], accounts[2]]): 5,
+    }
+
+
+def test_batch_simulation_matches_contract(
+    web3, accounts, make_currency_network_adapter
+):
+    contract = deploy_test_network(web3, attr.evolve(NETWORK_SETTINGS, fee_divisor=100))
+    adapter = make_currency_network_adapter(contract)
+    for (A, B, clAB, clBA) in trustlines:
+        adapter.set_account(
+            accounts[A], accounts[B], creditline_given=clAB, creditline_received=clBA
+        )
+    transfers = [
+        BatchTransfer(120, [accounts[0], accounts[1]]),
+        BatchTransfer(100, [accounts[0], accounts[4], accounts[3]]),
+        BatchTransfer(50, [accounts[0], accounts[1], accounts[2]]),
+        BatchTransfer(300, [accounts[3], accounts[4], accounts[0]]),
+        BatchTransfer(60, [accounts[1], accounts[0]], max_fee=0),
+    ]
+    model = CurrencyNetworkModel.from_contract(contract)
+
+    result = simulate_transfer_batch(
+        model, transfers, timestamp=web3.eth.getBlock("latest").timestamp
+    )
+
+    assert [outcome.succeeded for outcome in result.outcomes] == [
+        True,
+        True,
+        False,
+        True,
+        True,
+    ]
+    for outcome in result.outcomes:
+        if outcome.succeeded:
+            transfer = outcome.transfer
+            contract.functions.transfer(
+                transfer.value, outcome.fees, transfer.path, EXTRA_DATA
+            ).transact({"from": transfer.path[0]})
+    for (a, b), balance in result.final_balances().items():
+        assert contract.functions.balance(a, b).call() == balance
+
+
+@pytest.mark.benchmark
+def test_benchmark_simulate_transfer_batch():
+    rng = random.Random(0)
+    model = random_model(rng, BENCHMARK_USERS, BENCHMARK_TRUSTLINES_PER_USER)
+    users = model.users
+    transfers = []
+    for _ in range(BENCHMARK_TRANSFERS):
+        path = [rng.choice(users)]
+        for _ in range(rng.randint(1, 4)):
+            path.append(rng.choice(model.get_friends(path[-1])))
+        transfers.append(BatchTransfer(rng.randint(1, 3_000), path))
+
+    start = time.perf_counter()
+    simulate_transfer_batch(model, transfers, timestamp=0)
+    duration = time.perf_counter() - start
+
+    print(f"\nBatch simulation: {BENCHMARK_TRANSFERS / duration:.0f} transfers/s")
@@ -1,7 +1,11 @@
 #! pytest
+import attr
 import pytest
 
-from tests.currency_network.conftest import NETWORK_SETTING
+from tldeploy.core import NetworkSettings
+from tldeploy.registry import CurrencyNetworkMetadata, CurrencyNetworkRegistryClient
+
+from tests.currency_network.conftest import NETWORK_SETTING, deploy_test_network
 
 
 @pytest.fixture
@@ -188,3 +192,88 @@ def test_add_event(initialized_currency_network_registry_contract, default_accou
     assert events[0]["args"]["_name"] == NETWORK_SETTING.name
     assert events[0]["args"]["_symbol"] == NETWORK_SETTING.symbol
     assert events[0]["args"]["_decimals"] == NETWORK_SETTING.decimals
+
+
+@pytest.fixture
+def registered_currency_networks(web3, currency_network_registry_contract):
+    networks = [
+        deploy_test_network(
+            web3, attr.evolve(NETWORK_SETTING, name=f"Network {i}", decimals=i)
+        )
+        for i in range(3)
+    ]
+    for network in networks:
+        currency_network_registry_contract.functions.addCurrencyNetwork(
+            network.address
+        ).transact()
+    return networks
+
+
+def test_registry_client_sync(
+    web3,
+    currency_network_registry_contract,
+    registered_currency_networks,
+    default_account,
+):
+    client = CurrencyNetworkRegistryClient(
+        web3, currency_network_registry_contract.address
+    )
+
+    new_addresses = client.sync()
+
+    assert new_addresses == [
+        network.address for network in registered_currency_networks
+    ]
+    assert client.network_addresses == new_addresses
+    assert client.get_metadata(
+        registered_currency_networks[1].address
+    ) == CurrencyNetworkMetadata(
+        address=registered_currency_networks[1].address,
+        first_registration_by=default_account,
+        name="Network 1",
+        symbol=NETWORK_SETTING.symbol,
+        decimals=1,
+    )
+    assert [metadata.name for metadata in client.metadata()] == [
+        "Network 0",
+        "Network 1",
+        "Network 2",
+    ]
+
+
+def test_registry_client_sync_incrementally(
+    web3, currency_network_registry_contract, registered_currency_networks
+):
+    client = CurrencyNetworkRegistryClient(
+        web3, currency_network_registry_contract.address
+    )
+    client.sync()
+
+    assert client.sync() == []
+
+    new_network = deploy_test_network(web3, NetworkSettings(name="New", symbol="N"))
+    currency_network_registry_contract.functions.addCurrencyNetwork(
+        new_network.address
+    ).transact()
+
+    assert client.sync() == [new_network.address]
+    assert client.network_addresses[-1] == new_network.address
+    assert client.get_metadata(new_network.address).name == "New"
+
+
+def test_registry_client_network_settings(
+    web3, currency_network_registry_contract, registered_currency_networks
+):
+    client = CurrencyNetworkRegistryClient(
+        web3, currency_network_registry_contract.address, batch_size=2
+    )
+    client.sync()
+
+    network_settings = client.get_network_settings()
+
+    assert [settings.name for settings in network_settings] == [
+        "Network 0",
+        "Network 1",
+        "Network 2",
+    ]
+    assert [settings.decimals for settings in network_settings] == [0, 1, 2]
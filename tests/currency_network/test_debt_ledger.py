@@ -0,0 +1,142 @@
+#! pytest
+import pytest
+
+from tldeploy.debt_ledger import DebtCycle, DebtLedger, find_netting_cycles
+
+
+@pytest.fixture()
+def event_store(make_event_store):
+    return make_event_store(confirmation_depth=0)
+
+
+@pytest.fixture()
+def debt_ledger():
+    debt_ledger = DebtLedger()
+    yield debt_ledger
+    debt_ledger.close()
+
+
+def test_ledger_matches_contract(
+    web3, fresh_currency_network_adapter, event_store, debt_ledger, accounts
+):
+    adapter = fresh_currency_network_adapter
+    address = adapter.contract.address
+    adapter.increase_debt(accounts[0], accounts[1], 100)
+    adapter.increase_debt(accounts[1], accounts[0], 30)
+    adapter.increase_debt(accounts[2], accounts[1], 50)
+    event_store.sync(web3, [address])
+
+    assert debt_ledger.update(event_store, address) == 3
+
+    for debtor in accounts[:3]:
+        for creditor in accounts[:3]:
+            if debtor == creditor:
+                continue
+            assert (
+                debt_ledger.get_debt(address, debtor, creditor)
+                == adapter.contract.functions.getDebt(debtor, creditor).call()
+            )
+    assert debt_ledger.get_debts_of_creditor(address, accounts[1]) == {
+        accounts[0]: 70,
+        accounts[2]: 50,
+    }
+    assert debt_ledger.get_debts_of_debtor(address, accounts[1]) == {}
+
+
+def test_update_incrementally(
+    web3, fresh_currency_network_adapter, event_store, debt_ledger, accounts
+):
+    adapter = fresh_currency_network_adapter
+    address = adapter.contract.address
+    adapter.increase_debt(accounts[0], accounts[1], 100)
+    event_store.sync(web3, [address])
+    debt_ledger.update(event_store, address)
+    adapter.increase_debt(accounts[1], accounts[0], 100)
+    adapter.increase_debt(accounts[1], accounts[2], 10)
+    event_store.sync(web3, [address])
+
+    assert debt_ledger.update(event_store, address) == 2
+    assert debt_ledger.update(event_store, address) == 0
+    assert debt_ledger.get_all_debts(address) == {(accounts[1], accounts[2]): 10}
+    assert debt_ledger.last_applied_block(address) == web3.eth.blockNumber
+
+
+def test_update_confirmed_only(
+    web3, chain, fresh_currency_network_adapter, make_event_store, debt_ledger, accounts
+):
+    adapter = fresh_currency_network_adapter
+    address = adapter.contract.address
+    event_store = make_event_store(confirmation_depth=2)
+    adapter.increase_debt(accounts[0], accounts[1], 100)
+    event_store.sync(web3, [address])
+
+    assert debt_ledger.update(event_store, address) == 0
+
+    chain.mine_blocks(2)
+    event_store.sync(web3, [address])
+
+    assert debt_ledger.update(event_store, address) == 1
+    assert debt_ledger.get_debt(address, accounts[0], accounts[1]) == 100
+
+
+def test_ledger_keeps_debts_in_file(
+    web3, fresh_currency_network_adapter, event_store, accounts, tmp_path
+):
+    adapter = fresh_currency_network_adapter
+    address = adapter.contract.address
+    database_path = str(tmp_path / "debts.db")
+    adapter.increase_debt(accounts[0], accounts[1], 100)
+    event_store.sync(web3, [address])
+    debt_ledger = DebtLedger(database_path)
+    debt_ledger.update(event_store, address)
+    debt_ledger.close()
+
+    debt_ledger = DebtLedger(database_path)
+
+    assert debt_ledger.update(event_store, address) == 0
+    assert debt_ledger.get_debt(address, accounts[0], accounts[1]) == 100
+
+
+def test_netting_cycles(
+    web3, fresh_currency_network_adapter, event_store, debt_ledger, accounts
+):
+    adapter = fresh_currency_network_adapter
+    address = adapter.contract.address
+    adapter.increase_debt(accounts[0], accounts[1], 100)
+    adapter.increase_debt(accounts[1], accounts[2], 30)
+    adapter.increase_debt(accounts[2], accounts[0], 50)
+    event_store.sync(web3, [address])
+    debt_ledger.update(event_store, address)
+
+    cycles = debt_ledger.netting_cycles(address)
+
+    assert len(cycles) == 1
+    assert cycles[0].value == 30
+    assert set(cycles[0].path) == set(accounts[:3])
+
+
+@pytest.mark.parametrize(
+    "debts, cycles",
+    [
+        ({("a", "b"): 10, ("b", "c"): 5}, []),
+        (
+            {("a", "b"): 10, ("b", "a"): 4},
+            [DebtCycle(path=["a", "b", "a"], value=4)],
+        ),
+        (
+            {
+                ("a", "b"): 10,
+                ("b", "c"): 7,
+                ("c", "a"): 5,
+                ("b", "d"): 3,
+                ("d", "a"): 6,
+            },
+            [
+                DebtCycle(path=["a", "b", "c", "a"], value=5),
+                DebtCycle(path=["a", "b", "d", "a"], value=3),
+            ],
+        ),
+    ],
+)
+def test_find_netting_cycles(debts, cycles):
+    assert find_netting_cycles(debts) == cycles
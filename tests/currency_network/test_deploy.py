@@ -1,4 +1,8 @@
 #! pytest
+import json
+import threading
+
+import attr
 import pytest
 from tldeploy.core import (
     deploy_networks,
@@ -7,10 +11,15 @@ from tldeploy.core import (
     deploy_currency_network_proxy,
     verify_owner_not_deployer,
     deploy_and_migrate_network,
+    deploy_and_migrate_networks_from_file,
     NetworkSettings,
+    NetworkSettingsReader,
+    get_network_settings,
 )
+from tldeploy.pipeline import DeploymentPipeline, contract_address
 
 from tests.conftest import EXPIRATION_TIME, NETWORK_SETTINGS
+from tests.currency_network.conftest import deploy_test_network
 
 
 def test_deploy_networks(web3):
@@ -44,6 +53,53 @@ def test_deploy_networks(web3):
     assert unw_eth.functions.decimals().call() == 18
 
 
+def test_deploy_networks_pipelined(web3, accounts):
+    nonce = web3.eth.getTransactionCount(accounts[0])
+    transaction_options = {"gas": 7_000_000, "nonce": nonce}
+    networks, exchange, unw_eth = deploy_networks(
+        web3,
+        [NETWORK_SETTINGS, NETWORK_SETTINGS],
+        transaction_options=transaction_options,
+        pipelined=True,
+    )
+
+    # exchange, unw eth, its authorization, and a deployment and init per network
+    assert transaction_options["nonce"] == nonce + 7
+    assert exchange.address == contract_address(accounts[0], nonce)
+    assert networks[1].functions.name().call() == NETWORK_SETTINGS.name
+    assert networks[1].functions.globalAuthorized(exchange.address).call()
+    assert unw_eth.functions.decimals().call() == 18
+
+
+def test_pipeline_needs_gas(web3):
+    with pytest.raises(ValueError):
+        DeploymentPipeline(web3, transaction_options={})
+
+
+def test_read_settings_of_many_networks(web3):
+    settings = [
+        attr.evolve(NETWORK_SETTINGS, name=f"Network {i}", fee_divisor=100 * i)
+        for i in range(3)
+    ]
+    networks = [deploy_network(web3, setting) for setting in settings]
+
+    assert NetworkSettingsReader(web3).get_network_settings(networks) == settings
+    assert get_network_settings(networks[1]) == settings[1]
+
+
+def test_settings_of_immutable_networks_are_cached(web3):
+    network = deploy_network(web3, NETWORK_SETTINGS)
+    reader = NetworkSettingsReader(web3, immutable=True)
+
+    settings = reader.get_network_settings([network])[0]
+    settings.name = "Changed"
+
+    assert reader.get_network_settings([network, network]) == [
+        NETWORK_SETTINGS,
+        NETWORK_SETTINGS,
+    ]
+
+
 def test_deploy_network(web3):
     network = deploy_network(web3, NETWORK_SETTINGS)
 
@@ -163,3 +219,81 @@ def test_deploy_and_migrate_network(
         old_network=currency_network_contract_with_trustlines,
         private_key=not_owner_key,
     )
+
+
+@pytest.fixture()
+def serialized_requests(web3):
+    """Make web3 handle one request at a time, like a node does.
+    The eth tester backend is not safe to use from several threads at once."""
+    lock = threading.RLock()
+
+    def serialize_requests(make_request, web3):
+        def middleware(method, params):
+            with lock:
+                return make_request(method, params)
+
+        return middleware
+
+    web3.middleware_onion.add(serialize_requests, "serialize_requests")
+    yield
+    web3.middleware_onion.remove("serialize_requests")
+
+
+@pytest.mark.usefixtures("serialized_requests")
+def test_deploy_and_migrate_networks_concurrently(
+    web3,
+    accounts,
+    beacon_with_currency_network,
+    make_currency_network_adapter,
+    owner,
+    not_owner_key,
+    chain,
+    tmp_path,
+):
+    expiration_time = web3.eth.getBlock("latest").timestamp + 1000
+    old_networks = [
+        deploy_test_network(
+            web3,
+            attr.evolve(
+                NETWORK_SETTINGS, name=f"Network {i}", expiration_time=expiration_time
+            ),
+        )
+        for i in range(3)
+    ]
+    make_currency_network_adapter(old_networks[1]).set_account(
+        accounts[0], accounts[1], creditline_given=100, creditline_received=150
+    )
+    chain.time_travel(expiration_time + 1)
+    chain.mine_block()
+
+    addresses_file_path = str(tmp_path / "addresses.csv")
+    with open(addresses_file_path, "w") as file:
+        file.writelines(f"{network.address}\n" for network in old_networks)
+    output_file_path = str(tmp_path / "output.json")
+
+    def deploy_and_migrate():
+        deploy_and_migrate_networks_from_file(
+            web3=web3,
+            beacon_address=beacon_with_currency_network.address,
+            owner_address=owner,
+            addresses_file_path=addresses_file_path,
+            private_key=not_owner_key,
+            output_file_path=output_file_path,
+            concurrency=2,
+        )
+        with open(output_file_path) as file:
+            return json.load(file)
+
+    mapping = deploy_and_migrate()
+
+    assert set(mapping) == {network.address for network in old_networks}
+    new_network = web3.eth.contract(
+        address=mapping[old_networks[1].address], abi=old_networks[1].abi
+    )
+    assert new_network.functions.name().call() == "Network 1"
+    assert new_network.functions.creditline(accounts[0], accounts[1]).call() == 100
+
+    # a restart skips the networks that are already migrated
+    nonce = web3.eth.getTransactionCount(accounts[1])
+    assert deploy_and_migrate() == mapping
+    assert web3.eth.getTransactionCount(accounts[1]) == nonce
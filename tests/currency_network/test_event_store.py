@@ -0,0 +1,243 @@
+#! pytest
+import pytest
+
+from tldeploy.event_store import ReorgTooDeep, get_contract_logs
+from tldeploy.events import LogDecoder, get_raw_logs
+from tldeploy.migration import (
+    get_all_debts_of_currency_network,
+    get_last_frozen_status_of_account,
+    get_pending_trustline_update_requests,
+)
+
+
+@pytest.fixture()
+def currency_network_with_events(fresh_currency_network_adapter, accounts):
+    adapter = fresh_currency_network_adapter
+    adapter.update_trustline(
+        accounts[0],
+        accounts[1],
+        creditline_given=100,
+        creditline_received=150,
+        accept=True,
+    )
+    adapter.transfer(10, path=[accounts[0], accounts[1]])
+    adapter.increase_debt(accounts[2], accounts[3], 20)
+    adapter.update_trustline(
+        accounts[1], accounts[2], creditline_given=200, creditline_received=250
+    )
+    adapter.update_trustline(
+        accounts[2], accounts[3], creditline_given=300, creditline_received=350
+    )
+    adapter.cancel_trustline_update(accounts[2], accounts[3])
+    return adapter.contract
+
+
+def test_sync_stores_all_logs(web3, currency_network_with_events, event_store):
+    contract = currency_network_with_events
+
+    number_of_logs = event_store.sync(web3, [contract.address])
+
+    expected_logs = LogDecoder(contract.abi).decode_logs(
+        get_raw_logs(web3, address=contract.address)
+    )
+    assert number_of_logs == len(expected_logs)
+    assert event_store.get_logs(address=contract.address) == expected_logs
+    assert event_store.last_synced_block(contract.address) == web3.eth.blockNumber
+
+
+def test_sync_incrementally(
+    web3,
+    currency_network_with_events,
+    event_store,
+    fresh_currency_network_adapter,
+    accounts,
+):
+    contract = currency_network_with_events
+    event_store.sync(web3, [contract.address], max_blocks_per_request=3)
+    fresh_currency_network_adapter.transfer(5, path=[accounts[1], accounts[0]])
+
+    assert event_store.sync(web3, [contract.address]) == 2
+    assert event_store.sync(web3, [contract.address]) == 0
+    assert event_store.get_logs(address=contract.address) == LogDecoder(
+        contract.abi
+    ).decode_logs(get_raw_logs(web3, address=contract.address))
+
+
+def test_get_logs_by_indexed_arguments(
+    web3, currency_network_with_events, event_store, accounts
+):
+    contract = currency_network_with_events
+    event_store.sync(web3, [contract.address])
+
+    logs = event_store.get_logs(
+        address=contract.address,
+        event="TrustlineUpdateRequest",
+        argument_filters={"creditor": accounts[1]},
+    )
+
+    assert [(log.args.creditor, log.args.debtor) for log in logs] == [
+        (accounts[1], accounts[2])
+    ]
+
+
+def test_get_logs_by_not_indexed_argument(
+    web3, currency_network_with_events, event_store, accounts
+):
+    with pytest.raises(ValueError):
+        event_store.get_logs(
+            event="DebtUpdate", argument_filters={"debtor": accounts[2]}
+        )
+
+
+def test_get_logs_of_unknown_event(currency_network_with_events, event_store):
+    with pytest.raises(ValueError, match="Unknown event Unknown"):
+        event_store.get_logs(event="Unknown")
+
+
+def test_store_keeps_logs_in_file(
+    web3, currency_network_with_events, make_event_store, tmp_path
+):
+    contract = currency_network_with_events
+    database_path = str(tmp_path / "events.db")
+    event_store = make_event_store(database_path)
+    event_store.sync(web3, [contract.address])
+    event_store.close()
+
+    event_store = make_event_store(database_path)
+
+    assert event_store.last_synced_block(contract.address) == web3.eth.blockNumber
+    assert event_store.sync(web3, [contract.address]) == 0
+    assert len(event_store.get_logs(event="DebtUpdate")) == 1
+
+
+@pytest.mark.parametrize("use_event_store", [False, True])
+def test_get_contract_logs(
+    currency_network_with_events, event_store, accounts, use_event_store
+):
+    logs = get_contract_logs(
+        currency_network_with_events,
+        "TrustlineUpdate",
+        argument_filters={"debtor": accounts[1]},
+        event_store=event_store if use_event_store else None,
+    )
+
+    assert [log.args.creditor for log in logs] == [accounts[0]]
+
+
+@pytest.mark.parametrize("use_event_store", [False, True])
+def test_get_contract_logs_of_unknown_event(
+    currency_network_with_events, event_store, use_event_store
+):
+    with pytest.raises(ValueError, match="Unknown event Unknown"):
+        get_contract_logs(
+            currency_network_with_events,
+            "Unknown",
+            event_store=event_store if use_event_store else None,
+        )
+
+
+def test_migration_helpers_with_event_store(
+    currency_network_with_events, event_store, accounts
+):
+    contract = currency_network_with_events
+
+    assert get_all_debts_of_currency_network(
+        contract, event_store=event_store
+    ) == get_all_debts_of_currency_network(contract)
+    assert get_pending_trustline_update_requests(
+        contract, event_store=event_store
+    ) == get_pending_trustline_update_requests(contract)
+    assert (
+        get_last_frozen_status_of_account(
+            contract, accounts[0], accounts[1], event_store=event_store
+        )
+        is False
+    )
+
+
+def test_sync_rolls_back_orphaned_blocks(
+    web3,
+    chain,
+    currency_network_with_events,
+    event_store,
+    fresh_currency_network_adapter,
+    accounts,
+):
+    contract = currency_network_with_events
+    event_store.sync(web3, [contract.address])
+    snapshot = chain.take_snapshot()
+    fresh_currency_network_adapter.transfer(5, path=[accounts[1], accounts[0]])
+    event_store.sync(web3, [contract.address])
+
+    chain.revert_to_snapshot(snapshot)
+    fresh_currency_network_adapter.transfer(7, path=[accounts[0], accounts[1]])
+    chain.mine_blocks(2)
+    event_store.sync(web3, [contract.address])
+
+    assert [log.args.value for log in event_store.get_logs(event="Transfer")] == [10, 7]
+    assert event_store.get_logs(address=contract.address) == LogDecoder(
+        contract.abi
+    ).decode_logs(get_raw_logs(web3, address=contract.address))
+    assert event_store.last_synced_block(contract.address) == web3.eth.blockNumber
+
+
+def test_sync_reorg_too_deep(
+    web3,
+    chain,
+    currency_network_with_events,
+    make_event_store,
+    fresh_currency_network_adapter,
+    accounts,
+):
+    contract = currency_network_with_events
+    event_store = make_event_store(confirmation_depth=1)
+    snapshot = chain.take_snapshot()
+    fresh_currency_network_adapter.transfer(5, path=[accounts[1], accounts[0]])
+    chain.mine_blocks(2)
+    event_store.sync(web3, [contract.address])
+
+    chain.revert_to_snapshot(snapshot)
+    chain.mine_blocks(4)
+
+    with pytest.raises(ReorgTooDeep):
+        event_store.sync(web3, [contract.address])
+
+
+def test_get_confirmed_logs_only(
+    web3,
+    chain,
+    currency_network_with_events,
+    event_store,
+    fresh_currency_network_adapter,
+    accounts,
+):
+    contract = currency_network_with_events
+    event_store.sync(web3, [contract.address])
+    fresh_currency_network_adapter.transfer(5, path=[accounts[1], accounts[0]])
+    event_store.sync(web3, [contract.address])
+
+    assert [
+        log.args.value
+        for log in event_store.get_logs(event="Transfer", confirmed_only=True)
+    ] == []
+
+    chain.mine_blocks(event_store.confirmation_depth)
+    event_store.sync(web3, [contract.address])
+
+    assert [
+        log.args.value
+        for log in event_store.get_logs(event="Transfer", confirmed_only=True)
+    ] == [10, 5]
+
+
+def test_rollback(web3, currency_network_with_events, event_store):
+    contract = currency_network_with_events
+    event_store.sync(web3, [contract.address])
+    last_debt_update_block = event_store.get_logs(event="DebtUpdate")[0].block_number
+
+    event_store.rollback(last_debt_update_block - 1)
+
+    assert event_store.get_logs(event="DebtUpdate") == []
+    assert event_store.last_synced_block(contract.address) == last_debt_update_block - 1
+    assert event_store.sync(web3, [contract.address]) > 0
+    assert len(event_store.get_logs(event="DebtUpdate")) == 1
@@ -0,0 +1,121 @@
+#! pytest
+import pathlib
+
+import attr
+import pytest
+
+from tldeploy.gas import (
+    DEFAULT_GAS_LIMITS,
+    GasPredictor,
+    LinearGasModel,
+    fit_linear_gas_model,
+    measurements_from_gas_limits,
+)
+from tests.conftest import EXTRA_DATA, NETWORK_SETTINGS
+from tests.currency_network.conftest import deploy_test_network
+from tests.utils import GasValues, read_test_data
+
+GAS_VALUES_PATH = pathlib.Path(__file__).parent.parent / "gas_values.csv"
+
+
+def test_default_gas_limits_match_snapshot():
+    gas_values = read_test_data(GAS_VALUES_PATH, data_class=GasValues)
+
+    assert DEFAULT_GAS_LIMITS == {
+        key: gas_values[key].limit for key in DEFAULT_GAS_LIMITS
+    }, "Update DEFAULT_GAS_LIMITS to the new gas values"
+
+
+def test_fit_linear_gas_model_exact():
+    assert fit_linear_gas_model([(1, 300), (2, 500), (4, 900)]) == LinearGasModel(
+        base=100, per_hop=200
+    )
+
+
+def test_fit_linear_gas_model_covers_measurements():
+    measurements = [(1, 62000), (2, 95000), (3, 131000), (4, 165000)]
+
+    model = fit_linear_gas_model(measurements)
+
+    assert all(model.predict(hops) >= gas_limit for hops, gas_limit in measurements)
+    assert (
+        max(model.predict(hops) - gas_limit for hops, gas_limit in measurements) < 2000
+    )
+
+
+def test_fit_linear_gas_model_without_measurements():
+    with pytest.raises(ValueError):
+        fit_linear_gas_model([])
+
+
+def test_predictions_cover_default_gas_limits():
+    predictor = GasPredictor.from_gas_limits(margin=0)
+
+    for measurement in measurements_from_gas_limits(DEFAULT_GAS_LIMITS):
+        assert (
+            predictor.predict(measurement.operation, measurement.hops)
+            >= measurement.gas_limit
+        )
+
+
+def test_predict_with_margin():
+    predictor = GasPredictor.from_gas_limits(margin=0.1)
+
+    assert predictor.transfer(["A", "B"]) == 69000
+    assert (
+        predictor.update_trustline(is_new_trustline=True, accepts_request=True)
+        == 399000
+    )
+
+
+@pytest.fixture()
+def currency_network_contract_with_trustlines(
+    web3, accounts, make_currency_network_adapter
+):
+    contract = deploy_test_network(
+        web3, attr.evolve(NETWORK_SETTINGS, fee_divisor=100, custom_interests=True)
+    )
+    adapter = make_currency_network_adapter(contract)
+    for A, B in [(0, 1), (1, 2), (2, 3), (3, 4), (4, 0)]:
+        adapter.set_account(
+            accounts[A], accounts[B], creditline_given=1000, creditline_received=1000
+        )
+    return contract
+
+
+@pytest.mark.gas_costs
+@pytest.mark.parametrize("mediators", [0, 1, 2, 3])
+def test_transfer_with_predicted_gas(
+    web3, currency_network_contract_with_trustlines, accounts, mediators
+):
+    contract = currency_network_contract_with_trustlines
+    path = accounts[: mediators + 2]
+
+    transaction_hash = contract.functions.transfer(10, 10, path, EXTRA_DATA).transact(
+        {"from": path[0], "gas": GasPredictor.from_gas_limits().transfer(path)}
+    )
+
+    assert web3.eth.getTransactionReceipt(transaction_hash).status == 1
+
+
+@pytest.mark.gas_costs
+def test_close_trustline_by_triangular_transfer_with_predicted_gas(
+    web3, currency_network_contract_with_trustlines, accounts
+):
+    contract = currency_network_contract_with_trustlines
+    A, B, C, D, E, *rest = accounts
+    contract.functions.transfer(1, 1, [B, A], EXTRA_DATA).transact({"from": B})
+    path = [A, B, C, D, E, A]
+
+    transaction_hash = contract.functions.closeTrustlineByTriangularTransfer(
+        B, 10, path
+    ).transact(
+        {
+            "from": A,
+            "gas": GasPredictor.from_gas_limits().close_trustline_by_triangular_transfer(
+                path
+            ),
+        }
+    )
+
+    assert web3.eth.getTransactionReceipt(transaction_hash).status == 1
@@ -0,0 +1,152 @@
+#! pytest
+import random
+import time
+
+import pytest
+
+from tldeploy.liquidity import MaxFlow, analyze_liquidity, max_flows_from
+from tldeploy.simulation import Trustline
+from tests.currency_network.conftest import random_model
+
+BENCHMARK_USERS = 100_000
+BENCHMARK_TRUSTLINES_PER_USER = 3
+BENCHMARK_UPDATES = 20
+
+
+def random_trustline_change(rng, model):
+    user = rng.choice(model.users)
+    while not model.get_friends(user):
+        user = rng.choice(model.users)
+    friend = rng.choice(model.get_friends(user))
+    model.set_trustline(
+        user,
+        friend,
+        Trustline(
+            creditline_given=rng.randint(0, 10_000),
+            creditline_received=rng.randint(0, 10_000),
+            balance=rng.randint(-1000, 1000),
+        ),
+    )
+    return user, friend
+
+
+def test_max_flow(model, accounts):
+    max_flow = MaxFlow(model, accounts[0], accounts[3])
+
+    assert max_flow.value == 550
+    assert max_flow.paths() == [
+        ([accounts[0], accounts[4], accounts[3]], 400),
+        ([accounts[0], accounts[1], accounts[2], accounts[3]], 150),
+    ]
+
+
+def test_max_flow_without_trustlines(model, accounts):
+    users = list(model.users)
+    max_flow = MaxFlow(model, accounts[0], accounts[5])
+
+    assert max_flow.value == 0
+    assert max_flow.paths() == []
+    assert model.users == users
+
+
+def test_update_max_flow_to_new_user(model, accounts):
+    max_flow = MaxFlow(model, accounts[0], accounts[5])
+    model.set_trustline(
+        accounts[5], accounts[3], Trustline(creditline_given=50, creditline_received=0)
+    )
+
+    assert max_flow.update([(accounts[5], accounts[3])]) == 50
+
+
+def test_analyze_liquidity_does_not_add_users(model, accounts):
+    users = list(model.users)
+
+    [liquidity] = analyze_liquidity(model, accounts[0], [accounts[5]], timestamp=0)
+
+    assert liquidity.max_flow == 0
+    assert liquidity.transfer_paths == []
+    assert model.users == users
+
+
+def test_max_flow_over_frozen_trustline(model, accounts):
+    model.set_trustline(
+        accounts[0],
+        accounts[4],
+        Trustline(creditline_given=500, creditline_received=550, is_frozen=True),
+    )
+
+    assert MaxFlow(model, accounts[0], accounts[3]).value == 150
+
+
+def test_transfer_paths_pay_fees(model, accounts):
+    transfer_paths = MaxFlow(model, accounts[0], accounts[3]).transfer_paths(
+        timestamp=0
+    )
+
+    assert [
+        (transfer_path.value, transfer_path.fees) for transfer_path in transfer_paths
+    ] == [(400, 5), (146, 4)]
+
+
+def test_update_max_flow(model, accounts):
+    max_flow = MaxFlow(model, accounts[0], accounts[3])
+    model.set_trustline(
+        accounts[0],
+        accounts[4],
+        Trustline(creditline_given=500, creditline_received=100),
+    )
+
+    assert max_flow.update([(accounts[0], accounts[4])]) == 250
+    assert sum(amount for path, amount in max_flow.paths()) == 250
+
+
+def test_max_flows_from(model, accounts):
+    assert max_flows_from(model, accounts[0]) == {
+        accounts[1]: 350,
+        accounts[2]: 450,
+        accounts[3]: 550,
+        accounts[4]: 700,
+    }
+
+
+def test_analyze_liquidity(model, accounts):
+    [liquidity] = analyze_liquidity(model, accounts[0], [accounts[3]], timestamp=0)
+
+    assert liquidity.max_flow == 550
+    assert liquidity.transferable_value == 546
+    assert liquidity.fees == 9
+
+
+def test_updated_max_flow_matches_recomputed():
+    rng = random.Random(0)
+    model = random_model(rng, 200, 3)
+    source, target = rng.sample(model.users, 2)
+    max_flow = MaxFlow(model, source, target)
+
+    for _ in range(50):
+        changed_user_pair = random_trustline_change(rng, model)
+        max_flow.update([changed_user_pair])
+
+        assert max_flow.value == MaxFlow(model, source, target).value
+        assert sum(amount for path, amount in max_flow.paths()) == max_flow.value
+
+
+@pytest.mark.benchmark
+def test_benchmark_max_flow():
+    rng = random.Random(1)
+    model = random_model(rng, BENCHMARK_USERS, BENCHMARK_TRUSTLINES_PER_USER)
+    source, target = rng.sample(model.users, 2)
+
+    start = time.perf_counter()
+    max_flow = MaxFlow(model, source, target)
+    duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_UPDATES):
+        max_flow.update([random_trustline_change(rng, model)])
+    update_duration = (time.perf_counter() - start) / BENCHMARK_UPDATES
+
+    print(
+        f"\nMax flow in {BENCHMARK_USERS} users: {duration:.3f}s, "
+        f"{update_duration:.3f}s per update"
+    )
@@ -0,0 +1,82 @@
+#! pytest
+import pytest
+from tlbin import load_packaged_merged_abis
+
+from tldeploy.events import LogDecoder, get_raw_logs
+from tests.currency_network.conftest import deploy_test_network, NETWORK_SETTING
+
+
+@pytest.fixture(scope="session")
+def currency_network_with_events(web3, accounts, make_currency_network_adapter):
+    contract = deploy_test_network(web3, NETWORK_SETTING)
+    adapter = make_currency_network_adapter(contract)
+    adapter.set_account(
+        accounts[0], accounts[1], creditline_given=100, creditline_received=150
+    )
+    adapter.transfer(10, path=[accounts[0], accounts[1]])
+    adapter.increase_debt(accounts[2], accounts[3], 20)
+    return contract
+
+
+@pytest.fixture(scope="session")
+def log_decoder(currency_network_with_events):
+    return LogDecoder(currency_network_with_events.abi)
+
+
+@pytest.mark.parametrize(
+    "event_name", ["TrustlineUpdate", "BalanceUpdate", "Transfer", "DebtUpdate"]
+)
+def test_decoded_logs_match_web3(currency_network_with_events, log_decoder, event_name):
+    contract = currency_network_with_events
+    web3_events = getattr(contract.events, event_name)().getLogs(fromBlock=0)
+    raw_logs = get_raw_logs(
+        contract.web3,
+        address=contract.address,
+        topics=[log_decoder.topic(event_name)],
+    )
+
+    decoded_logs = log_decoder.decode_logs(raw_logs)
+
+    assert len(web3_events) > 0
+    assert len(decoded_logs) == len(web3_events)
+    for decoded_log, web3_event in zip(decoded_logs, web3_events):
+        assert decoded_log.event == event_name
+        assert tuple(decoded_log.args) == tuple(web3_event["args"].values())
+        assert decoded_log.address == contract.address
+        assert decoded_log.block_number == web3_event["blockNumber"]
+        assert decoded_log.log_index == web3_event["logIndex"]
+        assert decoded_log.transaction_hash == web3_event["transactionHash"]
+
+
+def test_decode_logs_formatted_by_web3(currency_network_with_events, log_decoder):
+    logs = currency_network_with_events.web3.eth.getLogs(
+        {"address": currency_network_with_events.address, "fromBlock": 0}
+    )
+
+    decoded_logs = log_decoder.decode_logs(logs)
+
+    assert {decoded_log.event for decoded_log in decoded_logs} >= {
+        "TrustlineUpdate",
+        "BalanceUpdate",
+        "Transfer",
+        "DebtUpdate",
+    }
+    assert decoded_logs[-1].event == "DebtUpdate"
+    assert decoded_logs[-1].args.newDebt == 20
+
+
+def test_unknown_logs_are_skipped(currency_network_with_events):
+    log_decoder = LogDecoder([])
+    logs = currency_network_with_events.web3.eth.getLogs(
+        {"address": currency_network_with_events.address, "fromBlock": 0}
+    )
+
+    assert log_decoder.decode_logs(logs) == []
+
+
+def test_merged_abis_decoder_has_all_events():
+    merged_abi = load_packaged_merged_abis()["MergedCurrencyNetworksAbi"]["abi"]
+
+    assert LogDecoder.from_merged_abis().event_names() == sorted(
+        {entry["name"] for entry in merged_abi if entry["type"] == "event"}
+    )
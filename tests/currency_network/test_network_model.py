@@ -0,0 +1,204 @@
+#! pytest
+import itertools
+import random
+
+import attr
+import pytest
+
+from tldeploy.events import LogDecoder, get_raw_logs
+from tldeploy.network_model import CurrencyNetworkModel
+from tldeploy.simulation import (
+    Trustline,
+    TransferInfeasible,
+    simulate_transfer_receiver_pays,
+    simulate_transfer_sender_pays,
+)
+from tests.conftest import NETWORK_SETTINGS
+from tests.currency_network.conftest import deploy_test_network
+
+NUMBER_OF_USERS = 6
+NUMBER_OF_TRANSFERS = 40
+
+
+@pytest.fixture(params=[False, True], ids=["", "prevent_mediator_interests"])
+def random_network(request, web3, accounts, make_currency_network_adapter):
+    """A network with random trustlines between the first users, some of which accrue interests"""
+    network_settings = attr.evolve(
+        NETWORK_SETTINGS,
+        fee_divisor=100,
+        custom_interests=True,
+        prevent_mediator_interests=request.param,
+    )
+    contract = deploy_test_network(web3, network_settings)
+    adapter = make_currency_network_adapter(contract)
+    rng = random.Random(41)
+    users = accounts[:NUMBER_OF_USERS]
+    mtime = web3.eth.getBlock("latest").timestamp
+    for a, b in itertools.combinations(users, 2):
+        if rng.random() < 0.3:
+            continue
+        adapter.set_account(
+            a,
+            b,
+            creditline_given=rng.randint(0, 10_000),
+            creditline_received=rng.randint(0, 10_000),
+            interest_rate_given=rng.choice([0, 0, 100, 1000]),
+            interest_rate_received=rng.choice([0, 0, 100, 1000]),
+            m_time=mtime,
+            balance=rng.randint(-5_000, 5_000),
+        )
+    return contract
+
+
+def assert_model_matches_contract(model, contract, users):
+    for user in users:
+        assert set(model.get_friends(user)) == set(
+            contract.functions.getFriends(user).call()
+        )
+        for friend in contract.functions.getFriends(user).call():
+            assert model.get_trustline(user, friend) == Trustline(
+                *contract.functions.getAccount(user, friend).call()
+            )
+
+
+def random_path(rng, model, users):
+    path = [rng.choice(users)]
+    for _ in range(rng.randint(1, 3)):
+        friends = [
+            friend for friend in model.get_friends(path[-1]) if friend not in path
+        ]
+        if not friends:
+            break
+        path.append(rng.choice(friends))
+    return path
+
+
+def test_model_from_contract(random_network, accounts):
+    model = CurrencyNetworkModel.from_contract(random_network)
+
+    assert set(model.users) == set(random_network.functions.getUsers().call())
+    assert_model_matches_contract(model, random_network, accounts[:NUMBER_OF_USERS])
+
+
+def test_trustline_records_are_shared_by_both_sides(accounts):
+    model = CurrencyNetworkModel()
+    model.set_trustline(
+        accounts[1], accounts[0], Trustline(creditline_given=10, balance=5)
+    )
+
+    assert model.get_trustline(accounts[0], accounts[1]) == Trustline(
+        creditline_received=10, balance=-5
+    )
+    assert model.get_friends(accounts[0]) == [accounts[1]]
+    assert list(model.neighbours(model.user_index(accounts[0]))) == [
+        model.user_index(accounts[1])
+    ]
+
+
+def test_close_trustline(accounts):
+    model = CurrencyNetworkModel()
+    model.set_trustline(accounts[0], accounts[1], Trustline(creditline_given=10))
+    model.set_trustline(accounts[0], accounts[2], Trustline(balance=1))
+
+    model.close_trustline(accounts[1], accounts[0])
+
+    assert model.get_friends(accounts[0]) == [accounts[2]]
+    assert model.get_trustline(accounts[0], accounts[1]) == Trustline()
+    with pytest.raises(TransferInfeasible):
+        model.close_trustline(accounts[0], accounts[2])
+
+
+def test_copy_is_independent(accounts):
+    model = CurrencyNetworkModel()
+    model.set_trustline(accounts[0], accounts[1], Trustline(creditline_received=10))
+
+    copy = model.copy()
+    copy.transfer(5, 0, [accounts[0], accounts[1]], timestamp=0)
+
+    assert copy.get_trustline(accounts[0], accounts[1]).balance == -5
+    assert model.get_trustline(accounts[0], accounts[1]).balance == 0
+
+
+@pytest.mark.parametrize("receiver_pays", [False, True])
+def test_model_transfers_match_contract(
+    random_network, web3, accounts, assert_failing_transaction, receiver_pays
+):
+    """Differential test: random transfers are applied to the contract and the model"""
+    users = accounts[:NUMBER_OF_USERS]
+    model = CurrencyNetworkModel.from_contract(random_network)
+    rng = random.Random(42)
+    simulate = (
+        simulate_transfer_receiver_pays
+        if receiver_pays
+        else simulate_transfer_sender_pays
+    )
+    functions = random_network.functions
+    test_transfer = (
+        functions.testTransferReceiverPays
+        if receiver_pays
+        else functions.testTransferSenderPays
+    )
+
+    feasible_transfers = 0
+    for _ in range(NUMBER_OF_TRANSFERS):
+        path = random_path(rng, model, users)
+        value = rng.randint(1, 8_000)
+        max_fee = rng.randint(0, 100)
+        # interests accrued within a block do not change whether a transfer is feasible
+        try:
+            simulate(
+                model,
+                value,
+                max_fee,
+                path,
+                timestamp=web3.eth.getBlock("latest").timestamp + 1,
+            )
+        except TransferInfeasible:
+            assert_failing_transaction(test_transfer(value, max_fee, path))
+            continue
+
+        transaction_hash = test_transfer(value, max_fee, path).transact()
+        block_number = web3.eth.getTransactionReceipt(transaction_hash).blockNumber
+        model.transfer(
+            value,
+            max_fee,
+            path,
+            timestamp=web3.eth.getBlock(block_number).timestamp,
+            receiver_pays=receiver_pays,
+        )
+        feasible_transfers += 1
+
+    assert 0 < feasible_transfers < NUMBER_OF_TRANSFERS
+    assert_model_matches_contract(model, random_network, users)
+
+
+def test_model_from_events(web3, accounts, make_currency_network_adapter):
+    network_settings = attr.evolve(NETWORK_SETTINGS, fee_divisor=100)
+    contract = deploy_test_network(web3, network_settings)
+    adapter = make_currency_network_adapter(contract)
+    for a, b in [(0, 1), (1, 2), (2, 3), (0, 3)]:
+        adapter.update_trustline(
+            accounts[a],
+            accounts[b],
+            creditline_given=1000,
+            creditline_received=2000,
+            accept=True,
+        )
+    adapter.transfer(100, path=[accounts[0], accounts[1], accounts[2]])
+    adapter.transfer(50, path=[accounts[3], accounts[2]])
+    adapter.update_trustline(
+        accounts[0], accounts[1], creditline_given=500, creditline_received=2000
+    )
+    adapter.close_trustline(accounts[0], accounts[3])
+
+    log_decoder = LogDecoder(contract.abi)
+    model = CurrencyNetworkModel.from_events(
+        log_decoder.decode_logs(get_raw_logs(web3, address=contract.address)),
+        get_block_timestamp=lambda block_number: web3.eth.getBlock(
+            block_number
+        ).timestamp,
+        capacity_imbalance_fee_divisor=100,
+    )
+
+    assert model.get_friends(accounts[3]) == [accounts[2]]
+    assert_model_matches_contract(model, contract, accounts[:4])
@@ -0,0 +1,358 @@
+#! pytest
+import itertools
+import random
+import time
+
+import attr
+import pytest
+
+from tldeploy.network_model import CurrencyNetworkModel
+from tldeploy.pathfinding import PathFinder
+from tldeploy.simulation import (
+    MAX_UINT64,
+    Trustline,
+    TransferInfeasible,
+    simulate_transfer_receiver_pays,
+)
+from tests.conftest import EXTRA_DATA, NETWORK_SETTINGS
+from tests.currency_network.conftest import (
+    deploy_test_network,
+    random_model,
+    trustlines,
+)
+
+BENCHMARK_USERS = 100_000
+BENCHMARK_TRUSTLINES_PER_USER = 3
+BENCHMARK_SEARCHES = 20
+
+
+@pytest.fixture(scope="session")
+def currency_network_with_trustlines(web3, accounts, make_currency_network_adapter):
+    contract = deploy_test_network(web3, attr.evolve(NETWORK_SETTINGS, fee_divisor=100))
+    adapter = make_currency_network_adapter(contract)
+    for (A, B, clAB, clBA) in trustlines:
+        adapter.set_account(
+            accounts[A], accounts[B], creditline_given=clAB, creditline_received=clBA
+        )
+    return contract
+
+
+def test_find_direct_path(model, accounts):
+    transfer_path = PathFinder(model).find_cheapest_path(
+        accounts[0], accounts[1], 100, timestamp=0
+    )
+
+    assert transfer_path.path == [accounts[0], accounts[1]]
+    assert transfer_path.fees == 0
+
+
+def test_find_mediated_path(model, accounts):
+    transfer_path = PathFinder(model).find_cheapest_path(
+        accounts[0], accounts[3], 100, timestamp=0
+    )
+
+    assert transfer_path.path == [accounts[0], accounts[4], accounts[3]]
+    assert transfer_path.fees == 2
+
+
+def test_find_path_around_missing_capacity(model, accounts):
+    transfer_path = PathFinder(model).find_cheapest_path(
+        accounts[1], accounts[0], 200, timestamp=0
+    )
+
+    assert transfer_path.path == [
+        accounts[1],
+        accounts[2],
+        accounts[3],
+        accounts[4],
+        accounts[0],
+    ]
+
+
+def test_find_no_path_over_max_fee(model, accounts):
+    assert (
+        PathFinder(model).find_cheapest_path(
+            accounts[0], accounts[3], 100, timestamp=0, max_fee=1
+        )
+        is None
+    )
+
+
+def test_find_no_path_over_frozen_trustline(model, accounts):
+    model.set_trustline(
+        accounts[0],
+        accounts[4],
+        attr.evolve(model.get_trustline(accounts[0], accounts[4]), is_frozen=True),
+    )
+
+    transfer_path = PathFinder(model).find_cheapest_path(
+        accounts[0], accounts[3], 100, timestamp=0
+    )
+
+    assert transfer_path.path == [accounts[0], accounts[1], accounts[2], accounts[3]]
+
+
+def test_find_receiver_pays_path(model, accounts):
+    transfer_path = PathFinder(model).find_cheapest_path(
+        accounts[0], accounts[3], 100, timestamp=0, receiver_pays=True
+    )
+
+    assert transfer_path.path == [accounts[0], accounts[4], accounts[3]]
+    assert transfer_path.fees == 1
+
+
+def test_find_max_capacity_path(model, accounts):
+    transfer_path = PathFinder(model).find_max_capacity_path(
+        accounts[0], accounts[3], timestamp=0
+    )
+
+    assert transfer_path.path == [accounts[0], accounts[4], accounts[3]]
+    assert transfer_path.value == 400
+    assert transfer_path.fees == 5
+
+
+def random_dense_model(rng, number_of_users):
+    users = [f"0x{index + 1:040x}" for index in range(number_of_users)]
+    model = CurrencyNetworkModel(capacity_imbalance_fee_divisor=10)
+    for user, other_user in itertools.combinations(users, 2):
+        if rng.random() < 0.5:
+            model.set_trustline(
+                user,
+                other_user,
+                Trustline(
+                    creditline_given=rng.randint(0, 200),
+                    creditline_received=rng.randint(0, 200),
+                    balance=rng.randint(-100, 100),
+                ),
+            )
+    return model
+
+
+def find_cheapest_path_exhaustively(model, source, target, value):
+    """The lowest fees of all paths for `transferReceiverPays`, or None if no path is feasible"""
+    mediators = [user for user in model.users if user not in (source, target)]
+    lowest_fees = None
+    for number_of_mediators in range(len(mediators) + 1):
+        for path_mediators in itertools.permutations(mediators, number_of_mediators):
+            path = [source, *path_mediators, target]
+            if not all(model.has_trustline(a, b) for a, b in zip(path, path[1:])):
+                continue
+            try:
+                fees = simulate_transfer_receiver_pays(
+                    model, value, MAX_UINT64, path, timestamp=0
+                ).fees
+            except TransferInfeasible:
+                continue
+            if lowest_fees is None or fees < lowest_fees:
+                lowest_fees = fees
+    return lowest_fees
+
+
+def test_find_receiver_pays_path_missed_by_fee_pruning():
+    rng = random.Random(0)
+    for _ in range(300):
+        model = random_dense_model(rng, 6)
+        source, target = rng.sample(model.users, 2)
+        value = rng.randint(1, 200)
+
+        transfer_path = PathFinder(model).find_cheapest_path(
+            source, target, value, timestamp=0, receiver_pays=True
+        )
+
+        lowest_fees = find_cheapest_path_exhaustively(model, source, target, value)
+        if lowest_fees is None:
+            assert transfer_path is None
+        else:
+            assert transfer_path is not None
+            assert transfer_path.fees == lowest_fees
+
+
+@pytest.mark.parametrize(
+    "source, target, value", [(0, 3, 100), (1, 0, 200), (4, 2, 300), (2, 0, 50)]
+)
+def test_found_path_transfers_on_contract(
+    currency_network_with_trustlines, accounts, web3, source, target, value
+):
+    contract = currency_network_with_trustlines
+    model = CurrencyNetworkModel.from_contract(contract)
+    transfer_path = PathFinder(model).find_cheapest_path(
+        accounts[source],
+        accounts[target],
+        value,
+        timestamp=web3.eth.getBlock("latest").timestamp,
+    )
+    balance_before = contract.functions.balance(
+        accounts[source], transfer_path.path[1]
+    ).call()
+
+    contract.functions.transfer(
+        value, transfer_path.fees, transfer_path.path, EXTRA_DATA
+    ).transact({"from": accounts[source]})
+
+    assert (
+        contract.functions.balance(accounts[source], transfer_path.path[1]).call()
+        == balance_before - value - transfer_path.fees
+    )
+
+
+@pytest.fixture()
+def closable_model(accounts):
+    """A model where accounts[1] owes accounts[0] 100, with cycles over accounts[2] and accounts[3, 4]"""
+    model = CurrencyNetworkModel(capacity_imbalance_fee_divisor=100)
+    for (A, B, balance) in [
+        (0, 1, 100),
+        (1, 2, 0),
+        (2, 0, 0),
+        (1, 3, 0),
+        (3, 4, 0),
+        (4, 0, 0),
+    ]:
+        model.set_trustline(
+            accounts[A],
+            accounts[B],
+            Trustline(creditline_given=1000, creditline_received=1000, balance=balance),
+        )
+    return model
+
+
+def test_find_close_trustline_paths_receiver_pays(closable_model, accounts):
+    candidates = PathFinder(closable_model).find_close_trustline_paths(
+        accounts[0], accounts[1], timestamp=0
+    )
+
+    assert [candidate.path for candidate in candidates] == [
+        [accounts[0], accounts[1], accounts[2], accounts[0]],
+        [accounts[0], accounts[1], accounts[3], accounts[4], accounts[0]],
+    ]
+    assert [candidate.fees for candidate in candidates] == [1, 2]
+    assert all(candidate.value == 100 for candidate in candidates)
+
+
+def test_find_close_trustline_paths_sender_pays(closable_model, accounts):
+    candidates = PathFinder(closable_model).find_close_trustline_paths(
+        accounts[1], accounts[0], timestamp=0, max_mediators=1
+    )
+
+    assert [candidate.path for candidate in candidates] == [
+        [accounts[1], accounts[2], accounts[0], accounts[1]]
+    ]
+    assert candidates[0].fees == 4
+
+
+def test_find_no_close_trustline_paths_over_max_fee(closable_model, accounts):
+    assert (
+        PathFinder(closable_model).find_close_trustline_paths(
+            accounts[0], accounts[1], timestamp=0, max_fee=0
+        )
+        == []
+    )
+
+
+def test_find_no_close_trustline_paths_without_balance(closable_model, accounts):
+    assert (
+        PathFinder(closable_model).find_close_trustline_paths(
+            accounts[1], accounts[2], timestamp=0
+        )
+        == []
+    )
+
+
+@pytest.mark.parametrize("prevent_mediator_interests", [False, True])
+def test_find_close_trustline_paths_prevents_mediator_interests(
+    accounts, prevent_mediator_interests
+):
+    model = CurrencyNetworkModel(
+        capacity_imbalance_fee_divisor=100,
+        prevent_mediator_interests=prevent_mediator_interests,
+    )
+    model.set_trustline(
+        accounts[0],
+        accounts[1],
+        Trustline(creditline_given=1000, creditline_received=1000, balance=100),
+    )
+    model.set_trustline(
+        accounts[1],
+        accounts[2],
+        Trustline(creditline_given=1000, creditline_received=1000, balance=-115),
+    )
+    # the mediator accounts[2] would pay more interests to accounts[0] than it receives
+    model.set_trustline(
+        accounts[2],
+        accounts[0],
+        Trustline(
+            creditline_given=1000,
+            creditline_received=1000,
+            interest_rate_given=100,
+            interest_rate_received=100,
+            balance=-99,
+        ),
+    )
+
+    candidates = PathFinder(model).find_close_trustline_paths(
+        accounts[0], accounts[1], timestamp=0
+    )
+
+    assert len(candidates) == (0 if prevent_mediator_interests else 1)
+
+
+def test_found_close_trustline_path_closes_on_contract(
+    web3, accounts, make_currency_network_adapter
+):
+    contract = deploy_test_network(web3, attr.evolve(NETWORK_SETTINGS, fee_divisor=100))
+    adapter = make_currency_network_adapter(contract)
+    for (A, B, balance) in [(0, 1, 100), (1, 2, 0), (2, 0, 0)]:
+        adapter.set_account(
+            accounts[A],
+            accounts[B],
+            creditline_given=1000,
+            creditline_received=1000,
+            balance=balance,
+        )
+    model = CurrencyNetworkModel.from_contract(contract)
+
+    [candidate] = PathFinder(model).find_close_trustline_paths(
+        accounts[0], accounts[1], timestamp=web3.eth.getBlock("latest").timestamp
+    )
+    adapter.close_trustline(
+        accounts[0], accounts[1], path=candidate.path, max_fee=candidate.fees
+    )
+
+    assert accounts[1] not in contract.functions.getFriends(accounts[0]).call()
+
+
+@pytest.fixture(scope="session")
+def synthetic_model():
+    return random_model(
+        random.Random(0), BENCHMARK_USERS, BENCHMARK_TRUSTLINES_PER_USER
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("receiver_pays", [False, True])
+def test_benchmark_find_cheapest_path(synthetic_model, receiver_pays):
+    rng = random.Random(1)
+    path_finder = PathFinder(synthetic_model)
+
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_SEARCHES):
+        source, target = rng.sample(synthetic_model.users, 2)
+        path_finder.find_cheapest_path(
+            source, target, 100, timestamp=0, receiver_pays=receiver_pays
+        )
+    duration = (time.perf_counter() - start) / BENCHMARK_SEARCHES
+
+    print(f"\nCheapest path in {BENCHMARK_USERS} users: {duration:.3f}s per search")
+
+
+@pytest.mark.benchmark
+def test_benchmark_find_max_capacity_path(synthetic_model):
+    rng = random.Random(2)
+    path_finder = PathFinder(synthetic_model)
+
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_SEARCHES):
+        source, target = rng.sample(synthetic_model.users, 2)
+        path_finder.find_max_capacity_path(source, target, timestamp=0)
+    duration = (time.perf_counter() - start) / BENCHMARK_SEARCHES
+
+    print(f"\nMax capacity path in {BENCHMARK_USERS} users: {duration:.3f}s per search")
@@ -0,0 +1,149 @@
+#! pytest
+import attr
+import pytest
+
+from tldeploy.interests import calculate_balance_with_interests
+from tldeploy.simulation import (
+    CurrencyNetworkView,
+    TransferInfeasible,
+    simulate_transfer_receiver_pays,
+    simulate_transfer_sender_pays,
+)
+from tests.conftest import EXTRA_DATA, NETWORK_SETTINGS
+from tests.currency_network.conftest import deploy_test_network, trustlines
+
+SECONDS_PER_YEAR = 60 * 60 * 24 * 365
+
+
+@pytest.fixture(scope="session")
+def currency_network_adapter_with_fees(web3, accounts, make_currency_network_adapter):
+    network_settings = attr.evolve(NETWORK_SETTINGS, fee_divisor=100)
+
+    contract = deploy_test_network(web3, network_settings)
+    adapter = make_currency_network_adapter(contract)
+    for (A, B, clAB, clBA) in trustlines:
+        adapter.set_account(
+            accounts[A], accounts[B], creditline_given=clAB, creditline_received=clBA
+        )
+    return adapter
+
+
+def test_trustline_seen_from_both_sides(view, accounts):
+    trustline = view.get_trustline(accounts[0], accounts[1])
+    assert trustline.creditline_given == 100
+    assert trustline.creditline_received == 150
+    assert view.get_trustline(accounts[1], accounts[0]) == trustline.reverse()
+
+
+def test_simulate_sender_pays(view, accounts):
+    path = [accounts[0], accounts[1], accounts[2], accounts[3]]
+    transfer = simulate_transfer_sender_pays(view, 100, 10, path, timestamp=0)
+    view.apply(transfer)
+
+    assert transfer.fees == 4
+    assert view.get_trustline(accounts[0], accounts[1]).balance == -104
+    assert view.get_trustline(accounts[1], accounts[2]).balance == -102
+    assert view.get_trustline(accounts[2], accounts[3]).balance == -100
+
+
+def test_simulate_receiver_pays(view, accounts):
+    path = [accounts[0], accounts[1], accounts[2], accounts[3]]
+    transfer = simulate_transfer_receiver_pays(view, 100, 10, path, timestamp=0)
+    view.apply(transfer)
+
+    assert transfer.fees == 2
+    assert view.get_trustline(accounts[2], accounts[3]).balance == -98
+
+
+def test_simulate_does_not_modify_view(view, accounts):
+    simulate_transfer_sender_pays(
+        view, 100, 10, [accounts[0], accounts[1]], timestamp=0
+    )
+    assert view.get_trustline(accounts[0], accounts[1]).balance == 0
+
+
+@pytest.mark.parametrize(
+    "value, max_fee, path",
+    [
+        (151, 0, [0, 1]),
+        (149, 2, [0, 1, 2]),
+        (100, 1, [0, 1, 2, 3]),
+        (10, 0, [0, 2]),
+        (10, 0, [0]),
+    ],
+)
+def test_simulate_infeasible_transfer(view, accounts, value, max_fee, path):
+    with pytest.raises(TransferInfeasible):
+        simulate_transfer_sender_pays(
+            view, value, max_fee, [accounts[i] for i in path], timestamp=0
+        )
+
+
+def test_simulate_frozen_trustline(view, accounts):
+    view.set_trustline(
+        accounts[1],
+        accounts[2],
+        attr.evolve(view.get_trustline(accounts[1], accounts[2]), is_frozen=True),
+    )
+    with pytest.raises(TransferInfeasible):
+        simulate_transfer_sender_pays(
+            view, 10, 10, [accounts[0], accounts[1], accounts[2]], timestamp=0
+        )
+
+
+@pytest.mark.parametrize(
+    "value, path",
+    [
+        (100, [0, 1, 2, 3]),
+        (50, [4, 3, 2]),
+        (90, [1, 0, 4]),
+    ],
+)
+def test_simulation_matches_transfer(
+    currency_network_adapter_with_fees, accounts, web3, value, path
+):
+    contract = currency_network_adapter_with_fees.contract
+    path = [accounts[i] for i in path]
+    view = CurrencyNetworkView.from_contract(contract)
+    view.load_trustlines_of_paths(contract, [path])
+
+    transfer = simulate_transfer_sender_pays(
+        view, value, 10, path, timestamp=web3.eth.getBlock("latest").timestamp
+    )
+    contract.functions.transfer(value, 10, path, EXTRA_DATA).transact({"from": path[0]})
+
+    for update in transfer.balance_updates:
+        assert (
+            contract.functions.balance(update.sender, update.receiver).call()
+            == update.balance
+        )
+
+
+@pytest.mark.parametrize(
+    "balance, start_time, end_time, rate_given, rate_received",
+    [
+        (1000, 0, SECONDS_PER_YEAR, 100, 0),
+        (-1000, 0, SECONDS_PER_YEAR, 0, 200),
+        (-1000, 0, SECONDS_PER_YEAR, 0, -200),
+        (2 ** 64 - 1, 0, 10 * SECONDS_PER_YEAR, 2000, 0),
+        (-12345678, 100, 100 + 7 * SECONDS_PER_YEAR, 300, 1),
+        (100, 0, SECONDS_PER_YEAR, 0, 1000),
+    ],
+)
+def test_calculate_balance_with_interests_matches_contract(
+    currency_network_adapter_with_fees,
+    balance,
+    start_time,
+    end_time,
+    rate_given,
+    rate_received,
+):
+    contract = currency_network_adapter_with_fees.contract
+    assert (
+        calculate_balance_with_interests(
+            balance, start_time, end_time, rate_given, rate_received
+        )
+        == contract.functions.calculateBalanceWithInterests(
+            balance, start_time, end_time, rate_given, rate_received
+        ).call()
+    )
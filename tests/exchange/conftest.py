@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from tldeploy.core import deploy_exchange, deploy
+from tldeploy.exchange import Order
+
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+EXPIRATION = int(time.time() + 60 * 60 * 24)
+
+
+@pytest.fixture()
+def exchange_contract(web3):
+    return deploy_exchange(web3=web3)
+
+
+def deploy_token(web3, accounts, exchange_contract, symbol):
+    contract = deploy(
+        "DummyToken", web3=web3, constructor_args=(symbol, symbol, 18, 10000000)
+    )
+    for account in accounts[:3]:
+        contract.functions.setBalance(account, 10000).transact()
+        contract.functions.approve(exchange_contract.address, 10000).transact(
+            {"from": account}
+        )
+    return contract
+
+
+@pytest.fixture()
+def maker_token(web3, accounts, exchange_contract):
+    return deploy_token(web3, accounts, exchange_contract, "MKR")
+
+
+@pytest.fixture()
+def taker_token(web3, accounts, exchange_contract):
+    return deploy_token(web3, accounts, exchange_contract, "TKR")
+
+
+@pytest.fixture()
+def make_order(exchange_contract, maker_token, taker_token, accounts, account_keys):
+    def make(
+        maker_token_amount,
+        taker_token_amount,
+        *,
+        salt=0,
+        expiration=EXPIRATION,
+        taker=NULL_ADDRESS,
+    ):
+        order = Order(
+            exchange_contract.address,
+            accounts[0],
+            taker,
+            maker_token.address,
+            taker_token.address,
+            NULL_ADDRESS,
+            maker_token_amount,
+            taker_token_amount,
+            0,
+            0,
+            expiration,
+            salt,
+        )
+        return (order, *order.sign(account_keys[0].to_bytes()))
+
+    return make
@@ -5,8 +5,10 @@ import time
 import pytest
 
 from tldeploy.core import deploy_network, deploy_exchange, deploy
-from tldeploy.exchange import Order
-from tldeploy.signing import priv_to_pubkey
+import attr
+
+from tldeploy.exchange import Order, orders_from_order_arrays, orders_from_tuples
+from tldeploy.signing import priv_to_pubkey, Signer, solidity_keccak
 
 from tests.conftest import NETWORK_SETTINGS
 
@@ -99,6 +101,59 @@ def test_order_hash(
     )
 
 
+def test_order_hash_matches_solidity_keccak(accounts):
+    order_fields = (
+        accounts[0],
+        accounts[1],
+        NULL_ADDRESS,
+        accounts[2],
+        accounts[3],
+        NULL_ADDRESS,
+        100,
+        50,
+        1,
+        2,
+        1234,
+        2 ** 200,
+    )
+
+    assert Order(*order_fields).hash() == solidity_keccak(
+        ["address"] * 6 + ["uint256"] * 6, list(order_fields)
+    )
+
+
+def test_order_is_immutable(accounts):
+    order = Order(*accounts[:6], 100, 50, 0, 0, 1234, 1234)
+
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        order.salt = 1  # type: ignore
+    assert not hasattr(order, "__dict__")
+
+
+def test_orders_from_order_arrays(exchange_contract, token_contract, accounts):
+    maker_address, *rest = accounts
+    orders_addresses = [
+        [maker_address, NULL_ADDRESS, token_contract.address, accounts[1], NULL_ADDRESS]
+    ] * 3
+    orders_values = [[100, 50, 0, 0, 1234, salt] for salt in range(3)]
+
+    orders = orders_from_order_arrays(
+        exchange_contract.address, orders_addresses, orders_values
+    )
+
+    assert orders == orders_from_tuples(
+        (exchange_contract.address, *addresses, *values)
+        for addresses, values in zip(orders_addresses, orders_values)
+    )
+    for order, addresses, values in zip(orders, orders_addresses, orders_values):
+        assert order.order_addresses == addresses
+        assert order.order_values == values
+        assert (
+            order.hash()
+            == exchange_contract.functions.getOrderHash(addresses, values).call()
+        )
+
+
 def test_order_signature(
     exchange_contract,
     token_contract,
@@ -131,6 +186,41 @@ def test_order_signature(
     ).call()
 
 
+def test_order_signature_with_signer(
+    exchange_contract,
+    token_contract,
+    currency_network_contract_with_trustlines,
+    accounts,
+    account_keys,
+):
+    maker_address, taker_address, *rest = accounts
+    signer = Signer(account_keys[0])
+
+    orders = [
+        Order(
+            exchange_contract.address,
+            maker_address,
+            NULL_ADDRESS,
+            token_contract.address,
+            currency_network_contract_with_trustlines.address,
+            NULL_ADDRESS,
+            100,
+            50,
+            0,
+            0,
+            1234,
+            salt,
+        )
+        for salt in range(3)
+    ]
+
+    for order in orders:
+        v, r, s = order.sign(signer)
+        assert exchange_contract.functions.isValidSignature(
+            signer.address, order.hash().hex(), v, r, s
+        ).call()
+
+
 def test_exchange(
     exchange_contract,
     token_contract,
@@ -0,0 +1,189 @@
+#! pytest
+
+import time
+
+import attr
+import pytest
+
+from tldeploy.core import deploy_network
+from tldeploy.exchange import FillInfeasible, Order, simulate_fill_order_trustlines
+from tldeploy.simulation import CurrencyNetworkView
+
+from tests.conftest import NETWORK_SETTINGS
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def deploy_network_with_trustlines(web3, accounts, exchange_contract):
+    contract = deploy_network(
+        web3,
+        attr.evolve(NETWORK_SETTINGS, fee_divisor=100),
+        currency_network_contract_name="TestCurrencyNetwork",
+        exchange_address=exchange_contract.address,
+    )
+    maker, mediator, taker, *rest = accounts
+    for (A, B) in [(maker, mediator), (mediator, taker)]:
+        contract.functions.setAccount(A, B, 200, 200, 0, 0, False, 0, 0).transact()
+    return contract
+
+
+@pytest.fixture()
+def maker_network(web3, accounts, exchange_contract):
+    return deploy_network_with_trustlines(web3, accounts, exchange_contract)
+
+
+@pytest.fixture()
+def taker_network(web3, accounts, exchange_contract):
+    return deploy_network_with_trustlines(web3, accounts, exchange_contract)
+
+
+@pytest.fixture()
+def order(exchange_contract, maker_network, taker_network, accounts):
+    return Order(
+        exchange_contract.address,
+        accounts[0],
+        NULL_ADDRESS,
+        maker_network.address,
+        taker_network.address,
+        NULL_ADDRESS,
+        100,
+        50,
+        0,
+        0,
+        int(time.time() + 60 * 60 * 24),
+        1234,
+    )
+
+
+def load_view(contract, path):
+    view = CurrencyNetworkView.from_contract(contract)
+    view.load_trustlines_of_paths(contract, [path])
+    return view
+
+
+def test_simulation_matches_fill(
+    web3, exchange_contract, maker_network, taker_network, order, accounts, account_keys
+):
+    maker, mediator, taker, *rest = accounts
+    maker_path = [maker, mediator, taker]
+    taker_path = [taker, mediator, maker]
+
+    simulation = simulate_fill_order_trustlines(
+        order,
+        30,
+        maker_path,
+        taker_path,
+        taker_address=taker,
+        timestamp=web3.eth.getBlock("latest").timestamp,
+        maker_network_view=load_view(maker_network, maker_path),
+        taker_network_view=load_view(taker_network, taker_path),
+    )
+
+    assert simulation.filled_taker_token_amount == 30
+    assert simulation.filled_maker_token_amount == 60
+    assert simulation.maker_transfer.fees == 1
+
+    exchange_contract.functions.fillOrderTrustlines(
+        order.order_addresses,
+        order.order_values,
+        30,
+        maker_path,
+        taker_path,
+        *order.sign(account_keys[0].to_bytes()),
+    ).transact({"from": taker})
+
+    for network, transfer in [
+        (maker_network, simulation.maker_transfer),
+        (taker_network, simulation.taker_transfer),
+    ]:
+        for update in transfer.balance_updates:
+            assert (
+                network.functions.balance(update.sender, update.receiver).call()
+                == update.balance
+            )
+
+
+def test_simulation_same_network(web3, exchange_contract, maker_network, accounts):
+    maker, mediator, taker, *rest = accounts
+    maker_path = [maker, mediator, taker]
+    taker_path = [taker, mediator, maker]
+    order = Order(
+        exchange_contract.address,
+        maker,
+        NULL_ADDRESS,
+        maker_network.address,
+        maker_network.address,
+        NULL_ADDRESS,
+        150,
+        150,
+        0,
+        0,
+        int(time.time() + 60 * 60 * 24),
+        1,
+    )
+    view = load_view(maker_network, maker_path)
+
+    simulation = simulate_fill_order_trustlines(
+        order,
+        150,
+        maker_path,
+        taker_path,
+        taker_address=taker,
+        timestamp=web3.eth.getBlock("latest").timestamp,
+        maker_network_view=view,
+        taker_network_view=view,
+    )
+
+    # the taker transfer mostly reduces the imbalance of the maker transfer
+    assert simulation.maker_transfer.fees == 2
+    assert simulation.taker_transfer.fees == 0
+
+
+@pytest.mark.parametrize(
+    "fill_amount, maker_path, taker_path",
+    [
+        # not enough capacity for the maker transfer of 2 * 150
+        (150, [0, 1, 2], [2, 1, 0]),
+        # path does not end at the taker
+        (30, [0, 1], [2, 1, 0]),
+        # there is no trustline between maker and taker
+        (30, [0, 2], [2, 1, 0]),
+    ],
+)
+def test_simulation_rejects_infeasible_fill(
+    web3,
+    maker_network,
+    taker_network,
+    order,
+    accounts,
+    fill_amount,
+    maker_path,
+    taker_path,
+):
+    maker_path = [accounts[i] for i in maker_path]
+    taker_path = [accounts[i] for i in taker_path]
+    order = attr.evolve(order, taker_token_amount=150, maker_token_amount=300)
+
+    with pytest.raises(FillInfeasible):
+        simulate_fill_order_trustlines(
+            order,
+            fill_amount,
+            maker_path,
+            taker_path,
+            taker_address=accounts[2],
+            timestamp=web3.eth.getBlock("latest").timestamp,
+            maker_network_view=load_view(maker_network, maker_path),
+            taker_network_view=load_view(taker_network, taker_path),
+        )
+
+
+def test_simulation_rejects_expired_order(order, accounts):
+    with pytest.raises(FillInfeasible):
+        simulate_fill_order_trustlines(
+            order,
+            10,
+            [],
+            [],
+            taker_address=accounts[2],
+            timestamp=order.expiration_timestamp_in_sec,
+        )
@@ -0,0 +1,102 @@
+#! pytest
+
+import time
+
+from tldeploy.batch import call_functions
+from tldeploy.exchange import OrderAvailability
+from tldeploy.orderbook import OrderBook
+
+
+def test_call_functions_returns_results_in_order(web3, maker_token, accounts):
+    results = call_functions(
+        web3,
+        [maker_token.functions.balanceOf(account) for account in accounts[:4]],
+    )
+
+    assert results == [10000, 10000, 10000, 0]
+
+
+def test_unavailable_amounts(exchange_contract, make_order, accounts):
+    order, v, r, s = make_order(100, 100, salt=1)
+    other_order, *_ = make_order(100, 100, salt=2)
+    exchange_contract.functions.fillOrder(
+        order.order_addresses, order.order_values, 30, False, v, r, s
+    ).transact({"from": accounts[2]})
+
+    availability = OrderAvailability(exchange_contract)
+
+    assert availability.get_unavailable_taker_token_amounts(
+        [order.hash(), other_order.hash()]
+    ) == [30, 0]
+    assert availability.get_remaining_taker_token_amounts([order, other_order]) == [
+        70,
+        100,
+    ]
+
+
+def test_cache_is_invalidated_by_events(exchange_contract, make_order, accounts):
+    maker, _, taker, *rest = accounts
+    order, v, r, s = make_order(100, 100, salt=1)
+    other_order, *_ = make_order(100, 100, salt=2)
+    availability = OrderAvailability(exchange_contract)
+    assert availability.get_unavailable_taker_token_amounts(
+        [order.hash(), other_order.hash()]
+    ) == [0, 0]
+
+    exchange_contract.functions.fillOrder(
+        order.order_addresses, order.order_values, 30, False, v, r, s
+    ).transact({"from": taker})
+    exchange_contract.functions.cancelOrder(
+        other_order.order_addresses, other_order.order_values, 20
+    ).transact({"from": maker})
+
+    # the cached amounts are pinned to the synced block
+    assert availability.get_unavailable_taker_token_amounts(
+        [order.hash(), other_order.hash()]
+    ) == [0, 0]
+
+    assert availability.sync() == {bytes(order.hash()), bytes(other_order.hash())}
+    assert availability.get_unavailable_taker_token_amounts(
+        [order.hash(), other_order.hash()]
+    ) == [30, 20]
+
+
+def test_fillable_orders(exchange_contract, make_order, accounts):
+    order, v, r, s = make_order(100, 100, salt=1)
+    expired_order, *_ = make_order(100, 100, salt=2, expiration=1000)
+    open_order, *_ = make_order(100, 100, salt=3)
+    exchange_contract.functions.fillOrder(
+        order.order_addresses, order.order_values, 100, False, v, r, s
+    ).transact({"from": accounts[2]})
+
+    availability = OrderAvailability(exchange_contract)
+
+    assert availability.get_fillable_orders(
+        [order, expired_order, open_order], int(time.time())
+    ) == [open_order]
+
+
+def test_refresh_order_book(exchange_contract, make_order, accounts):
+    book = OrderBook()
+    order, v, r, s = make_order(100, 100, salt=1)
+    filled_order, filled_v, filled_r, filled_s = make_order(100, 100, salt=2)
+    book.add_order(order, v, r, s)
+    book.add_order(filled_order, filled_v, filled_r, filled_s)
+    availability = OrderAvailability(exchange_contract)
+
+    exchange_contract.functions.fillOrder(
+        order.order_addresses, order.order_values, 40, False, v, r, s
+    ).transact({"from": accounts[2]})
+    exchange_contract.functions.fillOrder(
+        filled_order.order_addresses,
+        filled_order.order_values,
+        100,
+        False,
+        filled_v,
+        filled_r,
+        filled_s,
+    ).transact({"from": accounts[2]})
+    availability.refresh_order_book(book)
+
+    assert book.remaining_taker_token_amount(order.hash()) == 60
+    assert filled_order.hash() not in book
@@ -0,0 +1,142 @@
+#! pytest
+
+import time
+
+from tldeploy.orderbook import OrderBook
+
+
+def test_best_price_first(make_order, maker_token, taker_token):
+    book = OrderBook()
+    book.add_order(*make_order(100, 100, salt=1))
+    book.add_order(*make_order(300, 100, salt=2))
+    book.add_order(*make_order(200, 100, salt=3))
+
+    salts = [
+        entry.order.salt
+        for entry in book.best_orders(maker_token.address, taker_token.address)
+    ]
+    assert salts == [2, 3, 1]
+
+
+def test_match_partially_fills_worst_order(make_order, maker_token, taker_token):
+    book = OrderBook()
+    book.add_order(*make_order(100, 100, salt=1))
+    book.add_order(*make_order(300, 100, salt=2))
+
+    match = book.match(
+        maker_token.address, taker_token.address, 150, timestamp=int(time.time())
+    )
+
+    assert [fill.entry.order.salt for fill in match.fills] == [2, 1]
+    assert match.filled_taker_token_amount == 150
+    assert match.filled_maker_token_amount == 350
+
+
+def test_match_skips_orders_for_other_takers(
+    make_order, maker_token, taker_token, accounts
+):
+    book = OrderBook()
+    book.add_order(*make_order(300, 100, salt=1, taker=accounts[3]))
+    book.add_order(*make_order(100, 100, salt=2))
+
+    match = book.match(
+        maker_token.address,
+        taker_token.address,
+        100,
+        timestamp=int(time.time()),
+        taker_address=accounts[2],
+    )
+
+    assert [fill.entry.order.salt for fill in match.fills] == [2]
+
+
+def test_evict_expired(make_order, maker_token, taker_token):
+    book = OrderBook()
+    book.add_order(*make_order(100, 100, salt=1, expiration=1000))
+    book.add_order(*make_order(100, 100, salt=2, expiration=2000))
+
+    evicted = book.evict_expired(1000)
+
+    assert [entry.order.salt for entry in evicted] == [1]
+    assert len(book) == 1
+
+
+def test_batch_fill_orders_from_match(
+    exchange_contract, make_order, maker_token, taker_token, accounts
+):
+    taker = accounts[2]
+    book = OrderBook()
+    book.add_order(*make_order(100, 100, salt=1))
+    book.add_order(*make_order(300, 100, salt=2))
+
+    match = book.match(
+        maker_token.address, taker_token.address, 150, timestamp=int(time.time())
+    )
+    match.batch_fill_orders(exchange_contract).transact({"from": taker})
+
+    assert maker_token.functions.balanceOf(taker).call() == 10000 + 350
+    assert taker_token.functions.balanceOf(taker).call() == 10000 - 150
+
+
+def test_fill_orders_up_to_from_match(
+    exchange_contract, make_order, maker_token, taker_token, accounts
+):
+    taker = accounts[2]
+    book = OrderBook()
+    book.add_order(*make_order(100, 100, salt=1))
+    book.add_order(*make_order(300, 100, salt=2))
+
+    match = book.match(
+        maker_token.address, taker_token.address, 150, timestamp=int(time.time())
+    )
+    match.fill_orders_up_to(exchange_contract).transact({"from": taker})
+
+    assert maker_token.functions.balanceOf(taker).call() == 10000 + 350
+
+
+def test_fill_and_cancel_events_reduce_available_amount(
+    exchange_contract, make_order, maker_token, taker_token, accounts
+):
+    maker, _, taker, *rest = accounts
+    book = OrderBook()
+    order, v, r, s = make_order(100, 100, salt=1)
+    book.add_order(order, v, r, s)
+    book.add_order(*make_order(100, 100, salt=2))
+
+    exchange_contract.functions.fillOrder(
+        order.order_addresses, order.order_values, 30, False, v, r, s
+    ).transact({"from": taker})
+    exchange_contract.functions.cancelOrder(
+        order.order_addresses, order.order_values, 20
+    ).transact({"from": maker})
+
+    book.apply_events(exchange_contract.events.LogFill().getLogs(fromBlock=0))
+    book.apply_events(exchange_contract.events.LogCancel().getLogs(fromBlock=0))
+    # applying the same events twice has no effect
+    book.apply_events(exchange_contract.events.LogFill().getLogs(fromBlock=0))
+
+    assert book.remaining_taker_token_amount(order.hash()) == 50
+    assert (
+        book.unavailable_taker_token_amount(order.hash())
+        == exchange_contract.functions.getUnavailableTakerTokenAmount(
+            order.hash()
+        ).call()
+    )
+
+    match = book.match(
+        maker_token.address, taker_token.address, 200, timestamp=int(time.time())
+    )
+    assert match.filled_taker_token_amount == 150
+
+
+def test_fully_filled_order_is_removed(exchange_contract, make_order, accounts):
+    book = OrderBook()
+    order, v, r, s = make_order(100, 100, salt=1)
+    book.add_order(order, v, r, s)
+
+    exchange_contract.functions.fillOrder(
+        order.order_addresses, order.order_values, 100, False, v, r, s
+    ).transact({"from": accounts[2]})
+    book.apply_events(exchange_contract.events.LogFill().getLogs(fromBlock=0))
+
+    assert order.hash() not in book
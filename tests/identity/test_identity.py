@@ -4,13 +4,14 @@ import attr
 from web3.exceptions import SolidityError
 from hexbytes import HexBytes
 from tldeploy.core import deploy_network, deploy_identity, NetworkSettings
+from tldeploy.event_store import EventStore
 from tldeploy.identity import (
     MetaTransaction,
     UnexpectedIdentityContractException,
     build_create2_address,
     MetaTransactionStatus,
 )
-from tldeploy.signing import solidity_keccak, sign_msg_hash
+from tldeploy.signing import solidity_keccak, sign_msg_hash, Signer
 
 from tests.conftest import EXTRA_DATA
 from deploy_tools.compile import build_initcode
@@ -1141,6 +1142,29 @@ def test_get_not_found_meta_transaction_status(each_identity, delegate):
     assert meta_tx_status == MetaTransactionStatus.NOT_FOUND
 
 
+def test_get_meta_transaction_status_with_event_store(each_identity, delegate):
+    event_store = EventStore()
+    meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=each_identity.address)
+    )
+
+    assert (
+        delegate.get_meta_transaction_status(
+            each_identity.address, meta_transaction.hash, event_store=event_store
+        )
+        == MetaTransactionStatus.NOT_FOUND
+    )
+
+    delegate.send_signed_meta_transaction(meta_transaction)
+
+    assert (
+        delegate.get_meta_transaction_status(
+            each_identity.address, meta_transaction.hash, event_store=event_store
+        )
+        == MetaTransactionStatus.SUCCESS
+    )
+
+
 def test_set_delegate_transaction_params(web3, each_identity, delegate, accounts):
 
     meta_transaction = each_identity.filled_and_signed_meta_transaction(
@@ -1159,3 +1183,14 @@ def test_set_delegate_transaction_params(web3, each_identity, delegate, accounts
     assert tx["from"] == transaction_options["from"]
     assert tx["gas"] == transaction_options["gas"]
     assert tx["gasPrice"] == transaction_options["gasPrice"]
+
+
+def test_meta_transaction_signed_with_signer(owner_key, accounts):
+    meta_transaction = MetaTransaction(
+        from_=accounts[1], to=accounts[2], chain_id=0, nonce=1
+    )
+
+    assert (
+        meta_transaction.signed(Signer(owner_key)).signature
+        == meta_transaction.signed(owner_key).signature
+    )
@@ -0,0 +1,127 @@
+#! pytest
+import json
+
+import pytest
+from eth_abi import encode_single
+from web3 import HTTPProvider, Web3
+
+import tldeploy.batch
+from tldeploy.batch import BatchCallFailed, call_functions
+
+CONTRACT_ADDRESS = "0x" + "11" * 20
+
+ABI = [
+    {
+        "name": "double",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "value", "type": "uint256"}],
+        "outputs": [{"name": "", "type": "uint256"}],
+    }
+]
+
+
+@pytest.fixture()
+def http_web3():
+    return Web3(HTTPProvider("http://localhost:8545"))
+
+
+@pytest.fixture()
+def function_calls(http_web3):
+    contract = http_web3.eth.contract(
+        address=Web3.toChecksumAddress(CONTRACT_ADDRESS), abi=ABI
+    )
+    return [contract.functions.double(value) for value in range(5)]
+
+
+def doubled_result(request):
+    """The result of `double` of a request, decoded from its call data"""
+    value = int(request["params"][0]["data"][-64:], 16)
+    return "0x" + encode_single("uint256", 2 * value).hex()
+
+
+@pytest.fixture()
+def mock_node(monkeypatch):
+    """A function replacing the http requests of batches with `respond`, which gets the parsed batch request
+    and returns the parsed response. The function returns the list of the sent batch requests."""
+    sent_requests = []
+
+    def use(respond):
+        def make_post_request(endpoint_uri, data, **kwargs):
+            request = json.loads(data)
+            sent_requests.append(request)
+            return json.dumps(respond(request)).encode("utf-8")
+
+        monkeypatch.setattr(tldeploy.batch, "make_post_request", make_post_request)
+        return sent_requests
+
+    return use
+
+
+def test_call_functions_in_batches(http_web3, function_calls, mock_node):
+    sent_requests = mock_node(
+        lambda request: [
+            {"jsonrpc": "2.0", "id": call["id"], "result": doubled_result(call)}
+            for call in request
+        ]
+    )
+
+    assert call_functions(http_web3, function_calls, batch_size=2) == [0, 2, 4, 6, 8]
+    assert [len(request) for request in sent_requests] == [2, 2, 1]
+
+
+def test_call_functions_with_responses_out_of_order(
+    http_web3, function_calls, mock_node
+):
+    mock_node(
+        lambda request: [
+            {"jsonrpc": "2.0", "id": call["id"], "result": doubled_result(call)}
+            for call in reversed(request)
+        ]
+    )
+
+    assert call_functions(http_web3, function_calls) == [0, 2, 4, 6, 8]
+
+
+def test_call_functions_with_missing_response(http_web3, function_calls, mock_node):
+    mock_node(
+        lambda request: [
+            {"jsonrpc": "2.0", "id": call["id"], "result": doubled_result(call)}
+            for call in request
+            if call["id"] != 3
+        ]
+    )
+
+    with pytest.raises(BatchCallFailed) as exception_info:
+        call_functions(http_web3, function_calls)
+
+    assert exception_info.value.function_call is function_calls[3]
+
+
+def test_call_functions_with_failing_call(http_web3, function_calls, mock_node):
+    error = {"code": -32000, "message": "execution reverted"}
+    mock_node(
+        lambda request: [
+            {"jsonrpc": "2.0", "id": call["id"], "error": error}
+            if call["id"] == 1
+            else {"jsonrpc": "2.0", "id": call["id"], "result": doubled_result(call)}
+            for call in request
+        ]
+    )
+
+    with pytest.raises(BatchCallFailed) as exception_info:
+        call_functions(http_web3, function_calls)
+
+    assert exception_info.value.function_call is function_calls[1]
+    assert exception_info.value.error == error
+
+
+def test_call_functions_with_rejected_batch(http_web3, function_calls, mock_node):
+    error = {"code": -32005, "message": "batch size too large"}
+    mock_node(lambda request: {"jsonrpc": "2.0", "id": None, "error": error})
+
+    with pytest.raises(BatchCallFailed) as exception_info:
+        call_functions(http_web3, function_calls)
+
+    assert exception_info.value.function_call is None
+    assert exception_info.value.error == error
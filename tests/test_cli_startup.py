@@ -0,0 +1,49 @@
+#! pytest
+import subprocess
+import sys
+
+import pytest
+
+# Modules that take most of the import time and must only be imported by the commands that use them
+HEAVY_MODULES = [
+    "web3",
+    "deploy_tools",
+    "eth_utils",
+    "pendulum",
+    "pkg_resources",
+    "tldeploy.core",
+    "tldeploy.identity",
+    "tldeploy.migration",
+]
+
+
+def import_times(module):
+    """The cumulative import times in microseconds per module imported by `python -X importtime`"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.fixture(scope="module")
+def cli_import_times():
+    return import_times("tldeploy.cli")
+
+
+@pytest.mark.parametrize("module", HEAVY_MODULES)
+def test_cli_does_not_import_heavy_module(cli_import_times, module):
+    assert module not in cli_import_times
+
+
+@pytest.mark.benchmark
+def test_benchmark_cli_import_time(cli_import_times):
+    print(f"\nImporting tldeploy.cli: {cli_import_times['tldeploy.cli'] / 1000:.1f}ms")
@@ -0,0 +1,96 @@
+#! pytest
+import time
+
+import pytest
+from deploy_tools import deploy_compiled_contract
+
+from tldeploy.contract_factory import ContractFactory, get_contract_factory
+from tldeploy.core import deploy
+from tldeploy.load_contracts import contracts
+
+DEPLOYMENTS = 10
+
+
+def test_factory_is_cached_per_contract(web3):
+    assert get_contract_factory(web3, "Identity") is get_contract_factory(
+        web3, "Identity"
+    )
+    assert get_contract_factory(web3, "Identity") is not get_contract_factory(
+        web3, "UnwEth"
+    )
+
+
+def test_initcode_is_cached_per_arguments(web3):
+    factory = ContractFactory(web3, "IdentityProxyFactory")
+
+    initcode = factory.initcode((1,))
+
+    assert initcode == factory.constructor(1).data_in_transaction
+    assert factory.initcode((1,)) is initcode
+    assert factory.initcode((2,)) != initcode
+
+
+def test_initcode_cache_is_bounded(web3):
+    factory = ContractFactory(web3, "IdentityProxyFactory", max_cached_initcodes=2)
+
+    first_initcode = factory.initcode((1,))
+    factory.initcode((2,))
+    factory.initcode((3,))
+
+    assert factory.initcode((1,)) == first_initcode
+    assert factory.initcode((1,)) is not first_initcode
+
+
+def test_deploy_uses_factory(web3):
+    identity = deploy("Identity", web3=web3)
+
+    assert identity.abi == get_contract_factory(web3, "Identity").contract.abi
+    assert identity.functions.initialised().call() is False
+
+
+@pytest.mark.benchmark
+def test_benchmark_deploy(web3):
+    contract_interface = contracts["IdentityProxyFactory"]
+
+    start = time.perf_counter()
+    for _ in range(DEPLOYMENTS):
+        deploy_compiled_contract(
+            abi=contract_interface["abi"],
+            bytecode=contract_interface["bytecode"],
+            web3=web3,
+            constructor_args=(1,),
+        )
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(DEPLOYMENTS):
+        deploy("IdentityProxyFactory", web3=web3, constructor_args=(1,))
+    cached = time.perf_counter() - start
+
+    print(
+        f"\n{DEPLOYMENTS} deployments: {uncached:.3f}s uncached, {cached:.3f}s with factory cache"
+    )
+
+
+@pytest.mark.benchmark
+def test_benchmark_initcode(web3):
+    contract_interface = contracts["IdentityProxyFactory"]
+    factory = get_contract_factory(web3, "IdentityProxyFactory")
+    factory.initcode((1,))
+
+    start = time.perf_counter()
+    for _ in range(DEPLOYMENTS):
+        web3.eth.contract(
+            abi=contract_interface["abi"], bytecode=contract_interface["bytecode"]
+        ).constructor(1).data_in_transaction
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(DEPLOYMENTS):
+        factory.initcode((1,))
+    cached = time.perf_counter() - start
+
+    print(
+        f"\n{DEPLOYMENTS} initcodes: {uncached:.6f}s uncached, {cached:.6f}s with factory cache"
+    )
+    assert cached < uncached
@@ -0,0 +1,90 @@
+#! pytest
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+from tlbin import (
+    IndexedContracts,
+    load_packaged_contracts,
+    load_packaged_contracts_lazily,
+    write_indexed_contracts,
+)
+
+BENCHMARK_RUNS = 5
+
+CONTRACTS = {
+    "Exchange": {"abi": [{"type": "constructor", "inputs": []}], "bytecode": "0x60"},
+    "UnwEth": {"abi": [], "bytecode": "0x6080604052"},
+    "Ünicode": {"abi": [], "bytecode": "0x"},
+}
+
+
+@pytest.fixture()
+def indexed_contracts_file_path(tmp_path):
+    file_path = str(tmp_path / "contracts.idx")
+    write_indexed_contracts(CONTRACTS, file_path)
+    return file_path
+
+
+def test_indexed_contracts_round_trip(indexed_contracts_file_path):
+    indexed_contracts = IndexedContracts(indexed_contracts_file_path)
+
+    assert dict(indexed_contracts) == CONTRACTS
+    assert list(indexed_contracts) == list(CONTRACTS)
+
+
+def test_indexed_contracts_decode_on_access(indexed_contracts_file_path):
+    indexed_contracts = IndexedContracts(indexed_contracts_file_path)
+
+    assert indexed_contracts["UnwEth"] == CONTRACTS["UnwEth"]
+    assert indexed_contracts["UnwEth"] is indexed_contracts["UnwEth"]
+    assert "Exchange" in indexed_contracts
+    with pytest.raises(KeyError):
+        indexed_contracts["Unknown"]
+
+
+def test_invalid_indexed_contracts_file(tmp_path):
+    file_path = tmp_path / "contracts.json"
+    file_path.write_text(json.dumps(CONTRACTS))
+
+    with pytest.raises(ValueError):
+        IndexedContracts(str(file_path))
+
+
+def test_packaged_index_matches_packaged_contracts():
+    assert dict(load_packaged_contracts_lazily()) == load_packaged_contracts()
+
+
+def _time_python(code, *args):
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_RUNS):
+        subprocess.run(
+            [sys.executable, "-c", code, *args], check=True, stdout=subprocess.DEVNULL
+        )
+    return (time.perf_counter() - start) / BENCHMARK_RUNS
+
+
+@pytest.mark.benchmark
+def test_benchmark_startup():
+    help_time = _time_python("from tldeploy.cli import cli; cli()", "--help")
+    command_help_time = _time_python(
+        "from tldeploy.cli import cli; cli()", "exchange", "--help"
+    )
+    print(
+        f"\ntl-deploy --help: {help_time:.3f}s, tl-deploy exchange --help: {command_help_time:.3f}s"
+    )
+
+
+@pytest.mark.benchmark
+def test_benchmark_load_single_contract():
+    full_time = _time_python(
+        "from tlbin import load_packaged_contracts; load_packaged_contracts()['Exchange']"
+    )
+    indexed_time = _time_python(
+        "from tlbin import load_packaged_contracts_lazily; load_packaged_contracts_lazily()['Exchange']"
+    )
+    print(
+        f"\nload Exchange: {full_time:.3f}s from contracts.json, {indexed_time:.3f}s indexed"
+    )
@@ -0,0 +1,110 @@
+#! pytest
+import importlib.util
+import os
+
+from eth_utils import encode_hex, event_abi_to_log_topic, function_abi_to_4byte_selector
+
+MERGE_ABIS_FILE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "py-bin",
+    "scripts",
+    "merge_abis.py",
+)
+
+
+def load_merge_abis_script():
+    spec = importlib.util.spec_from_file_location("merge_abis", MERGE_ABIS_FILE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+merge_abis = load_merge_abis_script()
+
+
+def function_abi(name, input_types):
+    return {
+        "type": "function",
+        "name": name,
+        "inputs": [
+            {"name": f"_arg{i}", "type": input_type}
+            for i, input_type in enumerate(input_types)
+        ],
+        "outputs": [],
+        "stateMutability": "nonpayable",
+    }
+
+
+def event_abi(name, inputs, anonymous=False):
+    """An event abi with `inputs` as pairs of type and whether it is indexed"""
+    return {
+        "type": "event",
+        "name": name,
+        "inputs": [
+            {"name": f"_arg{i}", "type": input_type, "indexed": indexed}
+            for i, (input_type, indexed) in enumerate(inputs)
+        ],
+        "anonymous": anonymous,
+    }
+
+
+TRANSFER = event_abi(
+    "Transfer", [("address", True), ("address", True), ("uint256", False)]
+)
+TRANSFER_NOT_INDEXED = event_abi(
+    "Transfer", [("address", False), ("address", False), ("uint256", False)]
+)
+SET_ACCOUNT = function_abi("setAccount", ["address", "uint64"])
+SET_ACCOUNT_PERMUTED = function_abi("setAccount", ["uint64", "address"])
+CONSTRUCTOR = {"type": "constructor", "inputs": []}
+FALLBACK = {"type": "fallback"}
+
+
+def test_abi_key_of_events_ignores_indexed_flags():
+    assert merge_abis.abi_key(TRANSFER) == merge_abis.abi_key(TRANSFER_NOT_INDEXED)
+    assert merge_abis.abi_key(TRANSFER) == (
+        "event",
+        encode_hex(event_abi_to_log_topic(TRANSFER)),
+    )
+
+
+def test_abi_key_of_functions_with_permuted_inputs_differ():
+    assert merge_abis.abi_key(SET_ACCOUNT) != merge_abis.abi_key(SET_ACCOUNT_PERMUTED)
+    assert merge_abis.abi_key(SET_ACCOUNT) == (
+        "function",
+        encode_hex(function_abi_to_4byte_selector(SET_ACCOUNT)),
+    )
+
+
+def test_abi_key_without_signature():
+    assert merge_abis.abi_key(CONSTRUCTOR) == ("constructor", None)
+
+
+def test_merge_abis_keeps_first_of_clashing_entries():
+    merged = merge_abis.merge_abis(
+        [CONSTRUCTOR, TRANSFER, SET_ACCOUNT, FALLBACK],
+        [CONSTRUCTOR, TRANSFER_NOT_INDEXED, SET_ACCOUNT_PERMUTED, FALLBACK],
+    )
+
+    assert merged == [
+        CONSTRUCTOR,
+        TRANSFER,
+        SET_ACCOUNT,
+        FALLBACK,
+        SET_ACCOUNT_PERMUTED,
+    ]
+
+
+def test_build_abi_index():
+    anonymous_event = event_abi("Anonymous", [("uint256", False)], anonymous=True)
+    abis = [CONSTRUCTOR, SET_ACCOUNT, TRANSFER, anonymous_event, SET_ACCOUNT_PERMUTED]
+
+    index = merge_abis.build_abi_index(abis)
+
+    assert index["abi"] == abis
+    assert index["selectors"] == {
+        encode_hex(function_abi_to_4byte_selector(SET_ACCOUNT)): 1,
+        encode_hex(function_abi_to_4byte_selector(SET_ACCOUNT_PERMUTED)): 4,
+    }
+    assert index["topics"] == {encode_hex(event_abi_to_log_topic(TRANSFER)): 2}
@@ -0,0 +1,114 @@
+#! pytest
+import json
+
+import pytest
+
+from tldeploy.plan import (
+    DeploymentPlan,
+    NonceAllocator,
+    PlanError,
+    PlanExecutor,
+    PlanState,
+)
+
+
+EXCHANGE_PLAN = {
+    "steps": {
+        "authorize_exchange": {
+            "call": "unw_eth",
+            "function": "addAuthorizedAddress",
+            "args": ["${exchange}"],
+        },
+        "exchange": {"deploy": "Exchange"},
+        "unw_eth": {"deploy": "UnwEth"},
+    }
+}
+
+
+def test_execution_order_respects_dependencies():
+    plan = DeploymentPlan.from_dict(EXCHANGE_PLAN)
+    order = plan.execution_order()
+
+    assert order.index("authorize_exchange") > order.index("exchange")
+    assert order.index("authorize_exchange") > order.index("unw_eth")
+
+
+@pytest.mark.parametrize(
+    "steps",
+    [
+        {"a": {"deploy": "Exchange", "depends_on": ["b"]}},
+        {"a": {"call": "b", "function": "f"}, "b": {"call": "a", "function": "f"}},
+        {
+            "a": {"deploy": "Exchange", "depends_on": ["b"]},
+            "b": {"deploy": "Exchange", "depends_on": ["a"]},
+        },
+        {"a": {"deploy": "Exchange", "call": "b"}},
+        {"a": {"deploy": "Exchange", "gas": 1}},
+        {"a": {"call": "0x" + "11" * 20, "function": "f"}},
+    ],
+)
+def test_invalid_plans(steps):
+    with pytest.raises(PlanError):
+        DeploymentPlan.from_dict({"steps": steps})
+
+
+def test_run_plan(web3, tmp_path):
+    state_file_path = str(tmp_path / "state.json")
+    addresses = PlanExecutor(
+        web3,
+        DeploymentPlan.from_dict(EXCHANGE_PLAN),
+        state=PlanState(state_file_path),
+        poll_interval=0,
+    ).run()
+
+    unw_eth = web3.eth.contract(
+        address=addresses["unw_eth"],
+        abi=[
+            {
+                "name": "globalAuthorized",
+                "type": "function",
+                "inputs": [{"name": "", "type": "address"}],
+                "outputs": [{"name": "", "type": "bool"}],
+                "stateMutability": "view",
+            }
+        ],
+    )
+    assert unw_eth.functions.globalAuthorized(addresses["exchange"]).call()
+
+    with open(state_file_path) as file:
+        state = json.load(file)
+    assert state["steps"]["exchange"]["address"] == addresses["exchange"]
+    assert all(step["status"] == "done" for step in state["steps"].values())
+
+
+def test_resume_plan(web3, accounts, tmp_path):
+    state_file_path = str(tmp_path / "state.json")
+    first_addresses = PlanExecutor(
+        web3,
+        DeploymentPlan.from_dict({"steps": {"exchange": {"deploy": "Exchange"}}}),
+        state=PlanState(state_file_path),
+        poll_interval=0,
+    ).run()
+    nonce = web3.eth.getTransactionCount(accounts[0])
+
+    addresses = PlanExecutor(
+        web3,
+        DeploymentPlan.from_dict(EXCHANGE_PLAN),
+        state=PlanState(state_file_path),
+        poll_interval=0,
+    ).run()
+
+    assert addresses["exchange"] == first_addresses["exchange"]
+    assert web3.eth.getTransactionCount(accounts[0]) == nonce + 2
+
+
+def test_nonce_is_not_used_if_sending_fails(web3, accounts):
+    allocator = NonceAllocator(web3, accounts[0], nonce=5)
+
+    with pytest.raises(ValueError):
+        with allocator.reserve():
+            raise ValueError()
+    with allocator.reserve() as nonce:
+        assert nonce == 5
+    with allocator.reserve() as nonce:
+        assert nonce == 6
@@ -1,7 +1,7 @@
 #! pytest
 
 from eth_utils import to_checksum_address
-from tldeploy.signing import eth_validate, eth_sign
+from tldeploy.signing import eth_validate, eth_sign, priv_to_pubkey, Signer
 
 
 def test_eth_validate(accounts, account_keys):
@@ -31,3 +31,37 @@ def test_eth_validate_fail2(accounts, account_keys):
     r = 18
     s = 2748
     assert not eth_validate(msg_hash, (v, r, s), to_checksum_address(address))
+
+
+def test_signer_address(accounts, account_keys):
+    signer = Signer(account_keys[0].to_bytes())
+    assert signer.address == to_checksum_address(accounts[0])
+    assert priv_to_pubkey(signer) == priv_to_pubkey(account_keys[0].to_bytes())
+
+
+def test_signer_eth_sign(accounts, account_keys):
+    signer = Signer(account_keys[0])
+
+    msg_hash = (123).to_bytes(32, byteorder="big")
+    vrs = signer.eth_sign(msg_hash)
+    assert vrs == eth_sign(msg_hash, account_keys[0].to_bytes())
+    assert eth_validate(msg_hash, vrs, to_checksum_address(accounts[0]))
+
+
+def test_signer_reused_for_many_hashes(accounts, account_keys):
+    signer = Signer(account_keys[0].to_bytes())
+
+    for i in range(10):
+        msg_hash = i.to_bytes(32, byteorder="big")
+        vrs = eth_sign(msg_hash, signer)
+        assert eth_validate(msg_hash, vrs, to_checksum_address(accounts[0]))
+
+
+def test_signer_sign_msg_hash(account_keys):
+    signer = Signer(account_keys[0])
+
+    msg_hash = bytes(32)
+    assert (
+        signer.sign_msg_hash(msg_hash)
+        == account_keys[0].sign_msg_hash(msg_hash).to_bytes()
+    )